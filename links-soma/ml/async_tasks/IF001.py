@@ -1,17 +1,20 @@
 
 import argparse
+from datetime import datetime
 import json
+import multiprocessing
 import os
 import shutil
 import sys
 import uuid
 from utils import *
 from constants import *
+from usage_matrix import *
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 from src.E001_DataMatching.E012 import process_data as E012
 from src.E001_DataMatching.E013 import process_all_data as E013
-from src.E001_DataMatching.E014 import embedding_address as E014
+from src.E001_DataMatching.E014 import embedding_address_multi as E014
 from src.E001_DataMatching.E016 import process_data as E016
 
 sys.stdin = open(sys.stdin.fileno(), mode='r', encoding='utf-8')
@@ -51,6 +54,18 @@ def main():
         'n_gram_size': json_dict.get('settings', {}).get('advanced', {}).get('n_gram_size', "2"),
         'similarity_threshold': json_dict.get('settings', {}).get('advanced', {}).get('similarity_threshold', "0.95"),
         'joining_method': json_dict.get('settings', {}).get('advanced', {}).get('joining_method', ""),
+        'chunk_size': json_dict.get('settings', {}).get('advanced', {}).get('chunk_size', "100000"),
+        'save_intermediate_files': json_dict.get('settings', {}).get('advanced', {}).get('save_intermediate_files', False),
+        'max_workers': json_dict.get('settings', {}).get('advanced', {}).get('max_workers', None),
+        'memmap_usage_matrix': json_dict.get('settings', {}).get('advanced', {}).get('memmap_usage_matrix', False),
+        'usage_state_path': json_dict.get('settings', {}).get('advanced', {}).get('usage_state_path', None),
+        'ngram_blocking': json_dict.get('settings', {}).get('advanced', {}).get('ngram_blocking', True),
+        'structured_address_matching': json_dict.get('settings', {}).get('advanced', {}).get('structured_address_matching', False),
+        'structured_max_gap': json_dict.get('settings', {}).get('advanced', {}).get('structured_max_gap', "3"),
+        'ngram_index_path': json_dict.get('settings', {}).get('advanced', {}).get('ngram_index_path', None),
+        'approximate_matching': json_dict.get('settings', {}).get('advanced', {}).get('approximate_matching', False),
+        'lsh_seed': json_dict.get('settings', {}).get('advanced', {}).get('lsh_seed', 0),
+        'candidate_table_path': json_dict.get('settings', {}).get('advanced', {}).get('candidate_table_path', None),
         'reference_date': json_dict.get('settings', {}).get('reference_date', ""),
         'reference_data': json_dict.get('settings', {}).get('reference_data', "water_status")
     }
@@ -99,12 +114,37 @@ def main():
     search_period = "1"
 
     job_id = None
+    # デバッグ用に中間ファイルを出力する場合は、各処理の結果をファイル経由で受け渡し、出力先フォルダを残す
+    save_intermediate_files = str(params.get('save_intermediate_files')).lower() == 'true'
+    # 水道使用量の行列をファイルに配置する場合は、出力先フォルダに作成する（大規模な水道使用量データ向け）
+    memmap_usage_matrix = str(params.get('memmap_usage_matrix')).lower() == 'true'
+    ngram_blocking = str(params.get('ngram_blocking')).lower() == 'true'
+    structured_address_matching = str(params.get('structured_address_matching')).lower() == 'true'
+    # 水道使用量の増分更新を行う場合は、前回までの使用量の行列を保存したフォルダを指定する
+    usage_state_dir = concatenate(params.get('output_path'), params.get('usage_state_path')) if params.get('usage_state_path') else None
+    ngram_index_dir = concatenate(params.get('output_path'), params.get('ngram_index_path')) if params.get('ngram_index_path') else None
+    # 大規模なデータ向けに、MinHash-LSHによる近似の名寄せを行う（推定再現率と処理時間を結果に出力する）
+    approximate_matching = str(params.get('approximate_matching')).lower() == 'true'
+    lsh_seed = 0
+    # 基準日をリストで指定した場合は、住居単位データを1回で作成し、基準日ごとに結果ファイルを出力する（経年変化の集計用）
+    multiple_dates = isinstance(params.get('reference_date'), list)
+    reference_dates = [None]
+    # 結合先の候補の表を保存し、類似度の閾値のみを変更した再実行では類似度の計算を省略する
+    candidate_dir = concatenate(params.get('output_path'), params.get('candidate_table_path')) if params.get('candidate_table_path') else None
     try:
         if not params.get('db_path'):
             raise Exception("Error: database_path field is required")
 
         connect_sqllite(params.get('db_path'))
         job_id = create_or_update_job(None ,"", "preprocess", os.getpid(), 0, args.parameters)
+        try:
+            lsh_seed = int(params.get('lsh_seed'))
+        except (TypeError, ValueError):
+            raise Exception(f"Error: lsh_seed must be an integer: {params.get('lsh_seed')!r}")
+        if multiple_dates:
+            if not params.get('reference_date'):
+                raise Exception("Error: reference_date must not be empty")
+            reference_dates = [datetime.strptime(str(date), "%Y-%m-%d") for date in params.get('reference_date')]
         
         suido_use_file = None
         suido_status_file = None
@@ -158,33 +198,75 @@ def main():
             
         input_source.extend(["akiya_result", "geocoding"])
         
-        E012(input_files, output_directory, main_data_type, job_id, json.dumps(columns), params.get('db_path'))
+        cleaned = E012(input_files, output_directory, main_data_type, job_id, json.dumps(columns), params.get('db_path'), params.get('chunk_size'), save_intermediate_files, params.get('max_workers'))
+        if not save_intermediate_files:
+            # 中間ファイルを出力しない場合は、処理結果のデータフレーム（分割読み込みの場合は一時ファイルのパス）を次の処理に渡す
+            suido_status_file = cleaned.get('suido_status')
+            suido_use_file = cleaned.get('suido_use')
+            juki_file = cleaned.get('juki')
+            tatemono_file = cleaned.get('touki')
         create_or_update_job(job_id, "25")
 
-        E013(
+        residence = E013(
             suido_use_file,
             suido_status_file,
             juki_file,
             tatemono_file,
-            params.get("reference_date"),
+            params.get("reference_date") if not multiple_dates else [date.strftime('%Y-%m-%d') for date in reference_dates],
             search_period,
             output_directory,
             job_id,
-            params.get('db_path')
+            params.get('db_path'),
+            save_intermediate_files,
+            f"{output_directory}/suido_usage_matrix.dat" if memmap_usage_matrix else None,
+            params.get('max_workers'),
+            usage_state_dir,
+            # 使用量の行列の更新は、処理全体が成功した時点で反映する
+            False
         )
+        main_name = os.path.splitext(os.path.basename(main_csv))[0]
         progress_percent_job = 50
         create_or_update_job(job_id, progress_percent_job)
-        progress_percent = 25 / len(input_source)
-        for item in input_source:
-            output_e014 = f"{output_directory}/matched_data.csv"
-            sub_csv = f"{output_directory}/{item}_cleaned.csv"
-            if item == 'suido_status':
-                sub_csv = f"{output_directory}/suido_residence.csv"
-            if item in ['juki', 'touki']:
-                sub_csv = f"{output_directory}/{item}_residence.csv"
-            E014(
-                main_csv,
-                sub_csv,
+        progress_percent = 25 / len(input_source) / len(reference_dates)
+        option = 0 if join_option == "交差結合" else 1
+        gpkg_path = concatenate(params.get('output_path'), params.get("census", None))
+        tatemono_path = concatenate(params.get('output_path'), params.get('building_polygon'))
+        result_files = []
+        # 基準日ごとに住居単位データを名寄せし、建物ポリゴンと結合する（基準日が1つの場合は1回のみ）
+        for reference_date in reference_dates:
+            # 基準日を複数指定した場合、住居単位データと出力ファイルの名前の末尾に基準日（YYYYMMDD）を付与する
+            suffix = f"_{reference_date.strftime('%Y%m%d')}" if multiple_dates else ""
+            # 名寄せに使用するデータ（中間ファイルを出力しない場合はファイル名に対応するデータフレーム）
+            sources = {}
+            if not save_intermediate_files:
+                sources = {
+                    'juki_residence': residence.get('juki'),
+                    'suido_residence': residence.get('suido'),
+                    'touki_residence': residence.get('tatemono'),
+                }
+                if multiple_dates:
+                    sources = {name: frames[reference_date.strftime('%Y-%m-%d')] for name, frames in sources.items() if frames is not None}
+                sources['akiya_result_cleaned'] = cleaned.get('akiya_result')
+                sources['geocoding_cleaned'] = cleaned.get('geocoding')
+            main_source = sources.get(main_name) if not save_intermediate_files else f"{output_directory}/{main_name}{suffix}.csv"
+            # 全ての結合先を1回の名寄せ処理で結合する（途中の結果はファイルに保存せずに次の結合先に受け渡す）
+            output_e014 = f"{output_directory}/matched_data{suffix}.csv"
+            sub_csvs, sub_names = [], []
+            for item in input_source:
+                sub_csv = f"{output_directory}/{item}_cleaned.csv"
+                if item == 'suido_status':
+                    sub_csv = f"{output_directory}/suido_residence{suffix}.csv"
+                if item in ['juki', 'touki']:
+                    sub_csv = f"{output_directory}/{item}_residence{suffix}.csv"
+                # 結合先の名前（結合後のカラム名の接尾辞）には基準日を含めない
+                sub_name = os.path.splitext(os.path.basename(sub_csv))[0].removesuffix(suffix)
+                if not save_intermediate_files:
+                    sub_csv = sources.get(sub_name)
+                sub_csvs.append(sub_csv)
+                sub_names.append(sub_name)
+            matched_data, _ = E014(
+                main_source,
+                sub_csvs,
                 "正規化住所",
                 "正規化住所",
                 merge_base,
@@ -194,49 +276,62 @@ def main():
                 1000,
                 str(job_id),
                 params.get('db_path'),
-                [input_source_jp[main_data_type], input_source_jp[item]],
+                [[input_source_jp[main_data_type], input_source_jp[item]] for item in input_source],
                 progress_percent_job,
-                progress_percent
+                progress_percent,
+                main_name,
+                sub_names,
+                save_intermediate_files,
+                blocking=ngram_blocking,
+                structured=structured_address_matching,
+                ngram_index_dir=ngram_index_dir,
+                approximate=approximate_matching,
+                lsh_seed=lsh_seed,
+                candidate_dir=candidate_dir,
+                structured_max_gap=int(params.get('structured_max_gap'))
             )
-            main_csv = output_e014
-            progress_percent_job = progress_percent_job + progress_percent
+            matched_source = output_e014 if save_intermediate_files else matched_data
+            progress_percent_job = progress_percent_job + progress_percent * len(input_source)
             create_or_update_job(job_id, progress_percent_job)
 
-        option = 0 if join_option == "交差結合" else 1
-        output_path_e016 = output_directory.replace(f"/{random_str}", "")
-        output_path_e016 = f"{output_path_e016}/{random_str}.csv"
-
-        gpkg_path = concatenate(params.get('output_path'), params.get("census", None))
-        
-        tatemono_path = concatenate(params.get('output_path'), params.get('building_polygon'))
+            output_path_e016 = output_directory.replace(f"/{random_str}", "")
+            output_path_e016 = f"{output_path_e016}/{random_str}{suffix}.csv"
 
-        E016(
-            tatemono_path,
-            main_csv,
-            gpkg_path,
-            "愛知県",
-            "豊田市",
-            option,
-            "csv",
-            output_path_e016,
-            job_id,
-            params.get('db_path'),
-            params.get('building_polygon_column', 'geometry'),
-            ["テキストマッチング結果", "建物ポリゴン"],
-            params.get('building_polygon_file_type'),
-            params.get('building_polygon_data_type')
-        )
+            E016(
+                tatemono_path,
+                matched_source,
+                gpkg_path,
+                "愛知県",
+                "豊田市",
+                option,
+                "csv",
+                output_path_e016,
+                job_id,
+                params.get('db_path'),
+                params.get('building_polygon_column', 'geometry'),
+                ["テキストマッチング結果", "建物ポリゴン"],
+                params.get('building_polygon_file_type'),
+                params.get('building_polygon_data_type')
+            )
+            result_files.append(f"{random_str}{suffix}.csv")
 
+        if usage_state_dir:
+            UsageMatrix.commit(usage_state_dir)
         create_or_update_job(job_id, "complete")
-        create_job_results(job_id, f"{random_str}.csv")
+        for result_file in result_files:
+            create_job_results(job_id, result_file)
 
     except Exception as e:
+        if usage_state_dir:
+            UsageMatrix.discard(usage_state_dir)
         if job_id:
             create_or_update_job(job_id, "error")
     finally:
-        if output_directory and os.path.isdir(output_directory):
+        if output_directory and os.path.isdir(output_directory) and not save_intermediate_files:
             shutil.rmtree(output_directory)
 
         
 if __name__ == "__main__":
+    # PyInstallerでexe化した場合にプロセスプールのワーカーを起動するために必要
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
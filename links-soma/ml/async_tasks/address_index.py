@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+
+# 正規化住所（例: "小坂本町3-29-4"）の町名と数字部分
+STRUCTURED_ADDRESS_PATTERN = r'^(?P<town>.*?\D)?(?P<numbers>\d+(?:-\d+)*)号?$'
+# 数字部分の各階層の名称（先頭の数字から順に割り当てる）
+ADDRESS_NUMBER_LEVELS = ["丁目", "番地", "号"]
+# 区画で結合する最後の数字の差の上限（離れた番地・号の住所は類似度で結合する）
+STRUCTURED_MAX_GAP = 3
+
+
+def parse_addresses(addresses: pd.Series) -> pd.DataFrame:
+    """
+    正規化住所（CleanData.convert_addressの変換結果）を町名と丁目・番地・号に分割する。
+    数字部分はハイフン区切りの数字を先頭から丁目・番地・号とみなす。
+
+    Parameters
+    ----------
+    addresses : pandas.Series
+        正規化住所の列
+
+    Returns
+    -------
+    pandas.DataFrame
+        town（町名）と丁目・番地・号の列（Int64型。該当する数字がない場合は欠損値）、
+        levels（数字の個数）の列を持つデータフレーム。数字で終わらない住所はtownが欠損値。
+    """
+    # 住所は重複が多いため、重複を除いた値のみを分割して各行に割り当てる
+    codes, uniques = pd.factorize(addresses)
+    parts = pd.Series(uniques, dtype=object).astype(str).str.extract(STRUCTURED_ADDRESS_PATTERN)
+    numbers = parts['numbers'].str.split('-', expand=True)
+    result = pd.DataFrame({'town': parts['town'].fillna('').where(parts['numbers'].notna())})
+    for i, level in enumerate(ADDRESS_NUMBER_LEVELS):
+        column = numbers[i] if i < numbers.shape[1] else pd.Series(index=parts.index, dtype=object)
+        result[level] = pd.to_numeric(column).astype('Int64')
+    # 4つ以上の数字を持つ住所は階層を判定できないため対象外とする
+    levels = parts['numbers'].str.count('-') + 1
+    result.loc[levels > len(ADDRESS_NUMBER_LEVELS), 'town'] = np.nan
+    result['levels'] = levels.fillna(0).astype(np.int64)
+
+    # 欠損値（factorizeのコード-1）は末尾に追加した欠損値の行とする
+    result = pd.concat([result, pd.DataFrame({'town': [np.nan], 'levels': [0]})], ignore_index=True)
+    result = result.iloc[codes].reset_index(drop=True)
+    result.index = addresses.index
+    return result
+
+
+class StructuredAddressIndex:
+    """
+    町名・丁目・番地・号の階層による住所のインデックス
+
+    最後の数字以外（町名と上位の階層の数字）が一致する住所を同じ区画とし、
+    区画はハッシュ（pandas.Index）で、区画内の最後の数字は昇順に並べた配列で保持する。
+    区画の検索はハッシュ、区画内で最も近い数字の検索は二分探索（numpy.searchsorted）で一括して行う。
+
+    Attributes
+    ----------
+    blocks : pandas.Index
+        区画（町名と最後の数字を除く数字の組）
+    block_codes : numpy.ndarray
+        キーの順に並べた各住所の区画の番号
+    numbers : numpy.ndarray
+        キーの順に並べた各住所の最後の数字
+    positions : numpy.ndarray
+        キーの順に並べた各住所の位置
+    """
+
+    def __init__(self, addresses: pd.Series):
+        parsed = parse_addresses(addresses).reset_index(drop=True)
+        valid = parsed['town'].notna().to_numpy()
+        blocks = self._block_keys(parsed)[valid]
+        self.blocks = pd.Index(pd.unique(blocks))
+
+        block_codes = self.blocks.get_indexer(blocks)
+        numbers = self._last_numbers(parsed)[valid]
+        positions = np.flatnonzero(valid)
+        # 区画・最後の数字・住所の位置の順に並べる（同じ数字の住所は位置が小さい住所を優先する）
+        order = np.lexsort((positions, numbers, block_codes))
+        self.block_codes, self.numbers, self.positions = block_codes[order], numbers[order], positions[order]
+        self._scale = int(self.numbers.max()) + 1 if len(self.numbers) > 0 else 1
+        self._keys = self.block_codes * self._scale + self.numbers
+
+    @staticmethod
+    def _block_keys(parsed: pd.DataFrame) -> np.ndarray:
+        """
+        町名・数字の個数・最後の数字を除く数字を連結した区画のキーを作成する
+        """
+        keys = parsed['town'].fillna('') + '|' + parsed['levels'].astype(str)
+        for i, level in enumerate(ADDRESS_NUMBER_LEVELS[:-1]):
+            # 最後の数字より上位の階層のみをキーに含める
+            keys = keys + '|' + parsed[level].astype(str).where(parsed['levels'] > i + 1, '')
+        return keys.to_numpy(dtype=object)
+
+    @staticmethod
+    def _last_numbers(parsed: pd.DataFrame) -> np.ndarray:
+        """
+        各住所の最後の数字を取得する（数字がない住所は0）
+        """
+        numbers = parsed[ADDRESS_NUMBER_LEVELS].fillna(0).to_numpy(dtype=np.int64)
+        last = np.clip(parsed['levels'].to_numpy() - 1, 0, len(ADDRESS_NUMBER_LEVELS) - 1)
+        return numbers[np.arange(len(parsed)), last]
+
+    def nearest(self, addresses: pd.Series, max_gap: int = None) -> np.ndarray:
+        """
+        各住所について、同じ区画で最後の数字が最も近い住所の位置を取得する。
+        差が同じ場合は数字が小さい住所を、同じ数字の場合は位置が小さい住所を優先する。
+
+        Parameters
+        ----------
+        addresses : pandas.Series
+            検索する正規化住所の列
+        max_gap : int, optional
+            最後の数字の差の上限。指定しない場合は区画内で最も近い住所とする。
+
+        Returns
+        -------
+        numpy.ndarray
+            インデックスを作成した住所の位置。同じ区画の住所がない場合は-1。
+        """
+        parsed = parse_addresses(addresses).reset_index(drop=True)
+        result = np.full(len(parsed), -1, dtype=np.int64)
+        block_codes = self.blocks.get_indexer(self._block_keys(parsed))
+        valid = parsed['town'].notna().to_numpy() & (block_codes >= 0)
+        if not valid.any():
+            return result
+        block_codes, numbers = block_codes[valid], self._last_numbers(parsed)[valid]
+
+        # 区画内で検索する数字以上の先頭（upper）と、検索する数字未満の最大の数字の先頭（lower）を比較する
+        targets = block_codes * self._scale + np.minimum(numbers, self._scale - 1)
+        upper = np.searchsorted(self._keys, targets, side='left')
+        lower = np.searchsorted(self._keys, self._keys[np.maximum(upper - 1, 0)], side='left')
+        lower_valid = (upper > 0) & (self.block_codes[lower] == block_codes) & (self.numbers[lower] < numbers)
+        upper_valid = upper < len(self._keys)
+        upper = np.minimum(upper, len(self._keys) - 1)
+        upper_valid &= self.block_codes[upper] == block_codes
+
+        no_candidate = np.iinfo(np.int64).max
+        upper_gap = np.where(upper_valid, np.abs(self.numbers[upper] - numbers), no_candidate)
+        lower_gap = np.where(lower_valid, numbers - self.numbers[lower], no_candidate)
+        best = np.where(upper_gap < lower_gap, upper, lower)
+        found = upper_valid | lower_valid
+        if max_gap is not None:
+            found &= np.minimum(upper_gap, lower_gap) <= max_gap
+
+        result[np.flatnonzero(valid)[found]] = self.positions[best[found]]
+        return result
@@ -0,0 +1,184 @@
+import re
+import numpy as np
+import pandas as pd
+
+
+# 和暦の元号と対応する西暦の開始年
+ERA_START_YEARS = {
+    '令和': 2019,
+    '平成': 1989,
+    '昭和': 1926,
+    '大正': 1912,
+    '明治': 1868
+}
+
+# 和暦表記の日付（例: "平成25年03月20日"）
+WAREKI_PATTERN = r'^(?P<era>令和|平成|昭和|大正|明治)(?P<year>\d+)年(?P<month>\d{1,2})月(?P<day>\d{1,2})日'
+# 6桁の短縮表記（例: "130320"）
+SHORT_DATE_PATTERN = r'^(?P<year>\d{2})(?P<month>\d{2})(?P<day>\d{2})$'
+# 6桁の短縮表記で2000年代とみなす年の上限（この値未満は20XX年、以上は19XX年）
+SHORT_DATE_CENTURY_PIVOT = 50
+
+
+def _to_number(parts: pd.DataFrame) -> pd.DataFrame:
+    """
+    str.extractで取得した数字（全角数字を含む）を数値に変換する
+    """
+    return parts.apply(lambda col: pd.to_numeric(col.str.normalize('NFKC'), errors='coerce'))
+
+def extract_wareki(text: pd.Series) -> pd.DataFrame:
+    """
+    和暦表記の日付から西暦の年・月・日を取得する
+
+    Parameters
+    ----------
+    text : pandas.Series
+        日付の文字列
+
+    Returns
+    -------
+    pandas.DataFrame
+        year, month, day 列を持つデータフレーム。和暦表記でない行は欠損値。
+    """
+    parts = text.str.extract(WAREKI_PATTERN)
+    numbers = _to_number(parts[['year', 'month', 'day']])
+    numbers['year'] = parts['era'].map(ERA_START_YEARS) + numbers['year'] - 1
+    return numbers
+
+def convert_dates_to_seireki(series: pd.Series) -> pd.Series:
+    """
+    日付の列を統一して西暦8桁形式に変換する（和暦や短縮表記を対応）。
+    CleanData.convert_date_to_seireki を列単位で一括処理するもので、各値の変換結果は同じになる。
+
+    Parameters
+    ----------
+    series : pandas.Series
+        和暦や短縮表記の日付の列
+
+    Returns
+    -------
+    pandas.Series
+        変換後の日付の列。和暦・短縮表記でない値は文字列に変換してそのまま返す。
+    """
+    # 日付は重複が多いため、重複を除いた値のみを変換して各行に割り当てる
+    codes, uniques = pd.factorize(series.astype(str))
+    text = pd.Series(uniques, dtype=object)
+    result = text.copy()
+
+    # 和暦をまず変換
+    wareki = extract_wareki(text)
+    is_wareki = wareki['year'].notna()
+    if is_wareki.any():
+        parts = wareki.loc[is_wareki].astype('int64').astype(str)
+        result[is_wareki] = parts['year'].str.zfill(4) + parts['month'].str.zfill(2) + parts['day'].str.zfill(2)
+
+    # 6桁の日付を8桁に変換（元の数字をそのまま使用し、年の上2桁のみ補完する）
+    is_short = ~is_wareki & text.str.match(SHORT_DATE_PATTERN)
+    if is_short.any():
+        year = pd.to_numeric(text[is_short].str[:2].str.normalize('NFKC'))
+        century = np.where(year < SHORT_DATE_CENTURY_PIVOT, '20', '19')
+        result[is_short] = century + text[is_short].str[:6]
+
+    return pd.Series(result.to_numpy()[codes], index=series.index, name=series.name)
+
+
+# 日付の列を変換する際に試行する書式（先に記載した書式を優先する）
+DATE_FORMATS = ['%Y/%m/%d', '%d/%m/%Y', '%Y-%m-%d', '%m/%d/%Y', '%Y%m%d']
+# 区切り文字がハイフンの日・月始まりの書式も含めた書式
+EXTENDED_DATE_FORMATS = ['%Y/%m/%d', '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y', '%m-%d-%Y', '%Y%m%d']
+# 書式の推定に使用する値の数
+FORMAT_SAMPLE_SIZE = 1000
+# (データ名, 列名, 書式の候補) ごとに推定した書式
+INFERRED_DATE_FORMATS = {}
+
+
+def _format_shape(fmt: str) -> str:
+    """
+    書式の形（年は4桁、月・日は1〜2桁の数字とした区切り文字の並び）を返す。
+    形が異なる書式は同じ文字列を変換できないため、優先順位の確認は形が同じ書式の間でのみ行う。
+    """
+    return re.sub(r'%[md]', 'N', fmt).replace('%Y', 'Y')
+
+def infer_date_format(values: pd.Series, formats: list = DATE_FORMATS, sample_size: int = FORMAT_SAMPLE_SIZE) -> str:
+    """
+    列の先頭の値をサンプルとして、最も多くの値を変換できる書式を推定する
+
+    Parameters
+    ----------
+    values : pandas.Series
+        日付の文字列
+    formats : list
+        書式の候補
+    sample_size : int
+        推定に使用する値の数
+
+    Returns
+    -------
+    str
+        推定した書式。同数の場合は候補の先頭に近い書式。
+    """
+    sample = pd.Series(pd.unique(values.dropna())[:sample_size])
+    if sample.empty:
+        return formats[0]
+    counts = [pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum() for fmt in formats]
+    return formats[int(np.argmax(counts))]
+
+def normalize_dates(df: pd.DataFrame, column: str, formats: list = DATE_FORMATS, source: str = None, strip_time: bool = False) -> pd.DataFrame:
+    """
+    日付の列をdatetime64に変換する。
+    各値は書式の候補のうち、先に記載した書式で変換できたものを採用し、変換できない値はNaTとする。
+    推定した書式で全体を一括変換し、変換できなかった値のみ残りの書式を順に試行する。
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        対象のデータフレーム（列を上書きする）
+    column : str
+        日付の列名
+    formats : list
+        書式の候補
+    source : str, optional
+        データ名。指定した場合は推定した書式を (データ名, 列名) ごとに保持し、次回以降の推定を省略する。
+    strip_time : bool, optional
+        Trueの場合は変換前に時刻部分と末尾の".0"を除去する
+
+    Returns
+    -------
+    pandas.DataFrame
+        日付の列を変換したデータフレーム
+    """
+    # 変換済みのdatetime64の列は再度文字列から変換しない
+    if pd.api.types.is_datetime64_any_dtype(df[column]):
+        return df
+
+    # 日付は重複が多いため、重複を除いた値のみを変換して各行に割り当てる
+    codes, uniques = pd.factorize(df[column])
+    # 数値の列は元の型のまま変換する（pandas.to_datetimeの結果が型により異なるため）
+    text = pd.Series(uniques)
+    if strip_time:
+        text = text.astype(str).str.split().str[0].str.rstrip('.0')
+
+    cache_key = (source, column, tuple(formats))
+    fmt = INFERRED_DATE_FORMATS.get(cache_key) if source is not None else None
+    if fmt is None:
+        fmt = infer_date_format(text, formats)
+        if source is not None:
+            INFERRED_DATE_FORMATS[cache_key] = fmt
+
+    dates = pd.to_datetime(text, format=fmt, errors='coerce')
+    # 推定した書式より優先する同じ形の書式で変換できる値は、そちらの結果を採用する
+    for prior in formats[:formats.index(fmt)]:
+        if _format_shape(prior) == _format_shape(fmt):
+            converted = pd.to_datetime(text[dates.notna()], format=prior, errors='coerce')
+            dates.update(converted.dropna())
+    # 変換できなかった値のみ、残りの書式を順に試行する
+    for other in formats:
+        missing = dates.isna()
+        if not missing.any():
+            break
+        if other != fmt:
+            dates[missing] = pd.to_datetime(text[missing], format=other, errors='coerce')
+
+    # 欠損値（factorizeのコード-1）はNaTとする
+    df[column] = pd.Series(np.append(dates.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT'))[codes], index=df.index)
+    return df
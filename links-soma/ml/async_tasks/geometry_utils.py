@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from pyproj import Transformer
+
+
+# 要素ごとのisinstance（文字列の判定に使用する）
+_is_str = np.frompyfunc(isinstance, 2, 1)
+
+
+def _geometry_array(geometries) -> np.ndarray:
+    """
+    ジオメトリの列を配列に変換する（ジオメトリ以外の値（NaNなど）はNone）
+    """
+    values = np.array(geometries, dtype=object, ndmin=1)
+    values[~shapely.is_geometry(values)] = None
+    return values
+
+def _like(geometries, values: np.ndarray, crs=None):
+    """
+    入力と同じ形式で結果を返す（pandas.Seriesの場合は同じインデックスのGeoSeries、単一のジオメトリの場合はジオメトリ）
+    """
+    if isinstance(geometries, pd.Series):
+        return gpd.GeoSeries(values, index=geometries.index, crs=crs, name=geometries.name)
+    if geometries is None or isinstance(geometries, shapely.Geometry):
+        return values[0]
+    return values
+
+def is_text(values) -> np.ndarray:
+    """
+    各値が文字列かどうかを判定する
+
+    Parameters
+    ----------
+    values : array-like or pandas.Series
+        判定する値の列
+
+    Returns
+    -------
+    numpy.ndarray
+        文字列の場合にTrueとなるbool型の配列
+    """
+    return _is_str(np.array(values, dtype=object, ndmin=1), str).astype(bool)
+
+def force_2d(geometries):
+    """
+    ジオメトリからZ座標（高さ）を除去する。ポリゴンの穴（内側のリング）は維持する。
+
+    Parameters
+    ----------
+    geometries : shapely.Geometry, array-like or geopandas.GeoSeries
+        ジオメトリまたはジオメトリの列（欠損値は欠損値のまま）
+
+    Returns
+    -------
+    shapely.Geometry, numpy.ndarray or geopandas.GeoSeries
+        2次元のジオメトリ（入力と同じ形式）
+    """
+    return _like(geometries, shapely.force_2d(_geometry_array(geometries)), getattr(geometries, 'crs', None))
+
+def transform_geometries(geometries, source_crs, target_crs=4326):
+    """
+    ジオメトリの座標系を変換する。全てのジオメトリの座標を1つの配列にまとめ、pyprojで一度に変換する
+    （Z座標を持つジオメトリと持たないジオメトリが混在する場合は、それぞれまとめて変換する）。
+
+    Parameters
+    ----------
+    geometries : shapely.Geometry, array-like or geopandas.GeoSeries
+        ジオメトリまたはジオメトリの列（欠損値は欠損値のまま）
+    source_crs : int or str
+        変換元の座標参照系（EPSGコードなど）
+    target_crs : int or str, optional
+        変換先の座標参照系（デフォルト: WGS84）
+
+    Returns
+    -------
+    shapely.Geometry, numpy.ndarray or geopandas.GeoSeries
+        変換したジオメトリ（入力と同じ形式。Z座標を持つジオメトリはZ座標も変換する）
+    """
+    transformer = Transformer.from_crs(source_crs, target_crs, always_xy=True)
+    values = _geometry_array(geometries)
+    # include_z=Trueでは2次元のジオメトリが空のジオメトリになるため、Z座標の有無で分けて変換する
+    has_z = shapely.has_z(values)
+    result = np.empty(len(values), dtype=object)
+
+    def project(coords):
+        return np.column_stack(transformer.transform(*coords.T))
+
+    for include_z in [False, True]:
+        rows = has_z == include_z
+        if rows.any():
+            result[rows] = shapely.transform(values[rows], project, include_z=include_z)
+    return _like(geometries, result, target_crs)
+
+def from_wkt(values, on_invalid: str = "raise"):
+    """
+    WKT文字列の列をジオメトリに変換する
+
+    Parameters
+    ----------
+    values : str, array-like or pandas.Series
+        WKT文字列または列（文字列以外の値は欠損値）
+    on_invalid : str, optional
+        不正なWKTの場合の処理（"raise": 例外を発生させる、"ignore": 欠損値とする）
+
+    Returns
+    -------
+    shapely.Geometry, numpy.ndarray or geopandas.GeoSeries
+        ジオメトリ（入力がpandas.Seriesの場合は同じインデックスのGeoSeries）
+    """
+    texts = np.array(values, dtype=object, ndmin=1)
+    texts[~is_text(texts)] = None
+    geometries = shapely.from_wkt(texts, on_invalid=on_invalid)
+    if isinstance(values, pd.Series):
+        return gpd.GeoSeries(geometries, index=values.index, name=values.name)
+    return geometries[0] if isinstance(values, str) else geometries
+
+def invalid_wkt_rows(values: pd.Series, geometries=None) -> pd.Index:
+    """
+    ジオメトリに変換できないWKT文字列の行を取得する（文字列以外の値は対象外）
+
+    Parameters
+    ----------
+    values : pandas.Series
+        WKT文字列の列
+    geometries : array-like, optional
+        from_wkt(values, on_invalid="ignore")の変換結果。指定しない場合は変換する。
+
+    Returns
+    -------
+    pandas.Index
+        変換できない行のインデックス
+    """
+    if geometries is None:
+        geometries = from_wkt(values, on_invalid="ignore")
+    return values.index[is_text(values) & pd.isna(np.asarray(geometries, dtype=object))]
+
+def from_wkb(values):
+    """
+    WKB（バイト列または16進数の文字列）の列をジオメトリに変換する
+
+    Parameters
+    ----------
+    values : bytes, str, array-like or pandas.Series
+        WKBまたはWKBの列（欠損値は欠損値のまま）
+
+    Returns
+    -------
+    shapely.Geometry, numpy.ndarray or geopandas.GeoSeries
+        ジオメトリ（入力がpandas.Seriesの場合は同じインデックスのGeoSeries）
+    """
+    data = np.array(values, dtype=object, ndmin=1)
+    data[pd.isna(data)] = None
+    geometries = shapely.from_wkb(data)
+    if isinstance(values, pd.Series):
+        return gpd.GeoSeries(geometries, index=values.index, name=values.name)
+    return geometries[0] if isinstance(values, (bytes, str)) else geometries
+
+def to_wkt(geometries):
+    """
+    ジオメトリの列をWKT文字列に変換する（座標は丸めない。shapelyのGeometry.wktと同じ）
+
+    Parameters
+    ----------
+    geometries : shapely.Geometry, array-like or geopandas.GeoSeries
+        ジオメトリまたはジオメトリの列
+
+    Returns
+    -------
+    str, numpy.ndarray or pandas.Series
+        WKT文字列（入力がpandas.Seriesの場合は同じインデックスのSeries）。欠損値・空のジオメトリはNone。
+    """
+    values = _geometry_array(geometries)
+    values[shapely.is_empty(values)] = None
+    texts = shapely.to_wkt(values, rounding_precision=-1)
+    if isinstance(geometries, pd.Series):
+        return pd.Series(texts, index=geometries.index, name=geometries.name, dtype=object)
+    return texts[0] if isinstance(geometries, shapely.Geometry) else texts
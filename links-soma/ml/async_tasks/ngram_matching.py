@@ -0,0 +1,769 @@
+import os
+import hashlib
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, load_npz, save_npz, vstack
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+
+# 1回の類似度計算で作成する類似度の要素数の上限（行数×結合先の件数。float64で約64MB）
+SIMILARITY_CHUNK_ELEMENTS = 2 ** 23
+# ブロッキングを行う場合に1回で候補を作成する結合元の行数
+BLOCKING_CHUNK_ROWS = 1000
+# プレフィックスの判定で浮動小数点の誤差により候補を取りこぼさないための許容誤差
+PREFIX_TOLERANCE = 1e-9
+# 候補の組が結合先の全件に対してこの割合を超える場合は、全件の類似度を計算する（候補が絞り込めない場合）
+BLOCKING_MAX_CANDIDATE_RATIO = 0.05
+# MinHash-LSHの署名の長さ（ハッシュ関数の数）とバンド数（署名をバンド数に分割し、いずれかのバンドが一致する組を候補とする）
+LSH_NUM_PERM = 192
+LSH_BANDS = 24
+# MinHashのハッシュ関数（(a×N-gramの番号＋b) mod p）の法（メルセンヌ素数）
+LSH_PRIME = (1 << 31) - 1
+# LSHの再現率を推定するために全件と比較する結合元の行数
+LSH_RECALL_SAMPLE_ROWS = 1000
+
+# 住所の正規化（CleanData.convert_address）の版。変換内容を変更した場合は更新し、保存したN-gramインデックスを作り直す
+ADDRESS_NORMALIZATION_VERSION = 1
+# 保存した結合先の候補の表のファイル名の末尾（結合先のデータ名ごとに保存する）
+CANDIDATE_TABLE_SUFFIX = "_candidates.npz"
+# 保存したN-gramインデックスの出現回数の行列・語彙と住所のファイル名
+NGRAM_COUNTS_FILE = "ngram_counts.npz"
+NGRAM_TERMS_FILE = "ngram_terms.npz"
+# N-gramインデックスを保存する結合先のデータ名（実行ごとに作り直さない入力データのみ。住居単位データは対象外）
+NGRAM_INDEX_SOURCES = ("geocoding_cleaned", "akiya_result_cleaned")
+
+
+class NgramIndex:
+    """
+    結合先の住所ごとの文字N-gramの出現回数のインデックス
+
+    語彙は結合先の住所から作成し、結合元の語彙への変換（project）により、
+    結合元で作成した語彙でCountVectorizer.transformを行った場合と同じ出現回数を取得する。
+    結合先のデータ名ごとに、ファイルの内容（住所の集合）・N-gramのサイズ・住所の正規化の版から求めたキーで保存し、
+    内容が変わらない結合先のデータはN-gramの分割を行わずに読み込む（データ名ごとに最新のキーのみを残す）。
+
+    Attributes
+    ----------
+    addresses : numpy.ndarray
+        各行の住所（昇順）
+    terms : numpy.ndarray
+        各列のN-gram
+    counts : scipy.sparse.csr_matrix
+        住所×N-gramの出現回数
+    """
+
+    def __init__(self, addresses, terms, counts):
+        self.addresses = np.asarray(addresses)
+        self.terms = np.asarray(terms)
+        self.counts = csr_matrix(counts)
+        self._address_index = pd.Index(self.addresses)
+
+    @staticmethod
+    def _unique_texts(texts: pd.Series) -> np.ndarray:
+        return np.sort(pd.unique(texts.astype(str)))
+
+    @classmethod
+    def key(cls, texts: pd.Series, ngram: int) -> str:
+        """
+        住所の集合（順序・重複によらない）のハッシュ・N-gramのサイズ・住所の正規化の版からキーを作成する
+        """
+        digest = hashlib.sha256(pd.util.hash_pandas_object(pd.Series(cls._unique_texts(texts)), index=False).to_numpy().tobytes())
+        return f"{digest.hexdigest()[:32]}_n{ngram}_v{ADDRESS_NORMALIZATION_VERSION}"
+
+    @classmethod
+    def build(cls, texts: pd.Series, ngram: int):
+        """
+        住所の列からインデックスを作成する（重複した住所は1行とする）
+        """
+        addresses = cls._unique_texts(texts)
+        vectorizer = CountVectorizer(analyzer='char', ngram_range=(ngram, ngram))
+        counts = vectorizer.fit_transform(addresses)
+        return cls(addresses, vectorizer.get_feature_names_out(), counts)
+
+    @classmethod
+    def load_or_build(cls, directory: str, name: str, texts: pd.Series, ngram: int):
+        """
+        キーに対応する保存済みのインデックスを読み込む。存在しない場合は作成して保存し、
+        同じデータ名の以前のキーのインデックス（内容が変わる前のインデックス）を削除する。
+
+        Parameters
+        ----------
+        directory : str
+            インデックスの保存先のディレクトリ（データ名・キーごとのサブディレクトリに保存する）
+        name : str
+            結合先のデータ名
+        texts : pandas.Series
+            結合先の住所の列
+        ngram : int
+            N-gramのサイズ
+
+        Returns
+        -------
+        NgramIndex
+            結合先の住所のインデックス
+        """
+        source_dir = os.path.join(directory, name)
+        key = cls.key(texts, ngram)
+        path = os.path.join(source_dir, key)
+        if all(os.path.exists(os.path.join(path, file_name)) for file_name in [NGRAM_COUNTS_FILE, NGRAM_TERMS_FILE]):
+            with np.load(os.path.join(path, NGRAM_TERMS_FILE)) as terms:
+                return cls(terms["addresses"], terms["terms"], load_npz(os.path.join(path, NGRAM_COUNTS_FILE)))
+        index = cls.build(texts, ngram)
+        index.save(path)
+        for stale in os.listdir(source_dir):
+            if stale != key:
+                shutil.rmtree(os.path.join(source_dir, stale), ignore_errors=True)
+        return index
+
+    def save(self, path: str):
+        """
+        インデックスをディレクトリに保存する（前回の内容は保存の完了後に置き換える）
+        """
+        os.makedirs(path, exist_ok=True)
+        for name, save in [
+            (NGRAM_COUNTS_FILE, lambda file: save_npz(file, self.counts)),
+            (NGRAM_TERMS_FILE, lambda file: np.savez(file, addresses=self.addresses.astype(str), terms=self.terms.astype(str))),
+        ]:
+            file_path = os.path.join(path, name)
+            with open(f"{file_path}.tmp", "wb") as file:
+                save(file)
+            os.replace(f"{file_path}.tmp", file_path)
+
+    @classmethod
+    def empty(cls):
+        """
+        住所を含まないインデックスを作成する（addで住所を追加する）
+        """
+        return cls(np.array([], dtype=str), np.array([], dtype=str), csr_matrix((0, 0), dtype=np.int64))
+
+    def add(self, texts: pd.Series, ngram: int):
+        """
+        インデックスに含まれない住所のN-gramを分割して追加する（含まれる住所はN-gramの分割を行わない）。
+        N-gramの列は昇順（CountVectorizerの語彙と同じ順序）に並べ直す。
+
+        Parameters
+        ----------
+        texts : pandas.Series
+            住所の列
+        ngram : int
+            N-gramのサイズ（インデックスの作成時と同じサイズ）
+        """
+        new_texts = self._unique_texts(texts)
+        new_texts = new_texts[self._address_index.get_indexer(new_texts) < 0]
+        if len(new_texts) == 0:
+            return
+        vectorizer = CountVectorizer(analyzer='char', ngram_range=(ngram, ngram))
+        try:
+            added = vectorizer.fit_transform(new_texts)
+            new_terms = vectorizer.get_feature_names_out().astype(str)
+        except ValueError:
+            # N-gramを含まない住所のみの場合も、住所はインデックスに追加する
+            added = csr_matrix((len(new_texts), 0), dtype=np.int64)
+            new_terms = np.array([], dtype=str)
+
+        terms = np.union1d(self.terms, new_terms)
+        counts = vstack([
+            csr_matrix((self.counts.data, np.searchsorted(terms, self.terms)[self.counts.indices], self.counts.indptr), shape=(len(self.addresses), len(terms))),
+            csr_matrix((added.data, np.searchsorted(terms, new_terms)[added.indices], added.indptr), shape=(len(new_texts), len(terms))),
+        ]).tocsr()
+        addresses = np.concatenate([self.addresses.astype(str), new_texts])
+        order = np.argsort(addresses, kind='stable')
+        self.addresses, self.terms, self.counts = addresses[order], terms, counts[order]
+        self._address_index = pd.Index(self.addresses)
+
+    def _rows(self, texts: pd.Series) -> np.ndarray:
+        rows = self._address_index.get_indexer(texts.astype(str))
+        if (rows < 0).any():
+            raise KeyError("N-gramインデックスに含まれない住所があります。")
+        return rows
+
+    def vocabulary(self, texts: pd.Series) -> dict:
+        """
+        住所に含まれるN-gramの語彙（住所でCountVectorizer.fitを行った場合と同じ語彙・列の位置）を取得する
+
+        Parameters
+        ----------
+        texts : pandas.Series
+            住所の列（インデックスに含まれる住所）
+
+        Returns
+        -------
+        dict
+            N-gramから列の位置（N-gramの昇順）への対応
+        """
+        columns = np.unique(self.counts[self._rows(texts)].indices)
+        if len(columns) == 0:
+            # CountVectorizer.fitと同じく、N-gramを含む住所がない場合はエラーとする
+            raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+        return {term: position for position, term in enumerate(self.terms[columns])}
+
+    def project(self, texts: pd.Series, vocabulary: dict) -> csr_matrix:
+        """
+        住所ごとの出現回数を、指定した語彙の列に変換して取得する
+
+        Parameters
+        ----------
+        texts : pandas.Series
+            住所の列（インデックスに含まれる住所）
+        vocabulary : dict
+            N-gramから列の位置への対応（CountVectorizer.vocabulary_）
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            住所×語彙の出現回数。語彙にないN-gramは含まない。
+
+        Raises
+        ------
+        KeyError
+            インデックスに含まれない住所がある場合
+        """
+        rows = self._rows(texts)
+        counts = self.counts[rows]
+        columns = np.array([vocabulary.get(term, -1) for term in self.terms], dtype=np.int64)
+        mapped = columns[counts.indices]
+        keep = mapped >= 0
+        # 語彙に含まれるN-gramのみを残し、行ごとの件数から行の開始位置を作り直す
+        entry_rows = np.repeat(np.arange(len(rows)), np.diff(counts.indptr))
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(entry_rows[keep], minlength=len(rows)))])
+        projected = csr_matrix((counts.data[keep], mapped[keep], indptr), shape=(len(rows), len(vocabulary)))
+        projected.sort_indices()
+        return projected
+
+
+class CandidateTable:
+    """
+    結合元の各行の上位k件の結合先の候補（結合先の位置と類似度）の表
+
+    結合元・結合先の住所（未結合のデータの抽出後の順序）と候補の作成方法の設定から求めたキーとともに保存し、
+    類似度の閾値のみを変更した再実行では、N-gramのベクトルの作成・類似度の計算を行わずに表の類似度を閾値で判定する。
+    候補を閾値で絞り込んで作成した表（block_threshold）は、その閾値以上の閾値でのみ再利用する。
+    ブロッキング（top_k_cosineのblock_threshold）で作成した表は全件を計算した場合と同じ結果のため、絞り込んだ表として扱わない。
+
+    Attributes
+    ----------
+    key : str
+        キー
+    indices : numpy.ndarray
+        結合元の行×k件の結合先の位置（候補がない場合は-1）
+    scores : numpy.ndarray
+        結合元の行×k件の類似度
+    structured : numpy.ndarray
+        町名・丁目・番地の階層で結合した（類似度によらず結合する）行かどうか
+    block_threshold : float
+        候補を絞り込んだ類似度の閾値（絞り込んでいない場合はNaN）
+    recall_rows : numpy.ndarray
+        LSHの再現率の推定に使用する結合元の行の位置（LSHを使用しない場合は空）
+    recall_scores : numpy.ndarray
+        recall_rowsの行の全件との類似度の最大値
+    """
+
+    def __init__(self, key, indices, scores, structured, block_threshold=np.nan, recall_rows=(), recall_scores=()):
+        self.key = str(key)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.structured = np.asarray(structured, dtype=bool)
+        self.block_threshold = np.nan if block_threshold is None else float(block_threshold)
+        self.recall_rows = np.asarray(recall_rows, dtype=np.int64)
+        self.recall_scores = np.asarray(recall_scores, dtype=np.float64)
+
+    @staticmethod
+    def key_of(main_texts: pd.Series, sub_texts: pd.Series, ngram: int, **options) -> str:
+        """
+        結合元・結合先の住所（順序を含む）のハッシュ、N-gramのサイズ、住所の正規化の版、候補の作成方法の設定からキーを作成する
+        """
+        digest = hashlib.sha256()
+        for texts in [main_texts, sub_texts]:
+            digest.update(pd.util.hash_pandas_object(texts.astype(str), index=False).to_numpy().tobytes())
+            digest.update(str(len(texts)).encode())
+        settings = "_".join(f"{name}{value}" for name, value in sorted(options.items()))
+        return f"{digest.hexdigest()[:32]}_n{ngram}_v{ADDRESS_NORMALIZATION_VERSION}_{settings}"
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        保存した表を読み込む（存在しない場合はNone）
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as table:
+            return cls(table["key"], table["indices"], table["scores"], table["structured"], table["block_threshold"],
+                       table["recall_rows"], table["recall_scores"])
+
+    def save(self, path: str):
+        """
+        表をファイルに保存する（前回の内容は保存の完了後に置き換える）
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(f"{path}.tmp", "wb") as file:
+            np.savez_compressed(file, key=self.key, indices=self.indices, scores=self.scores, structured=self.structured,
+                                block_threshold=self.block_threshold, recall_rows=self.recall_rows, recall_scores=self.recall_scores)
+        os.replace(f"{path}.tmp", path)
+
+    def reusable(self, key: str, threshold: float) -> bool:
+        """
+        キーが一致し、指定した閾値での結合結果を表から判定できるか
+        """
+        return self.key == key and (np.isnan(self.block_threshold) or threshold >= self.block_threshold - PREFIX_TOLERANCE)
+
+
+def ngram_vectors(main_texts: pd.Series, sub_texts: pd.Series, ngram: int, sub_index: NgramIndex = None, main_index: NgramIndex = None):
+    """
+    文字N-gramの出現回数をL2正規化したベクトルを作成する。
+    N-gramの語彙は結合元の文字列から作成する（結合元にないN-gramは使用しない）。
+    インデックスを指定した場合も、N-gramの分割を省略するのみで同じベクトルとなる。
+
+    Parameters
+    ----------
+    main_texts : pandas.Series
+        結合元の文字列
+    sub_texts : pandas.Series
+        結合先の文字列
+    ngram : int
+        N-gramのサイズ
+    sub_index : NgramIndex, optional
+        結合先の住所のインデックス。指定した場合は結合先の文字列のN-gramの分割を省略する。
+    main_index : NgramIndex, optional
+        結合元の住所のインデックス。指定した場合は結合元の文字列のN-gramの分割を省略する。
+
+    Returns
+    -------
+    tuple of scipy.sparse.csr_matrix
+        結合元と結合先のベクトル（各行のノルムは1。N-gramを含まない行は0ベクトル）
+    """
+    if main_index is not None:
+        vocabulary = main_index.vocabulary(main_texts)
+        vectorizer = CountVectorizer(analyzer='char', ngram_range=(ngram, ngram), vocabulary=vocabulary)
+        main_vectors = main_index.project(main_texts, vocabulary)
+    else:
+        vectorizer = CountVectorizer(analyzer='char', ngram_range=(ngram, ngram))
+        main_vectors = csr_matrix(vectorizer.fit_transform(main_texts.astype(str)))
+        vocabulary = vectorizer.vocabulary_
+    if sub_index is not None:
+        sub_vectors = sub_index.project(sub_texts, vocabulary)
+    else:
+        sub_vectors = csr_matrix(vectorizer.transform(sub_texts.astype(str)))
+    return normalize(main_vectors), normalize(sub_vectors)
+
+def gram_rarity_rank(sub_vectors: csr_matrix) -> np.ndarray:
+    """
+    各N-gramの希少度の順位（結合先で出現する件数の昇順。同数の場合は語彙の順）を返す
+    """
+    counts = np.bincount(sub_vectors.indices, minlength=sub_vectors.shape[1])
+    rank = np.empty(len(counts), dtype=np.int64)
+    rank[np.argsort(counts, kind='stable')] = np.arange(len(counts))
+    return rank
+
+def prefix_vectors(main_vectors: csr_matrix, gram_rank: np.ndarray, threshold: float) -> csr_matrix:
+    """
+    各行のN-gramのうち、プレフィックス（希少な順に並べて、残りのN-gramのノルムが閾値未満になるまでのN-gram）を取得する。
+    結合先のベクトルのノルムは1以下のため、プレフィックスのN-gramを共有しない結合先との類似度は
+    残りのN-gramのノルム（閾値未満）以下となり、閾値以上の結合先を取りこぼさない。
+
+    Parameters
+    ----------
+    main_vectors : scipy.sparse.csr_matrix
+        結合元のベクトル（L2正規化済み）
+    gram_rank : numpy.ndarray
+        N-gramの希少度の順位
+    threshold : float
+        類似度の閾値
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        プレフィックスのN-gramを1とした行列
+    """
+    entries = main_vectors.tocoo()
+    # 行ごとに出現件数が多いN-gramから並べ、そのN-gram以降（より希少なN-gramを除く）の二乗和を求める
+    order = np.lexsort((-gram_rank[entries.col], entries.row))
+    rows, cols, weights = entries.row[order], entries.col[order], entries.data[order]
+    squared = np.cumsum(weights.astype(np.float64) ** 2)
+    row_starts = np.searchsorted(rows, rows, side='left')
+    suffix = squared - np.concatenate([[0.0], squared])[row_starts]
+    keep = suffix >= threshold ** 2 * (1 - PREFIX_TOLERANCE)
+    return csr_matrix((np.ones(keep.sum()), (rows[keep], cols[keep])), shape=main_vectors.shape)
+
+def _top_k_pairs(rows: np.ndarray, cols: np.ndarray, scores: np.ndarray, n_rows: int, k: int):
+    """
+    結合元の行（昇順）・結合先の位置・類似度の組から、各行の類似度の上位k件を取得する（同じ類似度の場合は位置が小さい結合先を優先）
+    """
+    top = np.full((n_rows, k), -1, dtype=np.int64)
+    top_scores = np.zeros((n_rows, k), dtype=np.float64)
+    if len(rows) == 0:
+        return top, top_scores
+    if k == 1:
+        # 並べ替えを行わず、行ごとの最大値と最大値の中で最小の位置を求める
+        candidate_rows, starts = np.unique(rows, return_index=True)
+        best = np.maximum.reduceat(scores, starts)
+        is_best = scores == np.repeat(best, np.diff(np.append(starts, len(rows))))
+        top[candidate_rows, 0] = np.minimum.reduceat(np.where(is_best, cols, np.iinfo(np.int64).max), starts)
+        top_scores[candidate_rows, 0] = best
+        return top, top_scores
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows, side='left')
+    keep = rank < k
+    top[rows[keep], rank[keep]] = cols[keep]
+    top_scores[rows[keep], rank[keep]] = scores[keep]
+    return top, top_scores
+
+def pair_similarities(main_chunk: csr_matrix, sub_vectors: csr_matrix, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """
+    結合元の行と結合先の組ごとの類似度を計算する。
+    行列の積と同じ順序（N-gramの語彙の順）で加算し、全件を計算した場合と同じ値とする。
+
+    Parameters
+    ----------
+    main_chunk : scipy.sparse.csr_matrix
+        結合元のベクトル
+    sub_vectors : scipy.sparse.csr_matrix
+        結合先のベクトル
+    rows : numpy.ndarray
+        組ごとの結合元の行の位置
+    cols : numpy.ndarray
+        組ごとの結合先の位置
+
+    Returns
+    -------
+    numpy.ndarray
+        組ごとの類似度
+    """
+    products = main_chunk[rows].multiply(sub_vectors[cols]).tocsr()
+    products.sort_indices()
+    starts, lengths = products.indptr[:-1], np.diff(products.indptr)
+    scores = np.zeros(len(rows), dtype=np.float64)
+    for position in range(lengths.max() if len(lengths) > 0 else 0):
+        has_term = lengths > position
+        scores[has_term] += products.data[starts[has_term] + position]
+    return scores
+
+def _blocked_top_k_chunk(main_chunk: csr_matrix, sub_vectors: csr_matrix, sub_vectors_t: csr_matrix, sub_index: csr_matrix,
+                         gram_rank: np.ndarray, threshold: float, k: int):
+    """
+    結合元の一部の行について、プレフィックスのN-gramを共有する結合先のみの類似度から上位k件を取得する。
+    候補のk件目の類似度が閾値未満の行は、候補以外に類似度が高い結合先があり得るため全ての結合先と計算する。
+    """
+    # 転置インデックス（N-gram→結合先）から候補の組を取得する
+    candidates = (prefix_vectors(main_chunk, gram_rank, threshold) @ sub_index).tocsr()
+    if candidates.nnz > BLOCKING_MAX_CANDIDATE_RATIO * main_chunk.shape[0] * sub_vectors.shape[0]:
+        return _top_k_chunk(main_chunk, sub_vectors_t, k)
+    rows = np.repeat(np.arange(main_chunk.shape[0]), np.diff(candidates.indptr))
+    cols = candidates.indices.astype(np.int64)
+    # 候補の組のみ類似度を計算する
+    scores = pair_similarities(main_chunk, sub_vectors, rows, cols)
+    top, top_scores = _top_k_pairs(rows, cols, scores, main_chunk.shape[0], k)
+    below = np.flatnonzero((top[:, k - 1] < 0) | (top_scores[:, k - 1] < threshold))
+    if len(below) > 0:
+        top[below], top_scores[below] = _top_k_chunk(main_chunk[below], sub_vectors_t, k)
+    return top, top_scores
+
+def _top_k_chunk(main_chunk: csr_matrix, sub_vectors_t: csr_matrix, k: int):
+    """
+    結合元の一部の行について、類似度の上位k件の結合先の位置と類似度を取得する
+    """
+    similarities = (main_chunk @ sub_vectors_t).toarray()
+    rows = np.arange(similarities.shape[0])[:, None]
+    if k == 1:
+        # 同じ類似度の場合は位置が小さい結合先を採用する
+        top = similarities.argmax(axis=1)[:, None]
+    else:
+        # 上位k件のみを選択し（全体の並べ替えは行わない）、類似度の降順に並べる
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(top, np.argsort(-similarities[rows, top], axis=1, kind='stable'), axis=1)
+    return top, similarities[rows, top]
+
+def top_k_cosine(main_vectors: csr_matrix, sub_vectors: csr_matrix, k: int = 1, threshold: float = None,
+                 max_workers: int = None, max_rows: int = None, chunk_elements: int = SIMILARITY_CHUNK_ELEMENTS,
+                 block_threshold: float = None):
+    """
+    L2正規化したベクトルのコサイン類似度について、結合元の各行に対する上位k件の結合先を取得する。
+    結合元の行を分割して（行数×結合先の件数がchunk_elements以下）スレッドで並列に計算するため、
+    全体の類似度行列は作成せず、使用メモリは結合元の件数によらない。
+    block_thresholdを指定した場合は、N-gramの転置インデックスで候補を絞り込み（ブロッキング）、
+    類似度がblock_threshold以上になり得る結合先（プレフィックスの希少なN-gramを共有する結合先）のみを計算する。
+    候補にblock_threshold以上の結合先がk件ない行のみ全ての結合先と計算するため、結果は全件を計算した場合と同じとなる。
+
+    Parameters
+    ----------
+    main_vectors : scipy.sparse.csr_matrix
+        結合元のベクトル
+    sub_vectors : scipy.sparse.csr_matrix
+        結合先のベクトル
+    k : int, optional
+        取得する件数
+    threshold : float, optional
+        類似度の閾値。指定した場合は閾値未満の結合先を除外する。
+    max_workers : int, optional
+        並列に計算するスレッド数（デフォルト: CPUのコア数）
+    max_rows : int, optional
+        1回に計算する結合元の行数の上限
+    chunk_elements : int, optional
+        1回に計算する類似度の要素数の上限
+    block_threshold : float, optional
+        ブロッキングで候補を絞り込む類似度の閾値。指定しない場合は全ての結合先との類似度を計算する。
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        結合元の行×k件の結合先の位置と類似度（類似度の降順）。
+        結合先がk件未満、または閾値未満の場合の位置は-1、類似度は0。
+    """
+    n_main, n_sub = main_vectors.shape[0], sub_vectors.shape[0]
+    k_found = min(k, n_sub)
+    indices = np.full((n_main, k), -1, dtype=np.int64)
+    scores = np.zeros((n_main, k), dtype=np.float64)
+    if n_main == 0 or k_found == 0:
+        return indices, scores
+
+    chunk_rows = max(1, chunk_elements // n_sub)
+    sub_vectors_t = sub_vectors.T.tocsr()
+    if block_threshold is not None:
+        chunk_rows = min(chunk_rows, BLOCKING_CHUNK_ROWS)
+        gram_rank = gram_rarity_rank(sub_vectors)
+        # 転置インデックス（N-gram×結合先。N-gramを含む結合先を1とした行列）
+        sub_index = csr_matrix((np.ones(sub_vectors.nnz), sub_vectors.indices, sub_vectors.indptr), shape=sub_vectors.shape).T.tocsr()
+    if max_rows:
+        chunk_rows = min(chunk_rows, max_rows)
+    starts = range(0, n_main, chunk_rows)
+    max_workers = max(1, min(int(max_workers) if max_workers else (os.cpu_count() or 1), len(starts)))
+
+    def compute(start):
+        main_chunk = main_vectors[start:start + chunk_rows]
+        if block_threshold is not None:
+            return _blocked_top_k_chunk(main_chunk, sub_vectors, sub_vectors_t, sub_index, gram_rank, block_threshold, k_found)
+        return _top_k_chunk(main_chunk, sub_vectors_t, k_found)
+
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            chunks = list(executor.map(compute, starts))
+    else:
+        chunks = [compute(start) for start in starts]
+
+    for start, (top, top_scores) in zip(starts, chunks):
+        indices[start:start + len(top), :k_found] = top
+        scores[start:start + len(top), :k_found] = top_scores
+
+    if threshold is not None:
+        below = scores < threshold
+        indices[below] = -1
+        scores[below] = 0
+    return indices, scores
+
+def lsh_band_keys(vectors: csr_matrix, num_perm: int = LSH_NUM_PERM, bands: int = LSH_BANDS, seed: int = 0):
+    """
+    各行のN-gramの集合のMinHash署名を作成し、バンドごとのキーに変換する。
+    同じseedでは同じハッシュ関数を使用するため、結合元と結合先で同じseedを指定する。
+
+    Parameters
+    ----------
+    vectors : scipy.sparse.csr_matrix
+        N-gramのベクトル（値が0でない列の集合を使用する）
+    num_perm : int, optional
+        署名の長さ（bandsの倍数）
+    bands : int, optional
+        バンド数
+    seed : int, optional
+        ハッシュ関数の乱数のシード
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        行×バンドのキー（uint64）と、N-gramを含む行かどうか
+    """
+    rows_per_band = num_perm // bands
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, LSH_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, LSH_PRIME, size=num_perm, dtype=np.uint64)
+    band_weights = rng.integers(1, np.iinfo(np.int64).max, size=rows_per_band, dtype=np.uint64)
+
+    n_rows = vectors.shape[0]
+    has_terms = np.diff(vectors.indptr) > 0
+    keys = np.zeros((n_rows, bands), dtype=np.uint64)
+    # N-gram×ハッシュ関数の要素数が上限を超えないように行を分割する
+    mean_terms = max(1, vectors.nnz // max(n_rows, 1))
+    chunk_rows = max(1, SIMILARITY_CHUNK_ELEMENTS // (num_perm * mean_terms))
+    for start in range(0, n_rows, chunk_rows):
+        chunk = vectors[start:start + chunk_rows]
+        nonempty = np.flatnonzero(np.diff(chunk.indptr) > 0)
+        if len(nonempty) == 0:
+            continue
+        # N-gramごとにハッシュ値を計算し、行ごとの最小値を署名とする
+        hashes = (chunk.indices.astype(np.uint64)[:, None] * a + b) % np.uint64(LSH_PRIME)
+        signatures = np.minimum.reduceat(hashes, chunk.indptr[nonempty], axis=0)
+        # バンドごとに署名の値を重み付きで合計（オーバーフローは切り捨て）してキーとする
+        band_keys = (signatures.reshape(len(nonempty), bands, rows_per_band) * band_weights).sum(axis=2, dtype=np.uint64)
+        keys[start + nonempty] = band_keys
+    return keys, has_terms
+
+def _lsh_bucket_ranges(main_keys: np.ndarray, main_has_terms: np.ndarray, sorted_keys: np.ndarray, band: int):
+    """
+    結合元の各行について、バンドのキーが一致する結合先の範囲（並べ替えた結合先の位置）を取得する
+    """
+    keys = main_keys[:, band]
+    lower = np.searchsorted(sorted_keys, keys, side='left')
+    upper = np.searchsorted(sorted_keys, keys, side='right')
+    return lower, np.where(main_has_terms, upper - lower, 0)
+
+def _lsh_candidates(main_keys: np.ndarray, main_has_terms: np.ndarray, sub_sorted_keys: list, n_sub: int):
+    """
+    いずれかのバンドのキーが一致する結合元の行と結合先の組を取得する（行の昇順、重複なし）。
+    組は結合元の行×結合先の件数（n_sub）＋結合先の位置の1つの値として重複を除く。
+    """
+    rows, cols = [], []
+    for band, (sorted_keys, order) in enumerate(sub_sorted_keys):
+        lower, counts = _lsh_bucket_ranges(main_keys, main_has_terms, sorted_keys, band)
+        # 各行のキーが一致する結合先の範囲を展開する
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        rows.append(np.repeat(np.arange(len(main_keys)), counts))
+        cols.append(order[np.repeat(lower, counts) + offsets])
+    pairs = np.unique(np.concatenate(rows).astype(np.int64) * n_sub + np.concatenate(cols))
+    return np.divmod(pairs, n_sub)
+
+def lsh_top_k_cosine(main_vectors: csr_matrix, sub_vectors: csr_matrix, k: int = 1, threshold: float = None,
+                     num_perm: int = LSH_NUM_PERM, bands: int = LSH_BANDS, seed: int = 0,
+                     max_workers: int = None, max_rows: int = None):
+    """
+    MinHash-LSHで候補を絞り込み、候補との類似度のみから結合元の各行に対する上位k件の結合先を取得する（近似）。
+    N-gramの集合のMinHash署名をバンドに分割し、いずれかのバンドが一致する結合先（同じバケット）のみ
+    コサイン類似度を計算するため、類似度が高い結合先を取りこぼす場合がある。
+    同じseedでは同じ結果となる。
+
+    Parameters
+    ----------
+    main_vectors : scipy.sparse.csr_matrix
+        結合元のベクトル
+    sub_vectors : scipy.sparse.csr_matrix
+        結合先のベクトル
+    k : int, optional
+        取得する件数
+    threshold : float, optional
+        類似度の閾値。指定した場合は閾値未満の結合先を除外する。
+    num_perm : int, optional
+        MinHashの署名の長さ
+    bands : int, optional
+        LSHのバンド数
+    seed : int, optional
+        MinHashのハッシュ関数の乱数のシード
+    max_workers : int, optional
+        並列に計算するスレッド数（デフォルト: CPUのコア数）
+    max_rows : int, optional
+        1回に計算する結合元の行数の上限
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        結合元の行×k件の結合先の位置と類似度（類似度の降順）。
+        候補がk件未満、または閾値未満の場合の位置は-1、類似度は0。
+    """
+    n_main, n_sub = main_vectors.shape[0], sub_vectors.shape[0]
+    k_found = min(k, n_sub)
+    indices = np.full((n_main, k), -1, dtype=np.int64)
+    scores = np.zeros((n_main, k), dtype=np.float64)
+    if n_main == 0 or k_found == 0:
+        return indices, scores
+
+    # 結合先のキーはバンドごとに並べ替え、N-gramを含まない行は除外する
+    sub_keys, sub_has_terms = lsh_band_keys(sub_vectors, num_perm, bands, seed)
+    valid_sub = np.flatnonzero(sub_has_terms)
+    if len(valid_sub) == 0:
+        # N-gramを含む結合先がない場合は候補なし
+        return indices, scores
+    sub_sorted_keys = []
+    for band in range(bands):
+        order = valid_sub[np.argsort(sub_keys[valid_sub, band], kind='stable')]
+        sub_sorted_keys.append((sub_keys[order, band], order))
+    main_keys, main_has_terms = lsh_band_keys(main_vectors, num_perm, bands, seed)
+
+    # 同じバケットの結合先が多い行があるため、候補の組の数（バンドごとの重複を含む）が上限を超えないように行を分割する
+    candidate_counts = np.zeros(n_main, dtype=np.int64)
+    for band, (sorted_keys, _) in enumerate(sub_sorted_keys):
+        candidate_counts += _lsh_bucket_ranges(main_keys, main_has_terms, sorted_keys, band)[1]
+    cumulative = np.cumsum(candidate_counts)
+    chunk_rows = min(max_rows or BLOCKING_CHUNK_ROWS, BLOCKING_CHUNK_ROWS)
+    bounds, start = [], 0
+    while start < n_main:
+        offset = cumulative[start - 1] if start > 0 else 0
+        end = int(np.searchsorted(cumulative, offset + SIMILARITY_CHUNK_ELEMENTS, side='right'))
+        end = min(max(end, start + 1), start + chunk_rows, n_main)
+        bounds.append((start, end))
+        start = end
+    max_workers = max(1, min(int(max_workers) if max_workers else (os.cpu_count() or 1), len(bounds)))
+
+    def compute(bound):
+        start, end = bound
+        rows, cols = _lsh_candidates(main_keys[start:end], main_has_terms[start:end], sub_sorted_keys, n_sub)
+        chunk_scores = pair_similarities(main_vectors[start:end], sub_vectors, rows, cols)
+        return _top_k_pairs(rows, cols, chunk_scores, end - start, k_found)
+
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            chunks = list(executor.map(compute, bounds))
+    else:
+        chunks = [compute(bound) for bound in bounds]
+
+    for (start, _), (top, top_scores) in zip(bounds, chunks):
+        indices[start:start + len(top), :k_found] = top
+        scores[start:start + len(top), :k_found] = top_scores
+
+    if threshold is not None:
+        below = scores < threshold
+        indices[below] = -1
+        scores[below] = 0
+    return indices, scores
+
+def exact_sample_scores(main_vectors: csr_matrix, sub_vectors: csr_matrix, sample_rows: int = LSH_RECALL_SAMPLE_ROWS,
+                        seed: int = 0, max_rows: int = None):
+    """
+    結合元の行を抽出し、全件との類似度の最大値を計算する（LSHの再現率の推定に使用する）。
+    閾値によらず再現率を推定できるように、候補の絞り込みは行わない。
+
+    Parameters
+    ----------
+    main_vectors : scipy.sparse.csr_matrix
+        結合元のベクトル
+    sub_vectors : scipy.sparse.csr_matrix
+        結合先のベクトル
+    sample_rows : int, optional
+        抽出する行数
+    seed : int, optional
+        行の抽出の乱数のシード
+    max_rows : int, optional
+        1回に計算する結合元の行数の上限
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        抽出した行の位置（昇順）と、各行の全件との類似度の最大値
+    """
+    rows = np.sort(np.random.default_rng(seed).permutation(main_vectors.shape[0])[:sample_rows])
+    _, scores = top_k_cosine(main_vectors[rows], sub_vectors, k=1, max_rows=max_rows)
+    return rows, scores[:, 0]
+
+def estimate_lsh_recall(lsh_scores: np.ndarray, exact_scores: np.ndarray, threshold: float):
+    """
+    LSHの結果の再現率を推定する。全件と比較した最大の類似度が閾値以上の行のうち、
+    LSHでも同じ類似度の結合先を取得できた行の割合とする。
+
+    Parameters
+    ----------
+    lsh_scores : numpy.ndarray
+        exact_sample_scoresで抽出した行の、lsh_top_k_cosineで取得した最大の類似度
+    exact_scores : numpy.ndarray
+        exact_sample_scoresで計算した全件との類似度の最大値
+    threshold : float
+        類似度の閾値
+
+    Returns
+    -------
+    float or None
+        推定した再現率。抽出した行に閾値以上の結合先がない場合はNone。
+    """
+    relevant = exact_scores >= threshold
+    if not relevant.any():
+        return None
+    found = lsh_scores >= exact_scores - PREFIX_TOLERANCE
+    return float((found & relevant).sum() / relevant.sum())
@@ -0,0 +1,74 @@
+import re
+import numpy as np
+import pandas as pd
+
+
+# 建物構造の分類名称（リストの位置を分類のコードとする。学習（E021）と推論（E022）で共通）
+STRUCTURE_CATEGORIES = ["RC造", "SRC造", "S造", "その他", "木造"]
+# 分類ごとの登記構造の表記（複数の分類に該当する場合は、後に記載した分類を優先する）
+STRUCTURE_PATTERNS = {
+    "木造": ["木造"],
+    "RC造": ["RC造", "鉄筋コンクリート造"],
+    "S造": ["S造", "鉄骨造"],
+    "SRC造": ["SRC造", "鉄骨鉄筋コンクリート造"]
+}
+# いずれの表記も含まない構造の分類名称
+STRUCTURE_OTHER = "その他"
+# 構造が不明な建物（登記データと名寄せできなかった建物など）のコード
+STRUCTURE_UNKNOWN_CODE = len(STRUCTURE_CATEGORIES)
+# 学習・推論で使用する構造のカテゴリ型（データに含まれる値によらず同じカテゴリとする）
+STRUCTURE_DTYPE = pd.CategoricalDtype(categories=list(range(len(STRUCTURE_CATEGORIES) + 1)))
+
+# 各分類の表記を含むかを一度に判定する正規表現（先読みで分類ごとにグループを取得する）
+STRUCTURE_REGEX = "(?s)" + "".join(
+    f"(?=.*?(?P<g{i}>{'|'.join(re.escape(value) for value in values)}))?"
+    for i, values in enumerate(STRUCTURE_PATTERNS.values())
+)
+
+
+def classify_structure_codes(structures: pd.Series) -> pd.Series:
+    """
+    登記構造の表記を建物構造の分類のコードに変換する
+
+    Parameters
+    ----------
+    structures : pandas.Series
+        登記構造の列
+
+    Returns
+    -------
+    pandas.Series
+        分類のコード（STRUCTURE_CATEGORIESの位置）。いずれの表記も含まない場合は「その他」のコード。
+    """
+    # 構造の表記は重複が多いため、重複を除いた値のみを判定して各行に割り当てる
+    codes, uniques = pd.factorize(structures)
+    matches = pd.Series(uniques, dtype=object).astype(str).str.extract(STRUCTURE_REGEX)
+
+    category_codes = [STRUCTURE_CATEGORIES.index(name) for name in STRUCTURE_PATTERNS]
+    # 後に記載した分類を優先するため、逆順に条件を並べる
+    conditions = [matches[f"g{i}"].notna().to_numpy() for i in reversed(range(len(category_codes)))]
+    unique_codes = np.select(conditions, category_codes[::-1], default=STRUCTURE_CATEGORIES.index(STRUCTURE_OTHER))
+
+    # 欠損値（factorizeのコード-1）は「その他」とする
+    unique_codes = np.append(unique_codes, STRUCTURE_CATEGORIES.index(STRUCTURE_OTHER)).astype(np.int64)
+    return pd.Series(unique_codes[codes], index=structures.index, name=structures.name)
+
+def to_structure_category(codes: pd.Series) -> pd.Series:
+    """
+    構造のコードの列を学習・推論用のカテゴリ型に変換する。欠損値はSTRUCTURE_UNKNOWN_CODEとする。
+
+    Parameters
+    ----------
+    codes : pandas.Series
+        構造のコードの列
+
+    Returns
+    -------
+    pandas.Series
+        STRUCTURE_DTYPEのカテゴリ型の列。分類のコード以外の値（建物ポリゴンの構造種別など）を
+        含む場合は、データに含まれる値をカテゴリとする。
+    """
+    codes = codes.fillna(STRUCTURE_UNKNOWN_CODE)
+    if codes.isin(STRUCTURE_DTYPE.categories).all():
+        return codes.astype("int64").astype(STRUCTURE_DTYPE)
+    return codes.astype("category")
@@ -0,0 +1,446 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+
+# 使用量の行列の型（水道使用量は整数値が多く、float32で十分な精度がある）
+USAGE_DTYPE = np.float32
+# 水道番号のコードの型
+METER_CODE_DTYPE = np.int32
+# 保存した行列の使用量・行列の水道番号と年月のファイル名
+USAGE_VALUES_FILE = "usage_values.npy"
+USAGE_INDEX_FILE = "usage_index.npz"
+# 前回の保存以降に更新したセルの使用量のファイル名（保存した行列に反映する差分）
+USAGE_DELTA_FILE = "usage_delta.npz"
+# 反映前の更新（IF001の処理全体が完了した時点で反映する）と、反映中の更新を配置するディレクトリ名
+PENDING_DIR = "pending"
+COMMITTING_DIR = "committing"
+# 行列の容量が不足した場合に拡張する倍率と、最小の拡張量（水道番号の行数, 年月の列数）
+CAPACITY_GROWTH = 1.25
+MIN_CAPACITY_GROWTH = (1024, 12)
+
+
+def month_index(dates: pd.Series) -> pd.Series:
+    """
+    日付を年月の通し番号（西暦年×12＋月−1）に変換する
+
+    Parameters
+    ----------
+    dates : pandas.Series
+        datetime64型の列
+
+    Returns
+    -------
+    pandas.Series
+        年月の通し番号。欠損値はNaN。
+    """
+    dates = pd.to_datetime(dates)
+    return dates.dt.year * 12 + dates.dt.month - 1
+
+def month_index_of(date) -> int:
+    """
+    単一の日付を年月の通し番号に変換する
+    """
+    date = pd.Timestamp(date)
+    return date.year * 12 + date.month - 1
+
+def month_label(index: int) -> str:
+    """
+    年月の通し番号を"YYYY-MM"形式の文字列に変換する
+    """
+    year, month = divmod(int(index), 12)
+    return f"{year:04d}-{month + 1:02d}"
+
+def _grown_capacity(capacity: int, needed: int, minimum: int) -> int:
+    """
+    必要な大きさが容量を超える場合の拡張後の容量を返す（拡張の回数を抑えるため余裕を持たせる）
+    """
+    if needed <= capacity:
+        return capacity
+    return max(needed, int(capacity * CAPACITY_GROWTH), capacity + minimum)
+
+def _storable_ids(meter_ids) -> np.ndarray:
+    """
+    水道番号をpickleを使用せずに保存できる配列に変換する（文字列の水道番号はUnicode文字列の配列）
+    """
+    meter_ids = np.asarray(meter_ids)
+    return meter_ids.astype(str) if meter_ids.dtype == object else meter_ids
+
+def _loaded_ids(meter_ids) -> np.ndarray:
+    """
+    保存した水道番号の配列を読み込んだ後の配列に変換する（Unicode文字列の配列はstrのobject配列）
+    """
+    return meter_ids.astype(object) if meter_ids.dtype.kind == "U" else meter_ids
+
+
+class UsageMatrix:
+    """
+    水道番号×年月の使用量の行列
+
+    行は水道番号（作成時は昇順。add_recordsで追加した水道番号は末尾）、列は使用量の記録がある年月
+    （作成時は昇順。add_recordsで追加した年月は末尾）に対応する。
+    記録がない水道番号・年月の組み合わせは欠損値（NaN）とする。
+    使用量は年月ごとに連続する列優先（Fortran order）の配列に格納し、容量に余裕を持たせて拡張するため、
+    新しい月の追加では行列全体を再作成しない。
+    memmap_pathを指定した場合は行列をファイルに配置し（numpy.memmap）、
+    長期間・大規模な使用量データでもメモリを圧迫しないようにする。
+
+    saveで保存した行列に新しい月の使用量をadd_recordsで追加することで、全期間のデータを読み込み直さずに更新できる。
+    更新はstageで反映前の更新として配置し、commitで保存した行列に反映する（処理全体が成功した場合のみ反映するため）。
+
+    Attributes
+    ----------
+    meter_ids : numpy.ndarray
+        各行の水道番号
+    months : numpy.ndarray
+        各列の年月の通し番号（int32）
+    data : numpy.ndarray or numpy.memmap
+        使用量を格納する配列（float32）。容量の余裕を含み、先頭の水道番号の数×年月の数の範囲を使用する。
+    loaded : bool
+        保存した行列を読み込んだ行列か（stageでは更新したセルのみを配置する）
+    """
+
+    def __init__(self, meter_ids, months, data):
+        self.meter_ids = np.asarray(meter_ids)
+        self.months = np.asarray(months, dtype=np.int32)
+        self.data = data
+        self.loaded = False
+        # add_recordsで更新したセルの行・列の位置
+        self._updated_rows = []
+        self._updated_cols = []
+        self._update_index()
+
+    def _update_index(self):
+        """
+        水道番号の検索用のインデックスと、年月の昇順に並べた列の位置を更新する
+        """
+        self._meter_index = pd.Index(self.meter_ids)
+        self._order = np.argsort(self.months, kind="stable")
+        self._sorted_months = self.months[self._order]
+
+    @property
+    def values(self):
+        """
+        使用量の行列（水道番号×年月。容量の余裕を除いた範囲）
+        """
+        return self.data[:len(self.meter_ids), :len(self.months)]
+
+    @classmethod
+    def from_records(cls, meter_ids, months, usage, memmap_path=None):
+        """
+        水道番号・年月・使用量の列から行列を作成する。
+        同一の水道番号・年月の使用量は合計する（欠損値は0として扱う）。
+
+        Parameters
+        ----------
+        meter_ids : array-like
+            水道番号
+        months : array-like
+            年月の通し番号
+        usage : array-like
+            使用量
+        memmap_path : str, optional
+            行列を配置するファイルのパス。指定しない場合はメモリ上に作成する。
+
+        Returns
+        -------
+        UsageMatrix
+            水道番号×年月の使用量の行列
+        """
+        meter_codes, meter_uniques = pd.factorize(pd.Series(meter_ids), sort=True)
+        month_codes, month_uniques = pd.factorize(pd.Series(months), sort=True)
+        valid = (meter_codes >= 0) & (month_codes >= 0)
+        meter_codes = meter_codes[valid].astype(METER_CODE_DTYPE)
+        month_codes = month_codes[valid]
+        usage = np.nan_to_num(pd.to_numeric(pd.Series(usage)).to_numpy(dtype=float)[valid], nan=0)
+
+        shape = (len(meter_uniques), len(month_uniques))
+        if memmap_path:
+            os.makedirs(os.path.dirname(os.path.abspath(memmap_path)), exist_ok=True)
+            values = np.memmap(memmap_path, dtype=USAGE_DTYPE, mode="w+", shape=shape, order="F")
+        else:
+            values = np.empty(shape, dtype=USAGE_DTYPE, order="F")
+        values[:] = np.nan
+
+        # 水道番号・年月の組み合わせごとに合計し、行列に配置する
+        cells = meter_codes.astype(np.int64) * shape[1] + month_codes
+        cells, inverse = np.unique(cells, return_inverse=True)
+        totals = np.bincount(inverse, weights=usage, minlength=len(cells))
+        rows, cols = np.divmod(cells, shape[1])
+        values[rows, cols] = totals
+
+        return cls(np.asarray(meter_uniques), np.asarray(month_uniques, dtype=np.int32), values)
+
+    @classmethod
+    def exists(cls, directory) -> bool:
+        """
+        保存した行列がディレクトリに存在するか（反映中の更新がある場合は反映を完了してから確認する）
+        """
+        cls.recover(directory)
+        return all(os.path.exists(os.path.join(directory, name)) for name in [USAGE_VALUES_FILE, USAGE_INDEX_FILE])
+
+    @classmethod
+    def load(cls, directory):
+        """
+        saveで保存した行列を読み込む。
+        使用量の配列はファイルに配置したまま読み込み（mmap_mode="c"）、変更はファイルに書き込まない。
+
+        Parameters
+        ----------
+        directory : str
+            保存先のディレクトリ
+
+        Returns
+        -------
+        UsageMatrix
+            水道番号×年月の使用量の行列
+        """
+        cls.recover(directory)
+        return cls._load(directory, "c")
+
+    @classmethod
+    def _load(cls, directory, mmap_mode):
+        """
+        保存した行列を指定したmmap_modeで読み込む（反映中の更新の確認は行わない）
+        """
+        data = np.load(os.path.join(directory, USAGE_VALUES_FILE), mmap_mode=mmap_mode)
+        with np.load(os.path.join(directory, USAGE_INDEX_FILE)) as index:
+            meter_ids, months = _loaded_ids(index["meter_ids"]), index["months"]
+        if data.ndim != 2 or data.shape[0] < len(meter_ids) or data.shape[1] < len(months):
+            raise ValueError(f"保存した水道使用量の行列が不正です: {directory}")
+        matrix = cls(meter_ids, months, data)
+        matrix.loaded = True
+        return matrix
+
+    def save(self, directory):
+        """
+        行列をディレクトリに保存する（各ファイルは保存の完了後に置き換える）
+
+        Parameters
+        ----------
+        directory : str
+            保存先のディレクトリ
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, USAGE_VALUES_FILE)
+        with open(f"{path}.tmp", "wb") as file:
+            np.save(file, np.asarray(self.data))
+        os.replace(f"{path}.tmp", path)
+        self._save_index(directory)
+
+    def _save_index(self, directory):
+        """
+        行列の水道番号と年月を保存する
+        """
+        path = os.path.join(directory, USAGE_INDEX_FILE)
+        with open(f"{path}.tmp", "wb") as file:
+            np.savez(file, meter_ids=_storable_ids(self.meter_ids), months=self.months)
+        os.replace(f"{path}.tmp", path)
+
+    def stage(self, directory):
+        """
+        行列の更新を反映前の更新としてディレクトリに配置する（commitで保存した行列に反映する）。
+        保存した行列を読み込んだ場合はadd_recordsで更新したセルのみ、それ以外は行列全体を配置する。
+
+        Parameters
+        ----------
+        directory : str
+            保存先のディレクトリ
+        """
+        pending = os.path.join(directory, PENDING_DIR)
+        shutil.rmtree(pending, ignore_errors=True)
+        if not self.loaded:
+            self.save(pending)
+            return
+
+        os.makedirs(pending, exist_ok=True)
+        rows = np.concatenate(self._updated_rows) if self._updated_rows else np.array([], dtype=np.int64)
+        cols = np.concatenate(self._updated_cols) if self._updated_cols else np.array([], dtype=np.int64)
+        cells = np.unique(rows.astype(np.int64) * len(self.months) + cols)
+        rows, cols = np.divmod(cells, len(self.months))
+        np.savez(
+            os.path.join(pending, USAGE_DELTA_FILE),
+            meter_ids=_storable_ids(self.meter_ids[rows]), months=self.months[cols], usage=np.asarray(self.data[rows, cols])
+        )
+
+    @classmethod
+    def commit(cls, directory):
+        """
+        stageで配置した更新を保存した行列に反映する（配置した更新がない場合は何もしない）
+
+        Parameters
+        ----------
+        directory : str
+            保存先のディレクトリ
+        """
+        cls.recover(directory)
+        pending = os.path.join(directory, PENDING_DIR)
+        if os.path.isdir(pending):
+            os.replace(pending, os.path.join(directory, COMMITTING_DIR))
+            cls.recover(directory)
+
+    @staticmethod
+    def discard(directory):
+        """
+        stageで配置した反映前の更新を破棄する
+        """
+        shutil.rmtree(os.path.join(directory, PENDING_DIR), ignore_errors=True)
+
+    @classmethod
+    def recover(cls, directory):
+        """
+        反映中の更新（commitで反映を開始した更新）がある場合は反映を完了する。
+        セルの使用量を置き換えるため、途中まで反映した更新を再度反映しても結果は変わらない。
+
+        Parameters
+        ----------
+        directory : str
+            保存先のディレクトリ
+        """
+        committing = os.path.join(directory, COMMITTING_DIR)
+        if not os.path.isdir(committing):
+            return
+
+        delta_path = os.path.join(committing, USAGE_DELTA_FILE)
+        if os.path.exists(delta_path):
+            with np.load(delta_path) as delta:
+                meter_ids, months, usage = _loaded_ids(delta["meter_ids"]), delta["months"], delta["usage"]
+            # 保存した行列のファイルを直接更新する（容量が不足した場合のみファイル全体を書き直す）
+            matrix = cls._load(directory, "r+")
+            data = matrix.data
+            matrix._apply(meter_ids, months, usage)
+            if matrix.data is data:
+                data.flush()
+                matrix._save_index(directory)
+            else:
+                del data
+                matrix.save(directory)
+        else:
+            # 行列全体を配置した場合は、保存した行列のファイルを置き換える（中断した場合は残りのファイルのみ）
+            for name in [USAGE_VALUES_FILE, USAGE_INDEX_FILE]:
+                if os.path.exists(os.path.join(committing, name)):
+                    os.replace(os.path.join(committing, name), os.path.join(directory, name))
+        shutil.rmtree(committing)
+
+    def add_records(self, meter_ids, months, usage):
+        """
+        水道番号・年月・使用量の列を行列に追加する。
+        追加するデータの水道番号・年月ごとの使用量（同一の組み合わせは合計）で、行列の使用量を置き換える。
+        行列にない水道番号・年月は行・列を追加する。同じデータを再度追加しても行列は変わらない。
+
+        Parameters
+        ----------
+        meter_ids : array-like
+            水道番号
+        months : array-like
+            年月の通し番号
+        usage : array-like
+            使用量
+        """
+        records = pd.DataFrame({
+            "meter_id": pd.Series(meter_ids).to_numpy(),
+            "month": pd.Series(months).to_numpy(),
+            "usage": np.nan_to_num(pd.to_numeric(pd.Series(usage)).to_numpy(dtype=float), nan=0),
+        }).dropna(subset=["meter_id", "month"])
+        # 追加するデータを水道番号・年月の組み合わせごとに合計する
+        totals = records.groupby(["meter_id", "month"], sort=False)["usage"].sum()
+        rows, cols = self._apply(
+            totals.index.get_level_values("meter_id").to_numpy(),
+            totals.index.get_level_values("month").to_numpy().astype(np.int32),
+            totals.to_numpy()
+        )
+        self._updated_rows.append(rows)
+        self._updated_cols.append(cols)
+
+    def _apply(self, meter_ids, months, usage):
+        """
+        水道番号・年月ごとの使用量で行列の使用量を置き換える（水道番号・年月の組み合わせは重複しないこと）。
+        行列にない水道番号・年月は末尾に行・列を追加し、容量が不足する場合のみ配列を拡張する。
+
+        Returns
+        -------
+        tuple
+            置き換えたセルの行・列の位置（numpy.ndarray）
+        """
+        new_meters = pd.unique(meter_ids[self.rows_of(meter_ids) < 0])
+        new_months = np.setdiff1d(months, self.months).astype(np.int32)
+        shape = (len(self.meter_ids) + len(new_meters), len(self.months) + len(new_months))
+        capacity = (
+            _grown_capacity(self.data.shape[0], shape[0], MIN_CAPACITY_GROWTH[0]),
+            _grown_capacity(self.data.shape[1], shape[1], MIN_CAPACITY_GROWTH[1]),
+        )
+        if capacity != self.data.shape:
+            data = np.full(capacity, np.nan, dtype=USAGE_DTYPE, order="F")
+            data[:len(self.meter_ids), :len(self.months)] = self.values
+            self.data = data
+        if len(new_meters) > 0 or len(new_months) > 0:
+            # 追加する行・列は容量の余裕の範囲（欠損値）に配置する
+            self.meter_ids = np.concatenate([self.meter_ids, np.asarray(new_meters)])
+            self.months = np.concatenate([self.months, new_months])
+            self._update_index()
+
+        rows = self.rows_of(meter_ids).astype(np.int64)
+        cols = self._order[np.searchsorted(self._sorted_months, months)].astype(np.int64)
+        self.data[rows, cols] = usage
+        return rows, cols
+
+    def __len__(self):
+        return len(self.meter_ids)
+
+    def rows_of(self, meter_ids) -> np.ndarray:
+        """
+        水道番号に対応する行の位置を返す（行列にない水道番号は-1）
+        """
+        return self._meter_index.get_indexer(meter_ids)
+
+    def missing_months(self) -> np.ndarray:
+        """
+        最古から最新の年月の間で、使用量の記録がない年月を返す
+        """
+        if len(self.months) == 0:
+            return np.array([], dtype=np.int32)
+        full_range = np.arange(self.months.min(), self.months.max() + 1, dtype=np.int32)
+        return np.setdiff1d(full_range, self.months)
+
+    def window(self, rows: np.ndarray, start_month: int, end_month: int):
+        """
+        指定した行・期間の使用量を、欠損値を前の年月の値で補完して取得する。
+        補完には期間より前の年月の値も使用する。
+
+        Parameters
+        ----------
+        rows : numpy.ndarray
+            行の位置
+        start_month : int
+            期間の開始年月の通し番号
+        end_month : int
+            期間の終了年月の通し番号
+
+        Returns
+        -------
+        tuple
+            期間内の年月の通し番号（numpy.ndarray、昇順）と、行×年月の使用量の行列（float64）
+        """
+        first = int(np.searchsorted(self._sorted_months, start_month, side="left"))
+        last = int(np.searchsorted(self._sorted_months, end_month, side="right"))
+        months = self._sorted_months[first:last]
+        usage = np.asarray(self.data[np.ix_(rows, self._order[first:last])], dtype=float)
+        if usage.size == 0:
+            return months, usage
+
+        # 期間の先頭が欠損している場合は、期間より前で最後に使用量がある値で補完する
+        if first > 0:
+            before = np.asarray(self.data[np.ix_(rows, self._order[:first])])
+            previous = ~np.isnan(before)
+            has_previous = previous.any(axis=1)
+            last_previous = first - 1 - previous[:, ::-1].argmax(axis=1)
+            seed = np.where(has_previous, before[np.arange(len(rows)), np.maximum(last_previous, 0)].astype(float), np.nan)
+            usage[:, 0] = np.where(np.isnan(usage[:, 0]), seed, usage[:, 0])
+
+        # 前方補完（各セルを、その年月以前で最後に使用量がある年月の値とする）
+        column_index = np.where(~np.isnan(usage), np.arange(usage.shape[1]), 0)
+        np.maximum.accumulate(column_index, axis=1, out=column_index)
+        usage = usage[np.arange(len(usage))[:, None], column_index]
+
+        return months, usage
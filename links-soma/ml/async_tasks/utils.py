@@ -1,6 +1,9 @@
 
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
+import os
 import sqlite3
+import numpy as np
 import pandas as pd
 
 
@@ -112,4 +115,130 @@ def get_data_set_detail_buildings_or_area(data_set_result_id, reference_date=Non
             return pd.read_sql(f"SELECT * FROM {table_name} where data_set_result_id = {data_set_result_id} and reference_date = '{reference_date}'", CONNECTION)
             
     except sqlite3.Error as e:
-        return None
\ No newline at end of file
+        return None
+
+
+# pandas.read_csvが欠損値として扱う文字列
+CSV_NA_VALUES = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+}
+CSV_TRUE_VALUES = {'True', 'TRUE', 'true'}
+CSV_FALSE_VALUES = {'False', 'FALSE', 'false'}
+# CSVに書き出して読み込み直しても型・値が変わらない列の型
+CSV_ROUND_TRIP_DTYPES = {np.dtype('int64'), np.dtype('float64'), np.dtype('bool')}
+
+def _csv_text(series: pd.Series) -> pd.Series:
+    """
+    列の値をCSVに書き出した場合の文字列に変換する（欠損値はNaN）
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        valid = series.dropna()
+        fmt = "%Y-%m-%d" if (valid == valid.dt.normalize()).all() else "%Y-%m-%d %H:%M:%S"
+        text = series.dt.strftime(fmt).astype(object)
+    elif pd.api.types.infer_dtype(series, skipna=True) == "string":
+        # 文字列のみの列は文字列への変換を省略する
+        text = series.astype(object)
+    else:
+        text = series.astype(str).astype(object).where(series.notna(), np.nan)
+    return text.where(~text.isin(CSV_NA_VALUES) & text.notna(), np.nan)
+
+def has_input(source) -> bool:
+    """
+    入力としてファイルパスまたはデータフレームが指定されているかを返す
+    """
+    return isinstance(source, pd.DataFrame) or bool(source)
+
+def frame_like_csv(df: pd.DataFrame, dtype=None) -> pd.DataFrame:
+    """
+    DataFrameをCSVに保存して pandas.read_csv で読み込み直した場合と同じ値・型にそろえる。
+    ステージ間でDataFrameを直接受け渡す際に、ファイル経由の場合と処理結果を一致させるために使用する。
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        変換対象のデータフレーム
+    dtype : type, optional
+        strを指定した場合は read_csv(dtype=str) と同じくすべての列を文字列として扱う
+
+    Returns
+    -------
+    pandas.DataFrame
+        変換後のデータフレーム
+    """
+    # 列はコピーせずに受け渡し、読み込み直すと型・値が変わる列のみを置き換える
+    result = df.copy(deep=False)
+    result.columns = [str(col) for col in df.columns]
+    result.index = pd.RangeIndex(len(df))
+    for i in range(df.shape[1]):
+        series = df.iloc[:, i]
+        if dtype is None and series.dtype in CSV_ROUND_TRIP_DTYPES:
+            # 数値・真偽値の列は書き出し後も同じ型で読み込まれる
+            continue
+
+        text = _csv_text(series)
+        valid = text.dropna()
+        if dtype is str:
+            values = text.to_numpy()
+        elif len(valid) == 0:
+            values = np.full(len(text), np.nan)
+        elif valid.isin(CSV_TRUE_VALUES | CSV_FALSE_VALUES).all():
+            values = text.isin(CSV_TRUE_VALUES)
+            values = values.to_numpy() if len(valid) == len(text) else values.astype(object).where(text.notna(), np.nan).to_numpy()
+        else:
+            try:
+                # 数値に変換できない値があれば、その時点で文字列の列と判定する
+                values = pd.to_numeric(text).to_numpy()
+            except (ValueError, TypeError):
+                values = text.to_numpy()
+        result.isetitem(i, values)
+
+    return result
+
+def run_in_process_pool(worker, tasks, max_workers=None, set_error=None, on_complete=None) -> dict:
+    """
+    互いに依存しない処理をプロセスプールで並列に実行する（max_workersが1以下の場合は順番に実行する）。
+    workerは処理結果（result）と、エラー時のエラーコード・メッセージ（error_code, error_msg, exception）を辞書で返す。
+
+    Parameters
+    ----------
+    worker : callable
+        各処理を実行するモジュールレベルの関数（ワーカーのプロセスに渡すため）
+    tasks : list
+        (キー, workerの引数のタプル) のリスト
+    max_workers : int or str, optional
+        並列に実行するプロセス数（デフォルト: CPUのコア数。処理の数を上限とする）
+    set_error : callable, optional
+        ワーカーで設定されたエラーを呼び出し元に反映する関数（呼び出し元モジュールのset_error）
+    on_complete : callable, optional
+        各処理の完了時にキーを引数として呼び出す関数（進捗の更新用。tasksの順番に呼び出す）
+
+    Returns
+    -------
+    dict
+        キーごとの処理結果
+
+    Raises
+    ------
+    Exception
+        いずれかの処理でエラーが発生した場合（未実行の処理は取り消す）
+    """
+    max_workers = min(int(max_workers) if max_workers else (os.cpu_count() or 1), max(len(tasks), 1))
+    results = {}
+    executor = ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+    try:
+        futures = [executor.submit(worker, *args) if executor else None for _, args in tasks]
+        for (key, args), future in zip(tasks, futures):
+            outcome = future.result() if future else worker(*args)
+            if outcome["exception"] is not None:
+                # ワーカーで設定されたエラーを呼び出し元に反映する
+                if outcome["error_code"] is not None and set_error is not None:
+                    set_error({"code": outcome["error_code"], "message": outcome["error_msg"]})
+                raise Exception(f"{key}の処理中にエラーが発生しました: {outcome['exception']}")
+            results[key] = outcome["result"]
+            if on_complete is not None:
+                on_complete(key)
+    finally:
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+    return results
@@ -4,15 +4,19 @@
 """
 
 import copy
+import hashlib
 import json
 import os
 import re
+import sqlite3
 import sys
+import types
 import unicodedata
 import argparse
 import chardet
 import pandas as pd
 import warnings
+from contextlib import closing
 
 warnings.filterwarnings("ignore")
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -23,11 +27,13 @@ if async_tasks_path not in sys.path:
 try:
     from utils import *
     from constants import *
+    from date_utils import *
 except ImportError:
     sys.path.remove(async_tasks_path)
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
     from async_tasks.utils import *
     from async_tasks.constants import *
+    from async_tasks.date_utils import *
 
 # 入力する各データのカラムを定義
 INPUT_COLUMNS = {
@@ -143,7 +149,7 @@ class DataProcessor:
         self.OUTPUT_PATHS = output_paths
         
     @staticmethod
-    def save_csv(df, path):
+    def save_csv(df, path, mode='w'):
         """
         データフレームをCSVファイルとして保存する。
         Shift-JIS、CP932、UTF-8の順で保存を試みる。
@@ -154,6 +160,8 @@ class DataProcessor:
             保存するデータフレーム
         path : str
             保存先のファイルパス
+        mode : str, optional
+            'w'の場合はヘッダー付きで新規作成し、'a'の場合はヘッダーなしで追記する
         """
 
         # エンコーディングの優先順位リスト
@@ -163,7 +171,7 @@ class DataProcessor:
         for encoding in encodings:
             try:
                 # データフレームをCSVとして保存
-                df.to_csv(path, encoding=encoding, index=False, errors='replace')
+                df.to_csv(path, encoding=encoding, index=False, errors='replace', mode=mode, header=(mode == 'w'))
                 return
             except Exception as e:
                 # エラーが発生した場合、メッセージを表示して次のエンコーディングを試す
@@ -427,7 +435,349 @@ class CleanData:
             return CleanData.convert_short_date_to_full_date(date_str)
         except:
             return date_str
-    
+
+
+def _code_fingerprint(code):
+    """
+    関数の処理内容（バイトコード・定数・参照する名前）を、実行ごとに変わらない値に変換する
+    """
+    consts = [_code_fingerprint(const) if isinstance(const, types.CodeType) else const for const in code.co_consts]
+    return [code.co_code, consts, code.co_names]
+
+
+# 住所の正規化を列単位で一括処理するクラス
+class AddressNormalizer:
+    """
+    CleanDataの住所正規化（normalize_text → convert_fullwidth_to_halfwidth_digits →
+    convert_halfwidth_to_fullwidth → replace_single_katakana → convert_address）を
+    pandas.Seriesに対して列単位で適用する。
+    正規表現と変換テーブルはクラス定義時に一度だけ構築し、行ごとの再構築を行わない。
+    """
+    # 正規化ルールのバージョン（パターン・変換テーブル・置換関数の処理内容以外の変更で結果が変わる場合に更新する）
+    RULES_VERSION = 1
+
+    # 都道府県名リスト
+    PREFECTURES = [
+        "北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県",
+        "茨城県", "栃木県", "群馬県", "埼玉県", "千葉県", "東京都", "神奈川県",
+        "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県", "岐阜県",
+        "静岡県", "愛知県", "三重県", "滋賀県", "京都府", "大阪府", "兵庫県",
+        "奈良県", "和歌山県", "鳥取県", "島根県", "岡山県", "広島県", "山口県",
+        "徳島県", "香川県", "愛媛県", "高知県", "福岡県", "佐賀県", "長崎県",
+        "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県"
+    ]
+
+    # 変換テーブル
+    FULLWIDTH_DIGITS_TABLE = str.maketrans("０１２３４５６７８９", "0123456789")
+    HALFWIDTH_KATAKANA_TABLE = str.maketrans(
+        "ｦｧｨｩｪｫｬｭｮｯｰｱｲｳｴｵｶｷｸｹｺｻｼｽｾｿﾀﾁﾂﾃﾄﾅﾆﾇﾈﾉﾊﾋﾌﾍﾎﾏﾐﾑﾒﾓﾔﾕﾖﾗﾘﾙﾚﾛﾜﾝﾞﾟ",
+        "ヲァィゥェォャュョッーアイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン゛゜"
+    )
+
+    # 濁点・半濁点の結合
+    DAKUTEN_PATTERN = re.compile(r'(\w゛)')
+    HANDAKUTEN_PATTERN = re.compile(r'(\w゜)')
+
+    # 単独カタカナ（置換パターン, 置換後の文字）
+    SINGLE_KATAKANA_RULES = [
+        (re.compile(r'(?<![ｦ-ﾟ])ﾉ(?![ｦ-ﾟ])|(?<![ァ-ン])ノ(?![ァ-ン])'), "の"),
+        (re.compile(r'(?<![ｦ-ﾟ])ｹ(?![ｦ-ﾟ])|(?<![ァ-ン])ケ(?![ァ-ン])'), "が"),
+        (re.compile(r'(?<![ｦ-ﾟ])ﾂ(?![ｦ-ﾟ])|(?<![ァ-ン])ツ(?![ァ-ン])'), "つ"),
+    ]
+
+    # convert_addressの各変換（適用順）
+    PREFECTURE_PATTERN = re.compile("^(" + "|".join(map(re.escape, PREFECTURES)) + ")")
+    CITY_PATTERN = re.compile(r'[^\s]+?[市]')
+    ADDRESS_RULES = [
+        # 全角・半角スペースを削除
+        (re.compile(r'[\s　]+'), ''),
+        # ハイフンを半角ハイフン（U+002D）に変換
+        (re.compile(r'[－—―−]'), '-'),
+        # 丁目をハイフンに変換
+        (re.compile(r"(\d+)丁目"), r"\1-"),
+        # 番地をハイフンに変換
+        (re.compile(r"(\d+)番地の(\d+号?)"), r"\1-\2"),
+        (re.compile(r"(\d+)番地?(\d+号?)"), r"\1-\2"),
+        (re.compile(r"(\d+)番地?$"), r"\1"),
+        # 連続する半角ハイフンを一つに統合
+        (re.compile(r'-+'), '-'),
+        # 末尾のハイフンを削除
+        (re.compile(r'-$'), ''),
+        # すべてのピリオド（半角と全角）を削除
+        (re.compile(r'[\u002E\uFF0E]'), ''),
+    ]
+    KANJI_CHOME_PATTERN = re.compile(r'([一二三四五六七八九十]+)丁目')
+
+    @classmethod
+    def normalize(cls, series):
+        """
+        住所の列を正規化する
+
+        Parameters
+        ----------
+        series : pandas.Series
+            正規化対象の住所列
+
+        Returns
+        -------
+        pandas.Series
+            正規化された住所列。文字列以外の値はそのまま返す。
+        """
+        is_str = series.map(lambda x: isinstance(x, str)).astype(bool)
+        if not is_str.any():
+            return series.copy()
+
+        s = series[is_str].astype(object)
+
+        # normalize_text / convert_fullwidth_to_halfwidth_digits
+        s = s.str.normalize("NFKC").str.translate(cls.FULLWIDTH_DIGITS_TABLE)
+
+        # convert_halfwidth_to_fullwidth
+        s = s.str.translate(cls.HALFWIDTH_KATAKANA_TABLE)
+        s = s.str.replace(cls.DAKUTEN_PATTERN, cls._combine_dakuten, regex=True)
+        s = s.str.replace(cls.HANDAKUTEN_PATTERN, cls._combine_handakuten, regex=True)
+
+        # replace_single_katakana
+        for pattern, repl in cls.SINGLE_KATAKANA_RULES:
+            s = s.str.replace(pattern, repl, regex=True)
+
+        # convert_address
+        s = s.str.replace(cls.PREFECTURE_PATTERN, "", regex=True)
+        s = s.str.replace(cls.CITY_PATTERN, "", n=1, regex=True)
+        for pattern, repl in cls.ADDRESS_RULES:
+            s = s.str.replace(pattern, repl, regex=True)
+        s = s.str.replace(cls.KANJI_CHOME_PATTERN, kanji_to_chome, regex=True)
+
+        result = series.astype(object).copy()
+        result[is_str] = s
+        return result
+
+    @staticmethod
+    def _combine_dakuten(match):
+        """
+        濁点（゛）の前の文字を濁音の文字に変換する
+        """
+        return chr(ord(match.group(1)[0]) + 1)
+
+    @staticmethod
+    def _combine_handakuten(match):
+        """
+        半濁点（゜）の前の文字を半濁音の文字に変換する
+        """
+        return chr(ord(match.group(1)[0]) + 2)
+
+    @classmethod
+    def rules_version(cls):
+        """
+        正規化ルールのバージョン文字列を返す。
+        RULES_VERSIONと各正規表現・変換テーブル、置換関数・normalizeの処理内容（バイトコード）から生成するため、
+        ルールや変換の手順を変更すると値が変わる。
+
+        Returns
+        -------
+        str
+            正規化ルールのバージョン文字列
+        """
+        rules = [
+            cls.RULES_VERSION,
+            sorted(cls.FULLWIDTH_DIGITS_TABLE.items()),
+            sorted(cls.HALFWIDTH_KATAKANA_TABLE.items()),
+            cls.DAKUTEN_PATTERN.pattern,
+            cls.HANDAKUTEN_PATTERN.pattern,
+            [(pattern.pattern, repl) for pattern, repl in cls.SINGLE_KATAKANA_RULES],
+            cls.PREFECTURE_PATTERN.pattern,
+            cls.CITY_PATTERN.pattern,
+            [(pattern.pattern, repl) for pattern, repl in cls.ADDRESS_RULES],
+            cls.KANJI_CHOME_PATTERN.pattern,
+            sorted(kanji_to_number.items()),
+            [_code_fingerprint(func.__code__) for func in [
+                cls.normalize.__func__, cls._combine_dakuten, cls._combine_handakuten, kanji_to_chome, kanji_to_arabic
+            ]],
+        ]
+        digest = hashlib.sha1(repr(rules).encode("utf-8")).hexdigest()[:12]
+        return f"{cls.RULES_VERSION}-{digest}"
+
+    @staticmethod
+    def normalize_row(text):
+        """
+        CleanDataの関数を1件ずつ適用して住所を正規化する（照合用の基準実装）
+
+        Parameters
+        ----------
+        text : str
+            正規化対象の住所
+
+        Returns
+        -------
+        str
+            正規化された住所
+        """
+        text = CleanData.normalize_text(text)
+        text = CleanData.convert_fullwidth_to_halfwidth_digits(text)
+        text = CleanData.convert_halfwidth_to_fullwidth(text)
+        text = CleanData.replace_single_katakana(text)
+        return CleanData.convert_address(text)
+
+    @classmethod
+    def verify(cls, series):
+        """
+        列単位の正規化結果が1件ずつの正規化結果と一致するかを照合する
+
+        Parameters
+        ----------
+        series : pandas.Series
+            照合対象の住所列
+
+        Returns
+        -------
+        pandas.DataFrame
+            結果が一致しなかった行（元の住所, 列単位の結果, 1件ずつの結果）。すべて一致した場合は空。
+        """
+        vectorized = cls.normalize(series)
+        row_wise = series.apply(cls.normalize_row)
+        matched = (vectorized == row_wise) | (vectorized.isna() & row_wise.isna())
+        return pd.DataFrame({
+            "address": series[~matched],
+            "vectorized": vectorized[~matched],
+            "row_wise": row_wise[~matched],
+        })
+
+
+# 住所と正規化住所の対応を保持するキャッシュ
+class AddressCache:
+    """
+    元の住所から正規化住所への対応を保持するキャッシュ。
+    列の重複を除いた住所のみを正規化し、結果を各行に割り当てる。
+    pathを指定した場合はSQLiteファイルに永続化し、IF001の実行をまたいで再利用する。
+    正規化ルールのバージョンが保存時と異なる場合、保存済みの対応はすべて破棄する。
+    """
+    FILE_NAME = "address_cache.sqlite"
+
+    def __init__(self, path=None):
+        """
+        Parameters
+        ----------
+        path : str, optional
+            キャッシュを保存するSQLiteファイルのパス。Noneの場合はメモリ上でのみ保持する。
+        """
+        self.path = path
+        self.version = AddressNormalizer.rules_version()
+        self.memory = {}
+        self.hits = 0
+        self.misses = 0
+        if self.path:
+            self._prepare()
+
+    @classmethod
+    def from_database_path(cls, db_path):
+        """
+        database_pathと同じディレクトリにキャッシュファイルを配置する
+
+        Parameters
+        ----------
+        db_path : str or None
+            アプリケーションのデータベースファイルのパス
+
+        Returns
+        -------
+        AddressCache
+            キャッシュ。db_pathが指定されていない場合はメモリ上のキャッシュ。
+        """
+        if not db_path:
+            return cls()
+        return cls(os.path.join(os.path.dirname(os.path.abspath(db_path)), cls.FILE_NAME))
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=60)
+
+    def _prepare(self):
+        """
+        キャッシュのテーブルを作成し、正規化ルールのバージョンが異なる場合は内容を破棄する
+        """
+        with closing(self._connect()) as connection, connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS normalized_address (raw TEXT PRIMARY KEY, normalized TEXT)")
+            row = connection.execute("SELECT value FROM meta WHERE key = 'rules_version'").fetchone()
+            if row is None or row[0] != self.version:
+                connection.execute("DELETE FROM normalized_address")
+                connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rules_version', ?)", (self.version,))
+
+    def _lookup(self, addresses):
+        """
+        保存済みの正規化住所を取得する
+
+        Parameters
+        ----------
+        addresses : list
+            検索する住所のリスト
+
+        Returns
+        -------
+        dict
+            住所から正規化住所への対応
+        """
+        if not self.path or not addresses:
+            return {}
+        with closing(self._connect()) as connection, connection:
+            connection.execute("CREATE TEMP TABLE lookup (raw TEXT PRIMARY KEY)")
+            connection.executemany("INSERT OR IGNORE INTO lookup (raw) VALUES (?)", ((address,) for address in addresses))
+            rows = connection.execute(
+                "SELECT n.raw, n.normalized FROM normalized_address n JOIN lookup l ON n.raw = l.raw"
+            ).fetchall()
+        return dict(rows)
+
+    def _store(self, mapping):
+        """
+        正規化住所を保存する
+
+        Parameters
+        ----------
+        mapping : dict
+            住所から正規化住所への対応
+        """
+        if not self.path or not mapping:
+            return
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO normalized_address (raw, normalized) VALUES (?, ?)",
+                mapping.items()
+            )
+
+    def normalize(self, series):
+        """
+        住所の列を正規化する。キャッシュに存在しない住所のみAddressNormalizerで正規化する。
+
+        Parameters
+        ----------
+        series : pandas.Series
+            正規化対象の住所列
+
+        Returns
+        -------
+        pandas.Series
+            正規化された住所列。文字列以外の値はそのまま返す。
+        """
+        is_str = series.map(lambda x: isinstance(x, str)).astype(bool)
+        unique_addresses = pd.unique(series[is_str])
+
+        pending = [address for address in unique_addresses if address not in self.memory]
+        found = self._lookup(pending)
+        self.memory.update(found)
+
+        missing = [address for address in pending if address not in found]
+        if missing:
+            normalized = AddressNormalizer.normalize(pd.Series(missing, dtype=object))
+            new_mapping = dict(zip(missing, normalized))
+            self.memory.update(new_mapping)
+            self._store(new_mapping)
+
+        self.hits += len(unique_addresses) - len(missing)
+        self.misses += len(missing)
+
+        result = series.astype(object).copy()
+        result[is_str] = series[is_str].map(self.memory)
+        return result
+
 
 # 各ファイルごとの処理クラス
 class EachFileProcessor(DataProcessor):
@@ -441,76 +791,169 @@ class EachFileProcessor(DataProcessor):
         "geocoding": []
     }
 
-    def __init__(self, input_paths, output_paths):
+    def __init__(self, input_paths, output_paths, address_cache=None, chunksize=None, save_output=True):
+        """
+        Parameters
+        ----------
+        input_paths : dict
+            入力ファイルのパス、または読み込み済みのデータフレームを含む辞書
+        output_paths : dict
+            出力ファイルのパスを含む辞書
+        address_cache : AddressCache, optional
+            住所正規化のキャッシュ
+        chunksize : int, optional
+            CSVファイルを分割して読み込む行数。指定した場合はチャンク単位で処理して出力に追記する。
+        save_output : bool, optional
+            Falseの場合は処理結果をファイルに保存せず、resultsに保持する（分割読み込みの場合は出力ファイルのパスを保持する）
+        """
         super().__init__(input_paths, output_paths)
-
-    def process_file(self, file_key):
+        # 住所正規化のキャッシュ
+        self.address_cache = address_cache if address_cache is not None else AddressCache()
+        # 分割読み込みの行数
+        self.chunksize = int(chunksize) if chunksize else None
+        # 処理結果の保存有無と、保存しない場合の処理結果
+        self.save_output = save_output
+        self.results = {}
+
+    def get_rename_columns(self, file_key):
         """
-        指定されたファイルキーに対応するファイルを処理する
+        入力ファイルのカラム名から出力カラム名への対応を返す
 
         Parameters
         ----------
         file_key : str
             処理対象のファイルキー
-        """
-        # ファイルを読み込む
-        df = read_file(self.INPUT_PATHS[file_key], file_key)
-        if df is None:
-            return
-        
-        cols = INPUT_COLUMNS[file_key]
 
-        # Rename columns
+        Returns
+        -------
+        dict
+            入力カラム名から出力カラム名への対応
+        """
         rename_columns = {}
-        for key, input_col in cols.items():
+        for key, input_col in INPUT_COLUMNS[file_key].items():
             new_col = OUTPUT_COLUMNS_INITIAL[file_key].get(key, input_col)
             rename_columns[input_col] = new_col
+        return rename_columns
 
-        if file_key == "suido_use":
-            df = df.rename(columns=rename_columns)
-            # 入力ファイルのすべてのカラム名を取得
-            all_columns = set(df.columns)
+    def validate_columns(self, columns, file_key):
+        """
+        読み込んだカラムに必要なカラムが揃っているか確認する
 
+        Parameters
+        ----------
+        columns : list
+            読み込んだファイルのカラム名（リネーム前）
+        file_key : str
+            処理対象のファイルキー
+        """
+        rename_columns = self.get_rename_columns(file_key)
+
+        if file_key == "suido_use":
+            all_columns = {rename_columns.get(col, col) for col in columns}
             missing_cols = set(OUTPUT_COLUMNS_INITIAL[file_key].values()) - all_columns
             if missing_cols:
                 set_error(ERROR_00035)
                 raise Exception("水道使用量のデータが異常です。もう一度データを確認ください。")
-            
-            df = self.convert_japanese_era_to_gregorian(df, file_key)
-            
-            self.save_csv(df, self.OUTPUT_PATHS[file_key])
         else:
-            # 住所列が欠損している行を削除
-            df = df.dropna(subset=[cols[f"{file_key}_address"]])
-            
-            # 住所の正規化処理を適用
-            df["正規化住所"] = (df[cols[f"{file_key}_address"]]
-                        .apply(CleanData.normalize_text)
-                        .apply(CleanData.convert_fullwidth_to_halfwidth_digits)
-                        .apply(CleanData.convert_halfwidth_to_fullwidth)
-                        .apply(CleanData.replace_single_katakana)
-                        .apply(CleanData.convert_address))
-            
-            df = df.rename(columns=rename_columns)
-            # 入力ファイルのすべてのカラム名を取得
-            all_columns = set(df.columns)
+            address_col = INPUT_COLUMNS[file_key][f"{file_key}_address"]
+            if address_col not in columns:
+                raise KeyError([address_col])
 
+            all_columns = {rename_columns.get(col, col) for col in list(columns) + ["正規化住所"]}
             missing_cols = set(OUTPUT_COLUMNS_INITIAL[file_key].values()) - all_columns
             file_name = FILE_NAME_JP[file_key]
             if missing_cols:
                 set_error(ERROR_00036, file_name)
                 raise Exception(f"{file_name}のデータが異常です。もう一度データを確認ください。")
-            
-            df = self.convert_japanese_era_to_gregorian(df, file_key)
+
+    def clean(self, df, file_key):
+        """
+        読み込んだデータの住所正規化、カラム名の変更、日付の変換を行う
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            読み込んだデータ（ファイル全体またはチャンク）
+        file_key : str
+            処理対象のファイルキー
+
+        Returns
+        -------
+        pandas.DataFrame
+            処理済みのデータ
+        """
+        if file_key != "suido_use":
+            address_col = INPUT_COLUMNS[file_key][f"{file_key}_address"]
+            # 住所列が欠損している行を削除
+            df = df.dropna(subset=[address_col])
+            # 住所の正規化処理を適用
+            df["正規化住所"] = self.address_cache.normalize(df[address_col])
+
+        df = df.rename(columns=self.get_rename_columns(file_key))
+        return self.convert_japanese_era_to_gregorian(df, file_key)
+
+    def process_file(self, file_key):
+        """
+        指定されたファイルキーに対応するファイルを処理する
+
+        Parameters
+        ----------
+        file_key : str
+            処理対象のファイルキー
+        """
+        path = self.INPUT_PATHS[file_key]
+        if self.chunksize and isinstance(path, str) and os.path.splitext(path)[1].lower() == '.csv':
+            self.process_file_in_chunks(file_key)
+            return
+
+        # ファイルを読み込む
+        df = read_file(path, file_key)
+        if df is None:
+            return
+
+        self.validate_columns(df.columns, file_key)
+        df = self.clean(df, file_key)
+        if self.save_output:
             # 処理結果をCSVファイルとして保存
             self.save_csv(df, self.OUTPUT_PATHS[file_key])
+        else:
+            self.results[file_key] = df
+
+    def process_file_in_chunks(self, file_key):
+        """
+        指定されたファイルキーに対応するCSVファイルをチャンク単位で処理し、出力に追記する。
+        カラムの確認はヘッダーに対して最初に一度だけ行う。
+        処理結果を保存しない場合も、ファイル全体をメモリに保持しないよう出力ファイルに追記し、
+        resultsには出力ファイルのパスを保持する（次の処理はファイルから読み込む）。
+
+        Parameters
+        ----------
+        file_key : str
+            処理対象のファイルキー
+        """
+        path = self.INPUT_PATHS[file_key]
+        encoding, columns = read_csv_header(path, file_key)
+        self.validate_columns(columns, file_key)
+
+        output_path = self.OUTPUT_PATHS[file_key]
+        mode = 'w'
+        for chunk in read_csv_chunks(path, columns, encoding, self.chunksize):
+            self.save_csv(self.clean(chunk, file_key), output_path, mode=mode)
+            mode = 'a'
+
+        if mode == 'w':
+            # データ行がない場合もヘッダーのみのファイルを出力する
+            self.save_csv(self.clean(pd.DataFrame(columns=columns, dtype=str), file_key), output_path)
+
+        if not self.save_output:
+            self.results[file_key] = output_path
 
     def convert_japanese_era_to_gregorian(self, df, file_key):
-        # 日付カラムの変換を実行
+        # 日付カラムの変換を列単位で一括実行
         if file_key in self.date_columns_mapping:
             for date_col in self.date_columns_mapping[file_key]:
                 if date_col in df.columns:
-                    df[date_col] = df[date_col].apply(CleanData.convert_date_to_seireki)
+                    df[date_col] = convert_dates_to_seireki(df[date_col])
         
         return df
 
@@ -622,8 +1065,8 @@ def read_file(path, key, **kwargs):
 
     Parameters
     ----------
-    path : str
-        読み込むファイルのパス
+    path : str or pandas.DataFrame
+        読み込むファイルのパス、または読み込み済みのデータフレーム
     key : str
         OUTPUT_COLUMNSのキー（例: "suido_status"）
     **kwargs : dict
@@ -636,9 +1079,13 @@ def read_file(path, key, **kwargs):
     """
     try:
         # ファイルの拡張子を取得し、小文字に変換
-        file_extension = os.path.splitext(path)[1].lower()
-        
-        if file_extension == '.csv':
+        file_extension = None if isinstance(path, pd.DataFrame) else os.path.splitext(path)[1].lower()
+
+        if isinstance(path, pd.DataFrame):
+            # データフレームはCSVを経由した場合と同じくすべての列を文字列として扱う
+            df = frame_like_csv(path, dtype=str)
+
+        elif file_extension == '.csv':
             # CSVファイルの場合の処理
             encodings = ['utf-8-sig']
             for encoding in encodings:
@@ -678,6 +1125,106 @@ def read_file(path, key, **kwargs):
         raise
 
 
+def read_csv_header(path, key):
+    """
+    CSVファイルのヘッダーのみを読み込み、エンコーディングとOUTPUT_COLUMNSに指定されたカラムを返す
+
+    Parameters
+    ----------
+    path : str
+        読み込むファイルのパス
+    key : str
+        OUTPUT_COLUMNSのキー（例: "suido_use"）
+
+    Returns
+    -------
+    tuple
+        (エンコーディング, 読み込むカラム名のリスト)
+    """
+    try:
+        try:
+            encoding = 'utf-8-sig'
+            header = pd.read_csv(path, encoding=encoding, dtype=str, nrows=0)
+        except UnicodeDecodeError:
+            # エンコーディングが見つからなかった場合
+            encoding = detect_encoding(path)
+            header = pd.read_csv(path, encoding=encoding, dtype=str, nrows=0)
+
+        if key not in OUTPUT_COLUMNS:
+            raise ValueError(f"指定されたキー '{key}' が OUTPUT_COLUMNS に存在しません。")
+        output_columns = list(OUTPUT_COLUMNS[key].values())
+        return encoding, list(header.columns.intersection(output_columns))
+    except Exception as e:
+        if ERROR_CODE is None:
+            set_error(ERROR_00004)
+        raise
+
+
+def read_csv_chunks(path, columns, encoding, chunksize):
+    """
+    CSVファイルを指定した行数ずつ読み込む
+
+    Parameters
+    ----------
+    path : str
+        読み込むファイルのパス
+    columns : list
+        読み込むカラム名のリスト
+    encoding : str
+        ファイルのエンコーディング
+    chunksize : int
+        1チャンクあたりの行数
+
+    Yields
+    ------
+    pandas.DataFrame
+        読み込まれたチャンク
+    """
+    try:
+        reader = pd.read_csv(path, encoding=encoding, dtype=str, usecols=columns, chunksize=chunksize)
+        with reader:
+            for chunk in reader:
+                # ヘッダーと同じ列順にそろえる
+                yield chunk[columns]
+    except Exception as e:
+        if ERROR_CODE is None:
+            set_error(ERROR_00004)
+        raise
+
+
+def read_main_address(path, key, address_col, chunksize=None):
+    """
+    ダミーデータの生成に使用するメインデータを読み込む。
+    分割読み込みの場合、CSVファイルは住所カラムのみをチャンク単位で読み込む。
+
+    Parameters
+    ----------
+    path : str
+        メインデータのファイルパス
+    key : str
+        OUTPUT_COLUMNSのキー（例: "juki"）
+    address_col : str
+        メインデータの住所カラム名
+    chunksize : int, optional
+        CSVファイルを分割して読み込む行数
+
+    Returns
+    -------
+    pandas.DataFrame
+        メインデータ（分割読み込みの場合は住所カラムのみ）
+    """
+    if not (chunksize and isinstance(path, str) and os.path.splitext(path)[1].lower() == '.csv'):
+        return read_file(path, key)
+
+    encoding, columns = read_csv_header(path, key)
+    if address_col not in columns:
+        raise KeyError([address_col])
+    chunks = list(read_csv_chunks(path, [address_col], encoding, int(chunksize)))
+    if not chunks:
+        return pd.DataFrame(columns=[address_col], dtype=str)
+    return pd.concat(chunks, ignore_index=True)
+
+
 def handle_optional_file(file, key, main_df, main_address_col, INPUT_COLUMNS):
     """
     任意のファイルが指定されなかった場合、ダミーデータを生成し、ファイルが指定された場合はread_fileを使用する
@@ -733,7 +1280,50 @@ def generate_dummy_data(main_df, main_address_col, DATA_COLUMNS):
 
 
 
-def process_data(input_files, output_directory, main_data_type, job_id, columns, db_path=None):
+def clean_file(file_key, input_paths, output_paths, cache_path, chunksize, save_output, input_columns, output_columns):
+    """
+    1つのファイルのクレンジングを行う（プロセスプールのワーカーで実行される）
+
+    Parameters
+    ----------
+    file_key : str
+        処理対象のファイルキー
+    input_paths : dict
+        処理対象のファイルの入力ファイルのパス、または読み込み済みのデータフレーム（file_keyのみを含む辞書）
+    output_paths : dict
+        処理対象のファイルの出力ファイルのパス（file_keyのみを含む辞書）
+    cache_path : str or None
+        住所正規化キャッシュのSQLiteファイルのパス
+    chunksize : int or None
+        CSVファイルを分割して読み込む行数
+    save_output : bool
+        処理結果をファイルに保存するか
+    input_columns : dict
+        呼び出し元のINPUT_COLUMNS
+    output_columns : dict
+        呼び出し元のOUTPUT_COLUMNS
+
+    Returns
+    -------
+    dict
+        処理結果のデータフレーム（result）と、エラー時のエラーコード・メッセージ（error_code, error_msg, exception）
+    """
+    global INPUT_COLUMNS, OUTPUT_COLUMNS, ERROR_CODE, ERROR_MSG
+    # ワーカーのプロセスにはユーザーが選択したカラムが反映されていないため、呼び出し元の定義を使用する
+    INPUT_COLUMNS = input_columns
+    OUTPUT_COLUMNS = output_columns
+    ERROR_CODE = None
+    ERROR_MSG = None
+
+    processor = EachFileProcessor(input_paths, output_paths, AddressCache(cache_path), chunksize, save_output)
+    try:
+        processor.process_file(file_key)
+    except Exception as e:
+        return {"result": None, "error_code": ERROR_CODE, "error_msg": ERROR_MSG, "exception": repr(e)}
+    return {"result": processor.results.get(file_key), "error_code": None, "error_msg": None, "exception": None}
+
+
+def process_data(input_files, output_directory, main_data_type, job_id, columns, db_path=None, chunksize=None, save_output=True, max_workers=None):
     """
     すべてのデータファイルを処理する
 
@@ -751,11 +1341,18 @@ def process_data(input_files, output_directory, main_data_type, job_id, columns,
         空き家結果データファイル
     geocoding_file : file
         ジオコーディングデータファイル
+    chunksize : int, optional
+        CSVファイルを分割して読み込む行数。指定した場合はチャンク単位で処理する。
+    save_output : bool, optional
+        Falseの場合は処理結果をファイルに保存せず、データフレームとして返す
+    max_workers : int, optional
+        ファイルを並列に処理するプロセス数（デフォルト: CPUのコア数）。1の場合は順番に処理する。
 
     Returns
     -------
-    list
-        処理済みファイルのパスリスト
+    list or dict
+        処理済みファイルのパスリスト。save_outputがFalseの場合はファイルキーごとの処理済みデータフレーム
+        （分割読み込みで処理したファイルは処理済みファイルのパス）
     """  
     # 入力ファイルのパスを設定
     # 各ファイルオブジェクトから名前（パス）を取得し、辞書形式で保存
@@ -800,65 +1397,71 @@ def process_data(input_files, output_directory, main_data_type, job_id, columns,
         juki_address = INPUT_COLUMNS.get('juki').get('juki_address')
         # メインデータを決定
         if main_data_type == "suido_status":
-            main_df = read_file(input_files.get('suido_status'), "suido_status")
+            main_key = "suido_status"
             main_address_col = suido_status_address
         elif main_data_type == "juki":
-            main_df = read_file(input_files.get('juki'), "juki")
+            main_key = "juki"
             main_address_col = juki_address
 
-        if input_files.get('suido_use'):
-            suido_use_df = handle_optional_file(input_files.get('suido_use'), "suido_use", main_df, main_address_col, INPUT_COLUMNS)
-        if input_files.get('touki'):
-            touki_df = handle_optional_file(input_files.get('touki'), "touki", main_df, main_address_col, INPUT_COLUMNS)
-        akiya_result_df = handle_optional_file(input_files.get('akiya_result'), "akiya_result", main_df, main_address_col, INPUT_COLUMNS)
-        geocoding_df = handle_optional_file(input_files.get('geocoding'), "geocoding", main_df, main_address_col, INPUT_COLUMNS)
-        
+        # 任意ファイルを読み込み（未指定の場合はダミーデータを生成し）、処理対象のデータとする
+        # 分割読み込みの場合、存在するファイルは事前に読み込まずにそのまま処理対象とし、
+        # メインデータはダミーデータの生成が必要な場合のみ住所カラムをチャンク単位で読み込む
+        optional_keys = [key for key in ['suido_use', 'touki'] if input_files.get(key)] + ['akiya_result', 'geocoding']
+        optional_paths = {}
+        main_df = None
+        for key in optional_keys:
+            file = input_files.get(key)
+            if chunksize and file is not None and os.path.exists(file):
+                optional_paths[key] = file
+                continue
+            if main_df is None:
+                main_df = read_main_address(input_files.get(main_key), main_key, main_address_col, chunksize)
+            optional_paths[key] = handle_optional_file(file, key, main_df, main_address_col, INPUT_COLUMNS)
+
         if job_id:
             create_or_update_job(job_id, "5")
-            
-        try:
-            # ファイルを保存して、処理に反映
-            if input_files.get('suido_use'):
-                suido_use_df.to_csv(f"{output_directory}/processed_suido_use.csv", index=False)
-            if input_files.get('touki'):
-                touki_df.to_csv(f"{output_directory}/processed_touki.csv", index=False)
-            geocoding_df.to_csv(f"{output_directory}/processed_geocoding.csv", index=False)
-            akiya_result_df.to_csv(f"{output_directory}/processed_akiya_result.csv", index=False)
-        except:
-            raise
 
         # 入力ファイルのパスを設定
         input_paths = {
-            "akiya_result": f"{output_directory}/processed_akiya_result.csv",
-            "geocoding": f"{output_directory}/processed_geocoding.csv"
+            "akiya_result": optional_paths["akiya_result"],
+            "geocoding": optional_paths["geocoding"]
         }
         
         if input_files.get('suido_status'):
             input_paths['suido_status'] = input_files.get('suido_status')
         if input_files.get('suido_use'):
-            input_paths['suido_use'] = f"{output_directory}/processed_suido_use.csv"
+            input_paths['suido_use'] = optional_paths['suido_use']
         if input_files.get('juki'):
             input_paths['juki'] = input_files.get('juki')
         if input_files.get('touki'):
-            input_paths['touki'] = f"{output_directory}/processed_touki.csv"
+            input_paths['touki'] = optional_paths['touki']
         if job_id:
             create_or_update_job(job_id, "10")
-        # EachFileProcessorインスタンスを作成
-        # 入力パスと出力パスを引数として、ファイル処理用のオブジェクトを生成
-        processor = EachFileProcessor(input_paths, output_paths)
-        progress_percent_job = 10
-        # 各データファイルを順番に処理
-        for file_key in input_paths.keys():
-            progress_percent += 16
-            progress_percent_job += 2
-            # EachFileProcessorのprocess_fileメソッドを呼び出して各ファイルを処理
-            processor.process_file(file_key)
+        # 各ファイルは互いに依存しないため、プロセスプールで並列にクレンジングする
+        # 住所正規化のキャッシュはSQLiteファイルを介して各ワーカーで共有する
+        cache_path = AddressCache.from_database_path(db_path).path
+        # 各ワーカーには処理対象のファイルのみを渡す（読み込み済みのデータフレームを全ワーカーに転送しない）
+        tasks = [
+            (file_key, (file_key, {file_key: input_paths[file_key]}, {file_key: output_paths[file_key]}, cache_path, chunksize, save_output, INPUT_COLUMNS, OUTPUT_COLUMNS))
+            for file_key in input_paths.keys()
+        ]
+        progress = {"task": progress_percent, "job": 10}
+
+        # 進捗は入力ファイルの順番に、各ファイルの処理が完了した時点で更新する
+        def report_progress(file_key):
+            progress["task"] += 16
+            progress["job"] += 2
             if job_id:
-                create_or_update_job_task(job_id, progress_percent=str(progress_percent), preprocess_type="e012", error_code=None, error_msg=None, result=None, id= task_id)
-                create_or_update_job(job_id, progress_percent_job)
+                create_or_update_job_task(job_id, progress_percent=str(progress["task"]), preprocess_type="e012", error_code=None, error_msg=None, result=None, id= task_id)
+                create_or_update_job(job_id, progress["job"])
+
+        results = run_in_process_pool(clean_file, tasks, max_workers, set_error, report_progress)
                 
         if job_id:
             create_or_update_job_task(job_id, progress_percent="100", preprocess_type="e012", error_code=None, error_msg=None, result=json.dumps({}), id= task_id, is_finish=True)
+        if not save_output:
+            # 処理済みのデータフレームを返す
+            return results
         # 処理済みファイルのパスリストを返す
         # 出力パスのうち、実際にファイルが生成されたもののみをリストにして返す
         return [path for path in output_paths.values() if os.path.exists(path)]
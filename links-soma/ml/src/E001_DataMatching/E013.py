@@ -11,7 +11,6 @@ import chardet
 import numpy as np
 import pandas as pd
 from dateutil.relativedelta import relativedelta
-from sklearn.preprocessing import LabelEncoder
 import warnings
 
 warnings.filterwarnings("ignore")
@@ -23,11 +22,17 @@ if async_tasks_path not in sys.path:
 try:
     from utils import *
     from constants import *
+    from date_utils import *
+    from usage_matrix import *
+    from structure_utils import *
 except ImportError:
     sys.path.remove(async_tasks_path)
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
     from async_tasks.utils import *
     from async_tasks.constants import *
+    from async_tasks.date_utils import *
+    from async_tasks.usage_matrix import *
+    from async_tasks.structure_utils import *
 
 COLUMNS = {
             "suido_use": {
@@ -60,13 +65,21 @@ ERROR_CODE=None
 ERROR_MSG=None
 
 class DataProcessor:
-    def __init__(self, input_paths, output_paths, reference_date, search_period):
-        # 入力ファイルのパスを設定
+    def __init__(self, input_paths, output_paths, reference_date, search_period, save_output=True):
+        # 入力ファイルのパス（または読み込み済みのデータフレーム）を設定
         self.INPUT_PATHS = input_paths
         # 出力ファイルのパスを設定
         self.OUTPUT_PATHS = output_paths
-        # 空き家予測の基準日
-        self.reference_date = datetime.strptime(str(reference_date), "%Y-%m-%d")
+        # 処理結果をファイルに保存するか
+        self.save_output = save_output
+        # 空き家予測の基準日（リストで複数指定した場合は、基準日ごとに処理結果を作成する）
+        self.MULTIPLE_DATES = isinstance(reference_date, (list, tuple))
+        reference_dates = reference_date if self.MULTIPLE_DATES else [reference_date]
+        self.REFERENCE_DATES = [datetime.strptime(str(date), "%Y-%m-%d") for date in reference_dates]
+        # 処理中の基準日
+        self.reference_date = self.REFERENCE_DATES[0]
+        # 処理結果のデータフレーム（基準日を複数指定した場合は基準日（YYYY-MM-DD）ごとのデータフレーム）
+        self.result = {} if self.MULTIPLE_DATES else None
         # 検索期間
         self.SEARCH_PERIOD = int(search_period)
         # データごとの出力するカラムを定義
@@ -114,8 +127,8 @@ class DataProcessor:
         CSVファイルまたはテキストファイルを読み込む
         Parameters
         ----------
-        path : str
-            読み込むファイルのパス
+        path : str or pandas.DataFrame
+            読み込むファイルのパス、または前段の処理結果のデータフレーム
         **kwargs : dict
             pandas.read_csv に渡す追加のキーワード引数
         Returns
@@ -124,6 +137,10 @@ class DataProcessor:
             読み込まれたデータフレーム、エラー時はNone
         """
         try:
+            if isinstance(path, pd.DataFrame):
+                # CSVを経由した場合と同じ型にそろえる
+                return frame_like_csv(path)
+
             # ファイルの拡張子を取得し、小文字に変換
             file_extension = os.path.splitext(path)[1].lower()
             
@@ -177,6 +194,27 @@ class DataProcessor:
             except Exception as e:
                 set_error(ERROR_00009, path, encoding)
 
+    def output(self, df, key):
+        """
+        処理結果を保持し、save_outputがTrueの場合はCSVファイルとして保存する。
+        基準日を複数指定した場合は、処理中の基準日の結果として保持・保存する。
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            処理結果のデータフレーム
+        key : str
+            出力ファイルのキー
+        """
+        path = self.OUTPUT_PATHS.get(key)
+        if self.MULTIPLE_DATES:
+            self.result[self.reference_date.strftime("%Y-%m-%d")] = df
+            path = dated_output_path(path, self.reference_date)
+        else:
+            self.result = df
+        if self.save_output:
+            self.save_csv(df, path)
+
     @staticmethod
     def drop_duplicates(df, subset, keep="first"):
         """
@@ -201,6 +239,13 @@ class DataProcessor:
 
 
 class SuidoProcessor(DataProcessor):
+    def __init__(self, input_paths, output_paths, reference_date, search_period, save_output=True, usage_matrix_path=None, usage_state_dir=None):
+        super().__init__(input_paths, output_paths, reference_date, search_period, save_output)
+        # 水道番号×年月の使用量の行列を配置するファイル（Noneの場合はメモリ上に作成）
+        self.usage_matrix_path = usage_matrix_path
+        # 使用量の行列を保存するディレクトリ（指定した場合は、保存した行列に水道使用量データを追加して増分更新する）
+        self.usage_state_dir = usage_state_dir
+
     def preprocess_suido_use(self, df):
         """
         水道使用量データの前処理を行う
@@ -215,13 +260,13 @@ class SuidoProcessor(DataProcessor):
         """
         cols = COLUMNS["suido_use"]
         try:
-            df = normalize_dates(df, cols["meter_reading_date"], ['%Y%m%d', '%Y/%m/%d', '%d/%m/%Y', '%Y-%m-%d', '%m/%d/%Y'])
+            df = normalize_dates(df, cols["meter_reading_date"], ['%Y%m%d', '%Y/%m/%d', '%d/%m/%Y', '%Y-%m-%d', '%m/%d/%Y'], source="suido_use", strip_time=True)
         except:
             set_error(ERROR_00022)
             raise Exception("'検針年月'が含まれているか、正しいカラムが指定されているかご確認ください。")
 
-        # 検針年月を作成
-        df["検針年月"] = df[cols["meter_reading_date"]].dt.strftime("%Y-%m")
+        # 検針年月を作成（年月の通し番号）
+        df["検針年月"] = month_index(df[cols["meter_reading_date"]])
         
         # 同一水道番号・同一月のデータを合計
         try:
@@ -233,17 +278,17 @@ class SuidoProcessor(DataProcessor):
         return df_cleaned
 
 
-    def preprocess_suido_data(self, df):
+    def preprocess_suido_data(self, usage_matrix):
         """
-        水道データを処理し、最古の使用量と最新の使用量を取得する
+        基準日と抽出期間の開始年月を設定する
         Parameters
         ----------
-        df : pandas.DataFrame
-            ピボットテーブル形式の水道使用量データ
+        usage_matrix : UsageMatrix
+            水道番号×年月の使用量の行列
         Returns
         -------
-        pandas.DataFrame
-            最古の使用量と最新の使用量が追加されたデータ
+        UsageMatrix
+            水道番号×年月の使用量の行列
         """
         # reference_dateとSTART_DATEを初期化
         if isinstance(self.reference_date, str):
@@ -253,44 +298,21 @@ class SuidoProcessor(DataProcessor):
                 self.reference_date = datetime.strptime(self.reference_date, "%Y-%m")
         
         self.START_DATE = (self.reference_date - relativedelta(years=self.SEARCH_PERIOD)).strftime("%Y-%m")
-        reference_month = self.reference_date.strftime("%Y-%m")  # 月単位に変換
-
-        # start_date_水道使用量に対して次の月の値を確認するロジック
-        start_date = pd.to_datetime(self.START_DATE)
-        while start_date <= pd.to_datetime(reference_month):
-            next_month_str = start_date.strftime("%Y-%m")
-            if next_month_str in df.columns:
-                df["start_date_水道使用量"] = df[next_month_str].fillna(0)
-                break
-            # 次の月に進む
-            start_date += relativedelta(months=1)
-        else:
-            df["start_date_水道使用量"] = 0  # ループを抜けた場合は0
-
-        # reference_date_水道使用量に対して前の月の値を確認するロジック
-        if reference_month not in df.columns:
-            prev_month = (pd.to_datetime(reference_month) - relativedelta(months=1)).strftime("%Y-%m")
-            if prev_month in df.columns:
-                df["reference_date_水道使用量"] = df[prev_month].fillna(0)
-            else:
-                df["reference_date_水道使用量"] = 0  # NaNの場合、0に設定
-        else:
-            df["reference_date_水道使用量"] = df[reference_month].fillna(0)  # NaNを0に置換
 
-        return df
+        return usage_matrix
 
 
     def pivot_table(self, df):
         """
-        水道使用量データのピボットテーブルを作成する
+        水道使用量データから水道番号×年月の使用量の行列を作成する
         Parameters
         ----------
         df : pandas.DataFrame
             前処理済みの水道使用量データ
         Returns
         -------
-        pandas.DataFrame
-            ピボットテーブル形式の水道使用量データ
+        UsageMatrix
+            水道番号×年月の使用量の行列
         """
         cols = COLUMNS["suido_use"]
 
@@ -299,10 +321,16 @@ class SuidoProcessor(DataProcessor):
             set_error(ERROR_00022)
             raise KeyError("'検針年月'がデータフレームに含まれていません")
 
-        # ピボットテーブルの作成
-        df_suido_use_pt = df.pivot_table(index=cols["suido_number"], columns="検針年月", values=cols["suido_usage"], aggfunc='sum').reset_index()
+        # 保存した行列がある場合は、水道使用量データ（新しい月の分）のみを追加する
+        if self.usage_state_dir and UsageMatrix.exists(self.usage_state_dir):
+            usage_matrix = UsageMatrix.load(self.usage_state_dir)
+            usage_matrix.add_records(df[cols["suido_number"]], df["検針年月"], df[cols["suido_usage"]])
+            return usage_matrix
 
-        return df_suido_use_pt
+        # 行列の作成（usage_matrix_pathを指定した場合はファイルに配置する）
+        return UsageMatrix.from_records(
+            df[cols["suido_number"]], df["検針年月"], df[cols["suido_usage"]], memmap_path=self.usage_matrix_path
+        )
 
 
     def calculate_suido_stats(self, suido_use, suido_status):
@@ -310,10 +338,10 @@ class SuidoProcessor(DataProcessor):
         水道使用量の統計量と変化率を計算する
         Parameters
         ----------
-        df_use : pandas.DataFrame
-            指定期間で抽出された水道データ
-        df_status : pandas.DataFrame
-            指定期間の水道ステータス
+        suido_use : UsageMatrix
+            水道番号×年月の使用量の行列
+        suido_status : pandas.DataFrame
+            水道ステータス
         Returns
         -------
         pandas.DataFrame
@@ -323,76 +351,50 @@ class SuidoProcessor(DataProcessor):
             suido_status = suido_status.copy()
             cols_use = COLUMNS["suido_use"]
             cols_status = COLUMNS["suido_status"]
-            reference_date = pd.to_datetime(self.reference_date).strftime('%Y-%m')
-            start_date = pd.to_datetime(self.START_DATE)
+            reference_month = month_index_of(self.reference_date)
+            start_month = month_index_of(self.START_DATE)
 
             # suido_useでデータがない年月の特定
-            date_columns = [ col for col in suido_use.columns if col[:2] in ['19', '20'] ]
-            min_date_columns = pd.to_datetime(min(date_columns))
-            max_date_columns = pd.to_datetime(max(date_columns))
-            min_year = min_date_columns.year
-            min_month = min_date_columns.month
-            max_year = max_date_columns.year
-            max_month = max_date_columns.month
-            basic_list = []
-            for year in range(min_year,max_year+1 ):
-                for month in range(1,13):
-                    basic_list.append(str(pd.to_datetime(f"{year}-{month}").strftime('%Y-%m')))
-            basic_list = [ ym for ym in basic_list if pd.to_datetime(ym) >= pd.to_datetime(f"{min_year}-{min_month}") ]      
-            basic_list = [ ym for ym in basic_list if pd.to_datetime(ym) <= pd.to_datetime(f"{max_year}-{max_month}") ]  
-            missing_month = [ ym for ym in basic_list if ym not in date_columns ]
-
-            suido_status_pre = suido_status.loc[:,[cols_status['suido_number'],cols_status['usage_start_date'],cols_status['usage_end_date']]]
-            suido_status_pre = normalize_dates(suido_status_pre, cols_status["usage_start_date"])
-            suido_status_pre = normalize_dates(suido_status_pre, cols_status["usage_end_date"])
-
-            suido_status_pre[cols_status['usage_start_date']] = suido_status_pre[cols_status['usage_start_date']].dt.strftime('%Y-%m')
-            suido_status_pre[cols_status['usage_end_date']] = suido_status_pre[cols_status['usage_end_date']].dt.strftime('%Y-%m')
-
-            # nullへデータを挿入（ffill)
-            suido_pre_merged = suido_status_pre.merge(suido_use, on=cols_use['suido_number'],how='inner').reset_index(drop=True)
-            suido_pre_merged.loc[:,min(date_columns):max(date_columns)] = suido_pre_merged.loc[:,min(date_columns):max(date_columns)].ffill(axis=1)    
-
-            # dfの日付を対象期間のみにしぼる
-            non_date_columns = [ col for col in suido_pre_merged.columns if col not in date_columns ]
-            new_date_columns = [ ym for ym in date_columns if pd.to_datetime(ym) >=  start_date ]
-            new_date_columns = [ ym for ym in new_date_columns if pd.to_datetime(ym) <=  pd.to_datetime(reference_date) ]
-            suido_pre_merged = suido_pre_merged[non_date_columns+new_date_columns].reset_index(drop=True)
-
-            suido_pre_merged['null_num'] = suido_pre_merged[new_date_columns].sum(axis=1)
-            suido_pre_merged['start_date_水道使用量'] = 0
-            suido_pre_merged['reference_date_水道使用量'] = 0
-            
-            # 開始日、終了日の日付を取得(データ期間中の期間に修正)
-            for row in suido_pre_merged.loc[suido_pre_merged['null_num']!=0].index:
-                try:
-                    tar_ym = suido_pre_merged.loc[row,new_date_columns].dropna().index[0]
-                    suido_pre_merged.loc[row, 'start_date_水道使用量'] = float(suido_pre_merged.loc[row,tar_ym])
-                except:
-                    suido_pre_merged.loc[row, 'start_date_水道使用量'] = 0
-                try:
-                    tar_ym = suido_pre_merged.loc[row,new_date_columns].dropna().index[-1]
-                    suido_pre_merged.loc[row, 'reference_date_水道使用量'] = float(suido_pre_merged.loc[row,tar_ym])
-                except:
-                    suido_pre_merged.loc[row, 'reference_date_水道使用量'] = 0
+            missing_month = suido_use.missing_months()
+
+            suido_status_pre = suido_status.loc[:,[cols_status['suido_number'],cols_status['usage_start_date']]]
+            suido_status_pre = normalize_dates(suido_status_pre, cols_status["usage_start_date"], EXTENDED_DATE_FORMATS, source="suido_status", strip_time=True)
+
+            # 使用量のデータがある水道番号のみを対象とする
+            rows = suido_use.rows_of(suido_status_pre[cols_status['suido_number']])
+            suido_status_pre = suido_status_pre.loc[rows >= 0].reset_index(drop=True)
+            rows = rows[rows >= 0]
 
-            if len(new_date_columns) < 1:
+            # 対象期間の使用量を取得（nullは前の年月の値で補完）
+            date_columns, usage = suido_use.window(rows, start_month, reference_month)
+
+            if len(date_columns) < 1:
                 set_error(ERROR_00020)
                 raise ValueError("基準日が不正です。正しいフォーマットになっているか、もしくは正しい日付となっているかかご確認ください 。")
+
             # suido_useに欠損年月がある場合に開始日、終了日の日付を修正(そのほかもデータ期間中の期間に修正)
-            df_use = suido_pre_merged.apply(lambda x:self.get_start_base_value(x,missing_month,new_date_columns), axis=1)
-        
-            # 統計量の計算
-            df_use["最大使用水量"] = df_use[new_date_columns].max(axis=1)
-            df_use["平均使用水量"] = df_use[new_date_columns].mean(axis=1)
-            df_use["最小使用水量"] = df_use[new_date_columns].min(axis=1)
-            df_use["合計使用水量"] = df_use[new_date_columns].sum(axis=1)
-
-            # 変化率の計算 (基準日の使用量 / 開始日の使用量)
-            df_use["水道使用量変化率"] = df_use.apply(
-                lambda row: row["reference_date_水道使用量"] / row["start_date_水道使用量"]
-                if pd.notnull(row["start_date_水道使用量"]) and row["start_date_水道使用量"] != 0
-                else 0, axis=1)
+            start_usage, reference_usage = self.get_start_base_values(
+                usage,
+                month_index(suido_status_pre[cols_status["usage_start_date"]]).to_numpy(dtype=float),
+                missing_month,
+                date_columns,
+                reference_month
+            )
+
+            df_use = pd.DataFrame({cols_use["suido_number"]: suido_status_pre[cols_status["suido_number"]]})
+            # 統計量の計算（欠損値を除いて計算し、すべて欠損の場合は合計のみ0とする）
+            valid = ~np.isnan(usage)
+            valid_count = valid.sum(axis=1)
+            has_value = valid_count > 0
+            usage_sum = np.where(valid, usage, 0).sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                df_use["最大使用水量"] = np.where(has_value, np.where(valid, usage, -np.inf).max(axis=1), np.nan)
+                df_use["平均使用水量"] = np.where(has_value, usage_sum / valid_count, np.nan)
+                df_use["最小使用水量"] = np.where(has_value, np.where(valid, usage, np.inf).min(axis=1), np.nan)
+                df_use["合計使用水量"] = usage_sum
+
+                # 変化率の計算 (基準日の使用量 / 開始日の使用量)
+                df_use["水道使用量変化率"] = np.where(start_usage != 0, reference_usage / np.where(start_usage != 0, start_usage, 1), 0)
             
             # 出力するカラムを選択
             return df_use[[cols_use["suido_number"], "最大使用水量", "平均使用水量", "最小使用水量", "合計使用水量", "水道使用量変化率"]]
@@ -417,7 +419,7 @@ class SuidoProcessor(DataProcessor):
         df["閉栓フラグ"] = df[cols["usage_end_date"]].notnull()
         
         # reference_dateとusage_end_dateを比較して、usage_end_dateがreference_dateより新しい場合はFalseに設定
-        df_temp = normalize_dates(df.copy(), cols["usage_end_date"])
+        df_temp = normalize_dates(df.copy(), cols["usage_end_date"], EXTENDED_DATE_FORMATS, source="suido_status", strip_time=True)
         df["usage_end_date"] = df_temp[cols["usage_end_date"]]  # usage_end_dateを日付に変換
         df["閉栓フラグ"] = np.where(
             (df["閉栓フラグ"]) & (df["usage_end_date"] > self.reference_date),  # 閉栓フラグがTrueかつ usage_end_date > reference_date
@@ -427,59 +429,70 @@ class SuidoProcessor(DataProcessor):
         
         return df
     
-    def get_start_base_value(self, row, missing_month, date_columns):
-        cols_status = COLUMNS["suido_status"]
+    def get_start_base_values(self, usage, usage_start_months, missing_month, date_columns, reference_month):
+        """
+        各水道番号の開始日と基準日の使用量を取得する
 
-        if isinstance(self.reference_date, datetime):
-            reference_date = self.reference_date.strftime('%Y-%m')
-        else:
-            reference_date = self.reference_date
-
-        if len(missing_month)>0:
-            if pd.isnull(row[cols_status["usage_start_date"]]):
-                start_day = min(date_columns)
-            elif row[cols_status["usage_start_date"]] < min(date_columns):
-                start_day = min(date_columns)
-            elif (row[cols_status["usage_start_date"]] >= min(missing_month) )&(row[cols_status["usage_start_date"]] <= max(missing_month)):
-                start_day = (pd.to_datetime(max(missing_month)) + timedelta(days=31)).strftime('%Y-%m')
-            elif row[cols_status["usage_start_date"]] > reference_date:
-                start_day = reference_date
-            else:
-                start_day = row[cols_status["usage_start_date"]]
+        開始日は使用開始日を対象期間内に補正した年月とし、その年月の使用量が欠損している場合は
+        基準日より前の年月で最初に使用量がある年月の値を使用する（ない場合は0）。
+        基準日の使用量は基準日の年月の値とする（欠損、または年月がない場合は0）。
 
-        else:
-            if pd.isnull(row[cols_status["usage_start_date"]]):
-                start_day = min(date_columns)
-            elif row[cols_status["usage_start_date"]] < min(date_columns):
-                start_day = min(date_columns)
-            elif row[cols_status["usage_start_date"]] > reference_date:
-                start_day = reference_date
-            else:
-                start_day = row[cols_status["usage_start_date"]]
-
-        if not row.get(start_day):
-            row['start_date_水道使用量'] = 0
-        elif pd.isnull(row.get(start_day)):
-            searching = True
-            col = row.index.get_loc(start_day)
-            while searching:
-                if row.index[col] >= reference_date :
-                    row['start_date_水道使用量'] = 0
-                    searching = False
-                elif pd.isnull(row.iloc[col]):
-                    col += 1
-                else:
-                    row['start_date_水道使用量'] = row.iloc[col]
-                    searching = False
+        Parameters
+        ----------
+        usage : numpy.ndarray
+            水道番号×年月（date_columnsの順）の使用量の行列
+        usage_start_months : numpy.ndarray
+            各水道番号の使用開始日の年月の通し番号（欠損値はNaN）
+        missing_month : numpy.ndarray
+            suido_useでデータがない年月の通し番号
+        date_columns : numpy.ndarray
+            対象期間の年月の通し番号（昇順）
+        reference_month : int
+            基準日の年月の通し番号
 
+        Returns
+        -------
+        tuple of numpy.ndarray
+            開始日の使用量と基準日の使用量
+        """
+        rows = np.arange(len(usage))
+        first_month = date_columns.min()
+        is_null = np.isnan(usage_start_months)
+        # 比較のため欠損値を対象期間の先頭に置き換える（欠損値の行は最初の条件で決定する）
+        start_month = np.where(is_null, first_month, usage_start_months).astype(np.int64)
+
+        # 開始日の年月を決定（条件は上から順に優先）
+        conditions = [is_null, start_month < first_month]
+        choices = [first_month, first_month]
+        if len(missing_month) > 0:
+            conditions.append((start_month >= missing_month.min()) & (start_month <= missing_month.max()))
+            choices.append(missing_month.max() + 1)
+        conditions.append(start_month > reference_month)
+        choices.append(reference_month)
+        start_day = np.select(conditions, choices, default=start_month)
+
+        # 開始日の年月の列位置（対象期間にない場合は-1）
+        positions = np.searchsorted(date_columns, start_day)
+        in_columns = (positions < len(date_columns)) & (date_columns[np.minimum(positions, len(date_columns) - 1)] == start_day)
+        positions = np.where(in_columns, positions, -1)
+        start_value = np.where(in_columns, usage[rows, np.where(in_columns, positions, 0)], 0)
+
+        # 開始日の使用量が欠損している場合は、基準日より前の年月で最初に使用量がある値を使用する
+        searchable = date_columns < reference_month
+        column_index = np.arange(len(date_columns))
+        candidates = ~np.isnan(usage) & searchable & (column_index >= positions[:, None])
+        found = candidates.any(axis=1)
+        searched_value = np.where(found, usage[rows, candidates.argmax(axis=1)], 0)
+        start_usage = np.where(in_columns & np.isnan(start_value), searched_value, start_value)
+
+        # 基準日の使用量
+        reference_position = np.flatnonzero(date_columns == reference_month)
+        if len(reference_position) > 0:
+            reference_usage = np.nan_to_num(usage[:, reference_position[0]], nan=0)
         else:
-            row['start_date_水道使用量'] = row[start_day]
+            reference_usage = np.zeros(len(usage))
 
-        if row.get(reference_date, None) is not None:
-            row['reference_date_水道使用量'] = 0 if pd.isnull(row[reference_date]) else row[reference_date]
-        else:
-            row['reference_date_水道使用量'] = 0
-        return row
+        return start_usage, reference_usage
 
     def process(self):
 
@@ -501,59 +514,84 @@ class SuidoProcessor(DataProcessor):
                  cols_status["usage_start_date"]], 
                 ascending=True, na_position='first').drop_duplicates(cols_status["suido_number"], keep='last')
             
-            # 住戸単位にする
+            # 住戸単位にする（使用量の行列は全ての基準日で共通）
             df_suido_use_cleaned = self.preprocess_suido_use(df_suido_use)
-            df_suido_use_pt = self.pivot_table(df_suido_use_cleaned)
-            # 基準日からさかのぼって指定期間の水道使用量のみを抽出
-            df_suido_use_processed = self.preprocess_suido_data(df_suido_use_pt)
-            # 水道使用量の統計量を計算
-            df_suido_stats = self.calculate_suido_stats(df_suido_use_processed, df_suido_status)
-            # 閉栓フラグを付与
-            df_suido_operation = self.value_operation_flg(df_suido_status)
-
-            # データの結合と整形
-            cols_status = COLUMNS["suido_status"]
-            df_suido = pd.merge(df_suido_operation[[cols_status["suido_number"], cols_status["suido_address"],'使用開始日', '使用中止日', "閉栓フラグ"]], 
-                                df_suido_stats, on=cols_status["suido_number"], how="left")
-            
-            # 1住所に異なる水道番号が5以上結びつく住所を排除
-            multi_address = df_suido.groupby(cols_status["suido_address"])[cols_status["suido_number"]].nunique()\
-            [df_suido.groupby(cols_status["suido_address"])[cols_status["suido_number"]].nunique()>4].index
-            df_suido = df_suido.loc[~df_suido[cols_status["suido_address"]].isin(multi_address)].reset_index(drop=True)  
+            usage_matrix = self.pivot_table(df_suido_use_cleaned)
+
+            for reference_date in self.REFERENCE_DATES:
+                self.reference_date = reference_date
+                # 出力
+                self.output(self.build_suido(usage_matrix, df_suido_status), "suido")
+            # 次回の増分更新のため、全ての基準日の処理が完了した時点の行列の更新を配置する
+            # （保存した行列への反映は、処理全体が成功した時点でprocess_all_dataの呼び出し元が行う）
+            if self.usage_state_dir:
+                usage_matrix.stage(self.usage_state_dir)
+            # 行列をファイルに配置した場合は、ファイルを削除できるよう参照を解放する
+            del usage_matrix
+        except Exception as e:
+            if ERROR_CODE is None:
+                set_error(ERROR_00038)
+                raise Exception("建物情報のデータが異常です。もう一度データを確認ください。")
 
-            # df_suido の全てのカラムを確認
-            all_columns = df_suido.columns
+            raise Exception(e)
 
-            # 「水道使用量変化率」以外のカラムの null を 0 で埋める
-            columns_to_fill_zero = [col for col in all_columns if col != "水道使用量変化率"]
-            df_suido[columns_to_fill_zero] = df_suido[columns_to_fill_zero].fillna(0)
+    def build_suido(self, usage_matrix, df_suido_status):
+        """
+        処理中の基準日について、水道番号ごとの使用量の統計量と閉栓フラグを作成する
+        Parameters
+        ----------
+        usage_matrix : UsageMatrix
+            水道番号×年月の使用量の行列
+        df_suido_status : pandas.DataFrame
+            水道状況データ
+        Returns
+        -------
+        pandas.DataFrame
+            出力カラムを選択した水道データ
+        """
+        cols_status = COLUMNS["suido_status"]
+        # 基準日からさかのぼって指定期間の水道使用量のみを抽出
+        usage_matrix = self.preprocess_suido_data(usage_matrix)
+        # 水道使用量の統計量を計算
+        df_suido_stats = self.calculate_suido_stats(usage_matrix, df_suido_status)
+        # 閉栓フラグを付与
+        df_suido_operation = self.value_operation_flg(df_suido_status)
+
+        # データの結合と整形
+        df_suido = pd.merge(df_suido_operation[[cols_status["suido_number"], cols_status["suido_address"],'使用開始日', '使用中止日', "閉栓フラグ"]], 
+                            df_suido_stats, on=cols_status["suido_number"], how="left")
+        
+        # 1住所に異なる水道番号が5以上結びつく住所を排除
+        multi_address = df_suido.groupby(cols_status["suido_address"])[cols_status["suido_number"]].nunique()\
+        [df_suido.groupby(cols_status["suido_address"])[cols_status["suido_number"]].nunique()>4].index
+        df_suido = df_suido.loc[~df_suido[cols_status["suido_address"]].isin(multi_address)].reset_index(drop=True)  
 
-            # 「水道使用量変化率」の null を 1 で埋める
-            if "水道使用量変化率" in all_columns:
-                df_suido["水道使用量変化率"] = df_suido["水道使用量変化率"].fillna(1)
+        # df_suido の全てのカラムを確認
+        all_columns = df_suido.columns
 
-            # 条件1: 最大使用水量, 平均使用水量, 最小使用水量, 合計使用水量がすべて0のとき
-            usage_columns = ["最大使用水量", "平均使用水量", "最小使用水量", "合計使用水量"]
+        # 「水道使用量変化率」以外のカラムの null を 0 で埋める
+        columns_to_fill_zero = [col for col in all_columns if col != "水道使用量変化率"]
+        df_suido[columns_to_fill_zero] = df_suido[columns_to_fill_zero].fillna(0)
 
-            # 条件1: 水道使用量変化率を1に設定
-            df_suido.loc[df_suido[usage_columns].sum(axis=1) == 0, "水道使用量変化率"] = 1
+        # 「水道使用量変化率」の null を 1 で埋める
+        if "水道使用量変化率" in all_columns:
+            df_suido["水道使用量変化率"] = df_suido["水道使用量変化率"].fillna(1)
 
-            # 重複データを削除
-            df_suido = self.drop_duplicates(df_suido.sort_values(by="最大使用水量", ascending=False), 
-                                        subset=cols_status["suido_address"])
-            
-            # 出力カラムの選択
-            df_suido = df_suido[self.OUTPUT_COLUMNS["suido"]]
-            df_suido["reference_date"] = self.reference_date
+        # 条件1: 最大使用水量, 平均使用水量, 最小使用水量, 合計使用水量がすべて0のとき
+        usage_columns = ["最大使用水量", "平均使用水量", "最小使用水量", "合計使用水量"]
 
-            # 出力
-            self.save_csv(df_suido, self.OUTPUT_PATHS["suido"])
-        except Exception as e:
-            if ERROR_CODE is None:
-                set_error(ERROR_00038)
-                raise Exception("建物情報のデータが異常です。もう一度データを確認ください。")
+        # 条件1: 水道使用量変化率を1に設定
+        df_suido.loc[df_suido[usage_columns].sum(axis=1) == 0, "水道使用量変化率"] = 1
 
-            raise Exception(e)
+        # 重複データを削除
+        df_suido = self.drop_duplicates(df_suido.sort_values(by="最大使用水量", ascending=False), 
+                                    subset=cols_status["suido_address"])
+        
+        # 出力カラムの選択
+        df_suido = df_suido[self.OUTPUT_COLUMNS["suido"]]
+        df_suido["reference_date"] = self.reference_date
+
+        return df_suido
 
     
 def fixing_nums_aft_end_date(row,cols, oldest_date, missing_month):
@@ -572,50 +610,38 @@ def fixing_nums_aft_end_date(row,cols, oldest_date, missing_month):
 
 # 住基データの世帯単位の集計
 class JukiProcessor(DataProcessor):
-    # 各世帯の年齢送別人数を計算
-    def calculate_age_groups(self, df):
+    # 年齢別グループ（グループ名: (下限年齢, 上限年齢)）
+    AGE_GROUPS = {
+        "15歳未満": (None, 14),
+        "15歳以上64歳以下": (15, 64),
+        "65歳以上": (65, None)
+    }
+
+    def household_codes(self, df):
         """
-        各世帯の年齢別人数を計算する
+        世帯コードと正規化住所の組み合わせ（世帯）ごとの番号を取得する
         Parameters
         ----------
         df : pandas.DataFrame
             住民基本台帳データ
         Returns
         -------
-        pandas.DataFrame
-            年齢別人数が追加された住民基本台帳データ
+        numpy.ndarray
+            各行の世帯の番号（世帯コード、正規化住所の昇順）。いずれかが欠損している行は-1。
         """
         cols = COLUMNS["juki"]
-        
-        # 年齢を計算
-        try:
-            df["年齢"] = (self.reference_date - df[cols["birth"]]).dt.days // 365
-        except:
-            set_error(ERROR_00039)
-            raise Exception("生年月日のデータが異常です。もう一度データを確認ください。")
-
-        # 年齢別グループを作成
-        age_groups = {
-            "15歳未満": df["年齢"] < 15,
-            "15歳以上64歳以下": (df["年齢"] >= 15) & (df["年齢"] <= 64),
-            "65歳以上": df["年齢"] >= 65
-        }
-
-        # 各グループに該当するかどうかをフラグ化
-        for group, condition in age_groups.items():
-            df[group] = condition.astype(int)
-
-        # 各世帯の最大年齢と最小年齢を計算
-        age_stats = df.groupby([cols["setai_code"], cols["juki_address"]])["年齢"].agg(最小年齢='min', 最大年齢='max').reset_index()
-        
-        # 元のデータフレームに最大年齢と最小年齢を結合
-        df = pd.merge(df, age_stats, on=[cols["setai_code"], cols["juki_address"]], how="left")
-
-        return df
-
-    def calculate_setai_count(self, df):
+        setai_codes, setai_uniques = pd.factorize(df[cols["setai_code"]], sort=True)
+        address_codes, address_uniques = pd.factorize(df[cols["juki_address"]], sort=True)
+        valid = (setai_codes >= 0) & (address_codes >= 0)
+        # 各列の番号の組み合わせを1つの番号にまとめる（昇順を維持する）
+        combined = setai_codes.astype(np.int64) * len(address_uniques) + address_codes
+        codes = np.full(len(df), -1, dtype=np.int64)
+        codes[valid] = pd.factorize(combined[valid], sort=True)[0]
+        return codes
+
+    def calculate_household_stats(self, df):
         """
-        各世帯の人数（世帯人数）を計算してデータフレームに追加する
+        各世帯の世帯人数、年齢別人数と構成比、最大・最小年齢、男女比、住定期間を一括で計算する
         Parameters
         ----------
         df : pandas.DataFrame
@@ -623,96 +649,73 @@ class JukiProcessor(DataProcessor):
         Returns
         -------
         pandas.DataFrame
-            世帯人数が追加されたデータ
-        """
-        cols = COLUMNS["juki"]
-        
-        # 世帯ごとの人数をカウント
-        setai_count = df.groupby([cols["setai_code"], cols["juki_address"]]).size().reset_index(name='世帯人数')
-        
-        # 元のデータに世帯人数を結合
-        df = pd.merge(df, setai_count, on=[cols["setai_code"], cols["juki_address"]], how="left")
-        
-        return df
-
-
-    # 各世帯の年齢別人数の構成比を計算
-    def calculate_age_stats(self, df):
-        """
-        各世帯の年齢別人数の構成比を計算する
-        Parameters
-        ----------
-        df : pandas.DataFrame
-            年齢別人数が追加された住民基本台帳データ
-        Returns
-        -------
-        pandas.DataFrame
-            年齢別構成比が追加されたデータ
+            世帯単位の住民基本台帳データ（世帯コード、正規化住所の昇順）
         """
         cols = COLUMNS["juki"]
         group_cols = [cols["setai_code"], cols["juki_address"]]
-        age_stats = {}
 
-        total_households = df.groupby(group_cols).size().reset_index(name="total_households")
-
-        for group in ["15歳未満", "15歳以上64歳以下", "65歳以上"]:
-            stats = df.groupby(group_cols)[group].sum().reset_index(name=f"{group}人数")
-            stats = stats.merge(total_households, on=group_cols)
-            stats[f"{group}構成比"] = stats[f"{group}人数"] / stats["total_households"]
-            stats.drop(columns="total_households", inplace=True)
-            age_stats[group] = stats
-        
-        df_age_stats = age_stats.pop("15歳未満")
-        for group, stats in age_stats.items():
-            df_age_stats = df_age_stats.merge(stats, on=group_cols, how="inner")
-
-        return df_age_stats
-
-    # 男女比を計算
-    def calculate_gender_ratio(self, df):
-        """
-        各世帯の男女比を計算する
-        Parameters
-        ----------
-        df : pandas.DataFrame
-            住民基本台帳データ
-        Returns
-        -------
-        pandas.DataFrame
-            男女比が追加されたデータ
-        """
-        cols = COLUMNS["juki"]
-        gender_counts = df.groupby([cols["setai_code"], cols["juki_address"], cols["sex"]]).size().unstack(fill_value=0)
-        gender_counts["男女比"] = gender_counts[2] / (gender_counts[1] + gender_counts[2])
-        return gender_counts.reset_index()
+        # 年齢を計算
+        try:
+            age = (self.reference_date - df[cols["birth"]]).dt.days // 365
+        except:
+            set_error(ERROR_00039)
+            raise Exception("生年月日のデータが異常です。もう一度データを確認ください。")
 
-    # 住定期間を計算
-    def calculate_residence_duration(self, df):
-        """
-        各世帯の住定期間を計算する
-        Parameters
-        ----------
-        df : pandas.DataFrame
-            住民基本台帳データ
-        Returns
-        -------
-        pandas.DataFrame
-            住定期間が追加されたデータ
-        """
-        cols = COLUMNS["juki"]
-        
-        # 「住定異動年月日」を datetime に変換（フォーマット指定、エラーは NaT に）
-        df[cols["move_date"]] = pd.to_datetime(df[cols["move_date"]], format='%Y%m%d', errors='coerce')
-        
         # 住定期間を計算（基準日から住定異動年月日を引く）
         try:
-            df["住定期間"] = (self.reference_date - df[cols["move_date"]]).dt.days
+            residence = (self.reference_date - df[cols["move_date"]]).dt.days
         except:
             set_error(ERROR_00040)
             raise Exception("住定異動年月日のデータが異常です。もう一度データを確認ください。")
-        
-        # 各世帯で最大の住定期間を取得
-        return df.groupby([cols["setai_code"], cols["juki_address"]])["住定期間"].max().reset_index()
+
+        # 男女比は性別が1（男性）、2（女性）のデータが必要
+        sex = df[cols["sex"]]
+        sex_values = pd.Index(sex.dropna().unique())
+        for value in [1, 2]:
+            if value not in sex_values:
+                raise KeyError(value)
+
+        # 各行の値を世帯ごとに集計する
+        features = pd.DataFrame({"世帯": self.household_codes(df), "年齢": age, "住定期間": residence})
+        for group, (lower, upper) in self.AGE_GROUPS.items():
+            condition = pd.Series(True, index=df.index)
+            if lower is not None:
+                condition &= age >= lower
+            if upper is not None:
+                condition &= age <= upper
+            features[group] = condition.astype(int)
+        features["男性"] = (sex == 1).astype(int)
+        features["女性"] = (sex == 2).astype(int)
+        features["性別"] = sex.notna().astype(int)
+        features = features.loc[features["世帯"] >= 0]
+
+        aggregations = {
+            "世帯人数": ("年齢", "size"),
+            "最小年齢": ("年齢", "min"),
+            "最大年齢": ("年齢", "max"),
+            "住定期間": ("住定期間", "max"),
+            "男性": ("男性", "sum"),
+            "女性": ("女性", "sum"),
+            "性別": ("性別", "sum")
+        }
+        for group in self.AGE_GROUPS:
+            aggregations[f"{group}人数"] = (group, "sum")
+        households = features.groupby("世帯", sort=True).agg(**aggregations)
+
+        # 世帯コード、正規化住所、住定異動年月日は各世帯の最初の行の値
+        first_rows = features.index[~features["世帯"].duplicated()]
+        first_values = df.loc[first_rows, group_cols + [cols["move_date"]]]
+        first_values.index = features.loc[first_rows, "世帯"].to_numpy()
+        households = first_values.join(households, how="inner")
+
+        for group in self.AGE_GROUPS:
+            households[f"{group}構成比"] = households[f"{group}人数"] / households["世帯人数"]
+        households["男女比"] = households["女性"] / (households["男性"] + households["女性"])
+
+        # 性別が全て欠損している世帯は除外する
+        households = households.loc[households["性別"] > 0]
+
+        return households.sort_index().reset_index(drop=True)
 
     def process(self):
         # データの読み込み
@@ -722,55 +725,57 @@ class JukiProcessor(DataProcessor):
             return
         
         try:
-            # 基準日以降の誕生と移動者を除外
             cols = COLUMNS["juki"]
-            df_juki = normalize_dates(df_juki, cols["birth"])
-            df_juki = normalize_dates(df_juki, cols["move_date"])
-
-            reference_date = pd.to_datetime(self.reference_date, format='%Y/%m/%d')
-
-            df_juki = df_juki.loc[(df_juki[cols["birth"]]<=reference_date)&(df_juki[cols["move_date"]]<=reference_date)].reset_index(drop=True)
-            
-            # 年齢グループの計算と最大年齢・最小年齢の追加
-            df_juki = self.calculate_age_groups(df_juki)
-            
-            # 各世帯の世帯人数を計算して追加
-            df_juki = self.calculate_setai_count(df_juki)
-            
-            # 各世帯の年齢別人数,構成比，男女比を計算
-            df_age_stats = self.calculate_age_stats(df_juki)
-            df_gender_ratio = self.calculate_gender_ratio(df_juki)
-            df_residence_duration = self.calculate_residence_duration(df_juki)
-
-            # 年齢情報（最大年齢・最小年齢）と世帯人数を元のデータに再結合
-            df_juki_processed = pd.merge(df_age_stats, df_juki[['世帯コード', '正規化住所', '最小年齢', '最大年齢', '世帯人数', '住定異動年月日']], 
-                                        on=["世帯コード", "正規化住所"], how="left")
-            
-            # 男女比と住定期間を結合
-            df_juki_processed = pd.merge(df_juki_processed, df_gender_ratio, on=["世帯コード", "正規化住所"], how="inner")
-            df_juki_processed = pd.merge(df_juki_processed, df_residence_duration, on=["世帯コード", "正規化住所"], how="inner")
-            
-            # 重複を削除
-            df_juki_processed = df_juki_processed.drop_duplicates(subset=["世帯コード", "正規化住所"])
-
-            # 出力カラムの選択
-            df_juki_processed = df_juki_processed[self.OUTPUT_COLUMNS["juki"]]
-            df_juki_processed["reference_date"] = self.reference_date
+            df_juki = normalize_dates(df_juki, cols["birth"], EXTENDED_DATE_FORMATS, source="juki", strip_time=True)
+            df_juki = normalize_dates(df_juki, cols["move_date"], EXTENDED_DATE_FORMATS, source="juki", strip_time=True)
+
+            # 日付を変換したデータから、基準日ごとに世帯単位のデータを作成する
+            results = []
+            for reference_date in self.REFERENCE_DATES:
+                self.reference_date = reference_date
+                results.append((reference_date, self.build_juki(df_juki)))
         except:
             if ERROR_CODE is None:
                 set_error(ERROR_00028)
             raise Exception("住居単位データ作成プロセスにおいて、住民基本台帳データの処理においてエラーが発生しました。")
 
         # 出力
-        self.save_csv(df_juki_processed, self.OUTPUT_PATHS["juki"])
+        for reference_date, df_juki_processed in results:
+            self.reference_date = reference_date
+            self.output(df_juki_processed, "juki")
+
+    def build_juki(self, df_juki):
+        """
+        処理中の基準日について、世帯単位の住民基本台帳データを作成する
+        Parameters
+        ----------
+        df_juki : pandas.DataFrame
+            生年月日と住定異動年月日を日付に変換した住民基本台帳データ
+        Returns
+        -------
+        pandas.DataFrame
+            出力カラムを選択した世帯単位のデータ
+        """
+        cols = COLUMNS["juki"]
+        # 基準日以降の誕生と移動者を除外
+        reference_date = pd.to_datetime(self.reference_date, format='%Y/%m/%d')
+        df_juki = df_juki.loc[(df_juki[cols["birth"]]<=reference_date)&(df_juki[cols["move_date"]]<=reference_date)].reset_index(drop=True)
+
+        # 世帯人数、年齢別人数・構成比、最大年齢・最小年齢、男女比、住定期間を世帯ごとに計算
+        df_juki_processed = self.calculate_household_stats(df_juki)
+
+        # 出力カラムの選択
+        df_juki_processed = df_juki_processed[self.OUTPUT_COLUMNS["juki"]]
+        df_juki_processed["reference_date"] = self.reference_date
+        return df_juki_processed
 
 
 # 固定資産課税台帳、登記簿データの住所単位の集計
 class TatemonoProcessor(DataProcessor):
-    # 構造を分類(E012で処理するため、ラベルエンコーディングのみ行う可能性あり)
+    # 構造を分類(E012で処理するため、コードへの変換のみ行う可能性あり)
     def classify_structure(self, df):
         """
-        建物構造を分類する
+        建物構造を分類し、分類のコード（STRUCTURE_CATEGORIESの位置）に変換する
         Parameters
         ----------
         df : pandas.DataFrame
@@ -781,26 +786,7 @@ class TatemonoProcessor(DataProcessor):
             構造分類が追加された建物データ
         """
         cols = COLUMNS["tatemono"]
-        structure_dict = {
-            "木造": ["木造"],
-            "RC造": ["RC造", "鉄筋コンクリート造"],
-            "S造": ["S造", "鉄骨造"],
-            "SRC造": ["SRC造", "鉄骨鉄筋コンクリート造"]
-        }
-        structure_values  = ["木造", "RC造", "S造", "SRC造", "その他"]
-        df["structure_dummy"] = structure_values + [structure_values[-1]] * (len(df) - len(structure_values))
-
-        df["構造名称"] = "その他"
-        for key, values in structure_dict.items():
-            pattern = "|".join(values)
-            df.loc[df[cols["structure"]].str.contains(pattern, na=False), "構造名称"] = key
-
-        label_encoder = LabelEncoder()
-        # Initialize and fit LabelEncoder on "structure_dummy" to ensure it learns all possible keys from structure_dict
-        df["structure_dummy"] = label_encoder.fit_transform(df["structure_dummy"])
-        # Encode "構造名称" using the previously fitted LabelEncoder
-        df["構造名称"] = df["構造名称"].map(lambda x: label_encoder.transform([x])[0] if x in label_encoder.classes_ else -1)
-        df = df.drop('structure_dummy', axis=1, errors='ignore')
+        df["構造名称"] = classify_structure_codes(df[cols["structure"]])
 
         return df
 
@@ -831,20 +817,23 @@ class TatemonoProcessor(DataProcessor):
             df_tatemono[cols["registration_date"]] = pd.to_datetime(df_tatemono[cols["registration_date"]], format='%Y/%m/%d', errors='coerce')
             # NaT（無効な日付）を含む行を除外
             df_tatemono = df_tatemono.dropna(subset=[cols["registration_date"]])
-            # 構造を分類し、ラベルエンコーディング
+            # 構造を分類し、コードに変換
             df_tatemono = self.classify_structure(df_tatemono)
             # 重複データを削除
             df_tatemono = self.drop_duplicates(df_tatemono, subset=cols["tatemono_address"], keep="first")
             # 出力カラムの選択      
             df_tatemono = df_tatemono[self.OUTPUT_COLUMNS["tatemono"]]
-            df_tatemono["reference_date"] = self.reference_date
         except:
             if ERROR_CODE is None:
                 set_error(ERROR_00029)
             raise Exception("住居単位データ作成プロセスにおいて、登記データの処理においてエラーが発生しました。")
 
-        # 出力
-        self.save_csv(df_tatemono, self.OUTPUT_PATHS["tatemono"])
+        # 出力（登記データは基準日によらないため、基準日の列のみ基準日ごとに設定する）
+        for reference_date in self.REFERENCE_DATES:
+            self.reference_date = reference_date
+            df_output = df_tatemono.copy() if self.MULTIPLE_DATES else df_tatemono
+            df_output["reference_date"] = self.reference_date
+            self.output(df_output, "tatemono")
 
 def set_columns(
     suido_number, usage_status, suido_status_address, usage_start_date, usage_end_date,
@@ -870,35 +859,120 @@ def set_columns(
     COLUMNS["juki"]["sex"] = gender
     COLUMNS["juki"]["move_date"] = move_date
 
-    
+
+def dated_output_path(path, reference_date):
+    """
+    基準日を複数指定した場合の出力ファイルのパス（ファイル名の末尾に基準日（YYYYMMDD）を付与）を返す
+
+    Parameters
+    ----------
+    path : str
+        出力ファイルのパス
+    reference_date : datetime or str
+        基準日（YYYY-MM-DD形式）
+
+    Returns
+    -------
+    str
+        基準日を付与した出力ファイルのパス
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}_{pd.Timestamp(reference_date).strftime('%Y%m%d')}{ext}"
+
+# 各データ処理クラスが読み込む入力データのキー
+PROCESSOR_INPUTS = {
+    'juki': ['juki'],
+    'suido': ['suido_use', 'suido_status'],
+    'tatemono': ['tatemono']
+}
+
+def run_processor(processor_class, input_paths, output_paths, reference_date, search_period, save_output, options, columns):
+    """
+    1つのデータ処理クラスを実行する（プロセスプールのワーカーで実行される）
+
+    Parameters
+    ----------
+    processor_class : type
+        実行するデータ処理クラス
+    input_paths : dict
+        入力ファイルのパス、または読み込み済みのデータフレームを含む辞書
+    output_paths : dict
+        出力ファイルのパスを含む辞書
+    reference_date : str or list
+        基準日（リストの場合は基準日ごとに処理結果を作成する）
+    search_period : int
+        検索期間（年）
+    save_output : bool
+        処理結果をファイルに保存するか
+    options : dict
+        データ処理クラスに個別に渡す引数
+    columns : dict
+        呼び出し元のCOLUMNS
+
+    Returns
+    -------
+    dict
+        処理結果のデータフレーム（result）と、エラー時のエラーコード・メッセージ（error_code, error_msg, exception）
+    """
+    global COLUMNS, ERROR_CODE, ERROR_MSG
+    # ワーカーのプロセスには呼び出し元で設定したカラムが反映されていないため、呼び出し元の定義を使用する
+    COLUMNS = columns
+    ERROR_CODE = None
+    ERROR_MSG = None
+
+    try:
+        processor = processor_class(input_paths, output_paths, reference_date, search_period, save_output, **options)
+        processor.process()
+    except Exception as e:
+        return {"result": None, "error_code": ERROR_CODE, "error_msg": ERROR_MSG, "exception": repr(e)}
+    return {"result": processor.result, "error_code": None, "error_msg": None, "exception": None}
+
 # すべてのデータを処理する関数を作成
-def process_all_data(suido_use_file, suido_status_file, juki_file, tatemono_file, reference_date, search_period, output_directory, job_id, db_path=None):
+def process_all_data(suido_use_file, suido_status_file, juki_file, tatemono_file, reference_date, search_period, output_directory, job_id, db_path=None, save_output=True, usage_matrix_path=None, max_workers=None, usage_state_dir=None, commit_usage_state=True):
     """
     すべてのデータファイルを処理する
     Parameters
     ----------
-    suido_use_file : file
+    suido_use_file : file or pandas.DataFrame
         水道使用量データファイル
-    suido_status_file : file
+    suido_status_file : file or pandas.DataFrame
         水道状況データファイル
-    juki_file : file
+    juki_file : file or pandas.DataFrame
         住民基本台帳データファイル
-    tatemono_file : file
+    tatemono_file : file or pandas.DataFrame
         建物データファイル
-    reference_date : int
-        基準日（YYYYMMDD形式）
+    reference_date : str or list
+        基準日（YYYY-MM-DD形式）。リストの場合は、使用量の行列や日付を変換した住民基本台帳データを
+        共有して基準日ごとに処理結果を作成する（出力ファイル名の末尾に基準日（YYYYMMDD）を付与する）。
     search_period : int
         検索期間（年）
+    save_output : bool, optional
+        Falseの場合は処理結果をファイルに保存せず、データフレームとして返す
+    usage_matrix_path : str, optional
+        水道番号×年月の使用量の行列を配置するファイルのパス（numpy.memmap）。指定しない場合はメモリ上に作成する。
+    max_workers : int, optional
+        データ処理クラスを並列に実行するプロセス数（デフォルト: CPUのコア数）。1の場合は順番に実行する。
+    usage_state_dir : str, optional
+        水道番号×年月の使用量の行列を保存するディレクトリ。保存した行列がある場合は、suido_use_fileを
+        新しい月の水道使用量データとして行列に追加し（同じ水道番号・年月の使用量は置き換える）、
+        全期間のデータを読み込み直さずに統計量を計算する。
+    commit_usage_state : bool, optional
+        Falseの場合は使用量の行列の更新を保存した行列に反映せず、反映前の更新として配置する
+        （呼び出し元の処理全体が成功した時点でUsageMatrix.commitで反映する）。
     Returns
     -------
-    list
-        処理済みファイルのパスリスト
+    list or dict
+        処理済みファイルのパスリスト。save_outputがFalseの場合はキー（juki, suido, tatemono）ごとの処理済みデータフレーム
+        （基準日をリストで指定した場合は、さらに基準日（YYYY-MM-DD）ごとのデータフレームの辞書）
     """
     try:
         if db_path:
             connect_sqllite(db_path)
         progress_percent = 0
         task_id = None
+        if usage_state_dir:
+            # 前回失敗した処理の反映前の更新は使用しない
+            UsageMatrix.discard(usage_state_dir)
         if job_id:
             task_id = create_or_update_job_task(job_id, progress_percent=progress_percent, preprocess_type="e013", error_code=None, error_msg=None, result=None)
         # 入力ファイルのパスを設定
@@ -907,21 +981,23 @@ def process_all_data(suido_use_file, suido_status_file, juki_file, tatemono_file
         
         # 各データ処理クラスを実行
         processors = {}
+        # 各データ処理クラスに個別に渡す引数
+        options = {'suido': {'usage_matrix_path': usage_matrix_path, 'usage_state_dir': usage_state_dir}}
         
         # 出力ファイルのパスを設定
         # 処理後のファイルの保存先パスを辞書形式で定義
         output_paths = {}
-        if juki_file:
+        if has_input(juki_file):
             input_paths['juki'] = juki_file
             output_paths['juki'] = f"{output_directory}/juki_residence.csv"
             processors['juki'] = JukiProcessor
-        if suido_status_file:
+        if has_input(suido_status_file):
             input_paths['suido_status'] = suido_status_file
-        if suido_use_file:
+        if has_input(suido_use_file):
             input_paths['suido_use'] = suido_use_file
             output_paths['suido'] = f"{output_directory}/suido_residence.csv"
             processors['suido'] = SuidoProcessor
-        if tatemono_file:
+        if has_input(tatemono_file):
             input_paths['tatemono'] = tatemono_file
             output_paths['tatemono'] = f"{output_directory}/touki_residence.csv"
             processors['tatemono'] = TatemonoProcessor
@@ -931,44 +1007,48 @@ def process_all_data(suido_use_file, suido_status_file, juki_file, tatemono_file
 
         os.makedirs(output_directory, exist_ok=True)
 
-        progress_percent_job = 25
-        for file_key, processor_class in processors.items():
+        # 各データ処理クラスは互いに依存しないため、プロセスプールで並列に実行する
+        tasks = [
+            (file_key, (
+                processor_class,
+                {key: input_paths[key] for key in PROCESSOR_INPUTS[file_key] if key in input_paths},
+                output_paths, reference_date, search_period, save_output, options.get(file_key, {}), COLUMNS
+            ))
+            for file_key, processor_class in processors.items()
+        ]
+        progress = {"task": progress_percent, "job": 25}
+
+        # 進捗は処理の順番に、各処理が完了した時点で更新する
+        def report_progress(file_key):
             if job_id:
-                progress_percent += 30
-                progress_percent_job += 8
-                create_or_update_job_task(job_id, progress_percent=progress_percent, preprocess_type="e013", error_code=None, error_msg=None, result=None, id= task_id)
-                create_or_update_job(job_id, progress_percent_job)
-            processor_class(input_paths, output_paths, reference_date, search_period).process()
+                progress["task"] += 30
+                progress["job"] += 8
+                create_or_update_job_task(job_id, progress_percent=progress["task"], preprocess_type="e013", error_code=None, error_msg=None, result=None, id= task_id)
+                create_or_update_job(job_id, progress["job"])
+
+        results = run_in_process_pool(run_processor, tasks, max_workers, set_error, report_progress)
+        if usage_state_dir and commit_usage_state:
+            UsageMatrix.commit(usage_state_dir)
 
         if job_id:
             create_or_update_job_task(job_id, progress_percent="100", preprocess_type="e013", error_code=None, error_msg=None, result=json.dumps({}), id= task_id, is_finish=True)
         
+        if not save_output:
+            return results
+        if isinstance(reference_date, (list, tuple)):
+            output_paths = {
+                f"{key}_{date}": dated_output_path(path, date) for key, path in output_paths.items() for date in reference_date
+            }
         return [path for path in output_paths.values() if os.path.exists(path)]
     except Exception as e:
         if ERROR_CODE is None:
             set_error(ERROR_00010)
+        if usage_state_dir:
+            UsageMatrix.discard(usage_state_dir)
         if task_id is not None:
             create_or_update_job_task(job_id, progress_percent="", preprocess_type="e013", error_code=ERROR_CODE, error_msg=ERROR_MSG, result=json.dumps({}), id= task_id, is_finish=True)
         raise Exception("住居単位データ作成プロセスにおいて、水道データの処理においてエラーが発生しました。")
 
-def normalize_dates(df, column, formats=['%Y/%m/%d', '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y', '%m-%d-%Y', '%Y%m%d']):
-    # Initialize the temporary column with NaN values
-    temp_column = f'{column}_normalized'
-    df[temp_column] = np.nan
-
-    df[column] = df[column].astype(str).str.split().str[0].str.rstrip('.0')
-    # Try the provided formats on the invalid values
-    for fmt in formats:
-        mask = df[temp_column].isna() & df[column].notna()
-        df.loc[mask, temp_column] = pd.to_datetime(
-            df.loc[mask, column], format=fmt, errors='coerce'
-        )
-
-    # Remove the time portion and keep only the date
-    df[column] = pd.to_datetime(df[temp_column], errors='coerce')
-    
-    return df.drop(f'{column}_normalized',axis=1)
-
 def set_error(value, param_st1=None, param_st2=None):
     global ERROR_CODE
     global ERROR_MSG
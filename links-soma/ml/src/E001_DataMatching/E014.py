@@ -14,11 +14,9 @@ from typing import List, Tuple
 import io
 import os
 import re
+import time
 import chardet
 import pandas as pd
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from scipy.sparse import csr_matrix
 import numpy as np
 import warnings
 
@@ -31,11 +29,17 @@ if async_tasks_path not in sys.path:
 try:
     from utils import *
     from constants import *
+    from date_utils import *
+    from ngram_matching import *
+    from address_index import *
 except ImportError:
     sys.path.remove(async_tasks_path)
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
     from async_tasks.utils import *
     from async_tasks.constants import *
+    from async_tasks.date_utils import *
+    from async_tasks.ngram_matching import *
+    from async_tasks.address_index import *
 
 
 OUTPUT_PATH = "matched_data.csv"
@@ -64,14 +68,14 @@ def detect_encoding(file_path):
     result = chardet.detect(raw_data)
     return result['encoding']
 
-def read_data(path: str, **kwargs) -> pd.DataFrame:
+def read_data(path: str | pd.DataFrame, **kwargs) -> pd.DataFrame:
     """
     CSVファイルを読み込む
     
     Parameters
     ----------
-    path : str
-        読み込むファイルのパス
+    path : str | pd.DataFrame
+        読み込むファイルのパス、または前段の処理結果のデータフレーム
     **kwargs : dict
         pandas.read_csv に渡す追加のキーワード引数
     
@@ -81,6 +85,10 @@ def read_data(path: str, **kwargs) -> pd.DataFrame:
         読み込まれたデータフレーム、エラー時はNone
     """
     try:
+        if isinstance(path, pd.DataFrame):
+            # CSVを経由した場合と同じ型にそろえる
+            return frame_like_csv(path)
+
         # ファイルの拡張子を取得し、小文字に変換
         file_extension = os.path.splitext(path)[1].lower()
         
@@ -135,34 +143,163 @@ def get_column_names(csv_file: str) -> List[str]:
         # エラーが発生した場合、メッセージを表示して空のリストを返す
         return []
 
-def normalize_dates(df, column, formats=['%Y/%m/%d', '%d/%m/%Y', '%Y-%m-%d', '%m/%d/%Y', '%Y%m%d']):
-    # Initialize the temporary column with NaN values
-    temp_column = f'{column}_normalized'
-    df[temp_column] = np.nan
-
-    # Try the provided formats on the invalid values
-    for fmt in formats:
-        mask = df[temp_column].isna()
-        df.loc[mask, temp_column] = pd.to_datetime(
-            df.loc[mask, column], format=fmt, errors='coerce'
-        )
-
-    # Remove the time portion and keep only the date
-    df[temp_column] = pd.to_datetime(df[temp_column], errors='coerce')
-    df[column] = df[temp_column]
-    
-    return df.drop(f'{column}_normalized',axis=1)
+def group_modes(keys: pd.Series, values: pd.Series) -> pd.Series:
+    """
+    グループごとの最頻値を一括で取得する（groupby.aggでpandas.Series.modeを使用した場合と同じ値）
+
+    Parameters
+    ----------
+    keys : pandas.Series
+        グループのキー
+    values : pandas.Series
+        最頻値を求める値
+
+    Returns
+    -------
+    pandas.Series
+        キー（昇順）ごとの最頻値。最頻値が複数の場合は昇順の配列、値が全て欠損値の場合は空の配列。
+    """
+    frame = pd.DataFrame({'key': keys.to_numpy(), 'value': values.to_numpy()})
+    group_keys = pd.Index(frame['key'].dropna().unique()).sort_values()
+    # キー・値の組ごとの件数から、キーごとに件数が最大の値を取得する
+    counts = frame.dropna().groupby(['key', 'value']).size()
+    counts = counts[counts == counts.groupby(level='key').transform('max')]
+    mode_keys, mode_values = counts.index.get_level_values('key'), counts.index.get_level_values('value')
+    n_modes = pd.Series(mode_keys).value_counts()
+
+    result = pd.Series(mode_values, index=mode_keys).loc[lambda modes: ~modes.index.duplicated()]
+    result = result.reindex(group_keys).astype(object).to_numpy()
+    # 最頻値が複数・欠損値のみのグループ（少数）は配列を割り当てる
+    positions = group_keys.get_indexer(n_modes.index[n_modes > 1]).tolist() + np.flatnonzero(~group_keys.isin(n_modes.index)).tolist()
+    for position in positions:
+        key = group_keys[position]
+        result[position] = np.array(mode_values[mode_keys == key], dtype=values.dtype)
+    return pd.Series(result, index=group_keys, dtype=object)
+
+def merge_multi_address_records(main_df: pd.DataFrame, sub_df: pd.DataFrame, addresses: pd.Index, main_column: str,
+                                main_month_column: str, sub_month_column: str, family_thresh: int) -> pd.DataFrame:
+    """
+    結合元で複数のレコード（水道番号）が結びつく住所について、結合先（住基）のレコードと一括で結合する。
+    結合先が1件の住所は開始月が最も新しい結合元のレコードと結合し、2件以上family_thresh件未満の住所は
+    開始月が一致するレコード同士を結合する。結合先がない住所、family_thresh件以上の住所は結合しない。
+
+    Parameters
+    ----------
+    main_df : pandas.DataFrame
+        複数のレコードが結びつく住所の結合元のデータ
+    sub_df : pandas.DataFrame
+        結合先のデータ
+    addresses : pandas.Index
+        複数のレコードが結びつく住所（結合結果はこの順に並べる）
+    main_column : str
+        住所の列名
+    main_month_column : str
+        結合元の開始月の列名
+    sub_month_column : str
+        結合先の開始月の列名
+    family_thresh : int
+        結合先の件数の上限
+
+    Returns
+    -------
+    pandas.DataFrame
+        結合結果（住所ごとに結合した場合と同じ行の順序）
+    """
+    address_index = pd.Index(addresses)
+
+    def sort_by_address(df, month_column):
+        # 住所の順・住所ごとの開始月の昇順（欠損値は末尾）に並べる
+        keys = pd.DataFrame({'rank': address_index.get_indexer(df[main_column]), 'month': df[month_column].to_numpy()})
+        keys = keys.loc[keys['rank'] >= 0].sort_values(['rank', 'month'], na_position='last')
+        return df.take(keys.index), keys['rank'].to_numpy()
+
+    main_sorted, main_ranks = sort_by_address(main_df, main_month_column)
+    sub_sorted, sub_ranks = sort_by_address(sub_df, sub_month_column)
+    sub_counts = np.bincount(sub_ranks, minlength=len(address_index))
+
+    # 結合先が1件の住所は、開始月が最も新しい（並べ替えた最後の）レコードと結合する
+    is_last = np.append(main_ranks[1:] != main_ranks[:-1], True) if len(main_ranks) > 0 else np.array([], dtype=bool)
+    single = main_sorted.loc[is_last & (sub_counts[main_ranks] == 1)]
+    single_merged = single.merge(sub_sorted.loc[sub_counts[sub_ranks] == 1], on=main_column, how='inner')
+
+    # 結合先が2件以上family_thresh件未満の住所は、住所と開始月が一致するレコード同士を結合する
+    is_multi = lambda ranks: (sub_counts[ranks] >= 2) & (sub_counts[ranks] < family_thresh)
+    multi_merged = main_sorted.loc[is_multi(main_ranks)].merge(
+        sub_sorted.loc[is_multi(sub_ranks)], left_on=[main_column, main_month_column], right_on=[main_column, sub_month_column], how='inner'
+    )
+
+    merged = pd.concat([single_merged, multi_merged], ignore_index=True)
+    order = np.argsort(address_index.get_indexer(merged[main_column]), kind='stable')
+    return merged.take(order).reset_index(drop=True)
+
+def find_candidates(main_texts: pd.Series, sub_texts: pd.Series, ngram: int, threshold: float, key: str, batch_size: int = 1000,
+                    blocking: bool = True, structured: bool = False, approximate: bool = False, lsh_seed: int = 0,
+                    structured_max_gap: int = STRUCTURED_MAX_GAP, sub_index: NgramIndex = None, main_index: NgramIndex = None) -> CandidateTable:
+    """
+    結合元の各住所について、類似度が最大の結合先の候補を取得する
 
-def embedding_address(main_csv: io.BytesIO | str, sub_csv: io.BytesIO | str, main_column: str, sub_column: str, merge_base: str, output_path:str, ngram: int = 0, threshold: float = 0.5, batch_size: int = 1000, job_id: str = None, db_path: str = None, input_source: list = [], progress_percent_job = 50, progress_percent = 0) -> Tuple[str, str]:   
+    Parameters
+    ----------
+    main_texts : pd.Series
+        結合元の住所
+    sub_texts : pd.Series
+        結合先の住所
+    ngram : int
+        N-gramのサイズ
+    threshold : float
+        類似度の閾値（blockingの場合の候補の絞り込みに使用する）
+    key : str
+        候補の表のキー
+    batch_size, blocking, structured, approximate, lsh_seed, structured_max_gap
+        embedding_addressの同名の引数
+    sub_index : NgramIndex, optional
+        結合先の住所のN-gramインデックス
+    main_index : NgramIndex, optional
+        結合元の住所のN-gramインデックス
+
+    Returns
+    -------
+    CandidateTable
+        結合元の各行の結合先の候補（上位1件）の表
+    """
+    # N-gramのベクトル（L2正規化した疎行列）を作成
+    main_matrix, sub_matrix = ngram_vectors(main_texts, sub_texts, ngram, sub_index=sub_index, main_index=main_index)
+
+    # 町名・丁目・番地の階層のインデックスで、同じ区画の最も近い番号（差がstructured_max_gap以下）の住所を取得
+    # （類似度は結合した住所との類似度）
+    top_indices = np.full(len(main_texts), -1, dtype=np.int64)
+    top_scores = np.zeros(len(main_texts), dtype=np.float64)
+    if structured:
+        top_indices = StructuredAddressIndex(sub_texts).nearest(main_texts, structured_max_gap)
+    structured_rows = top_indices >= 0
+    top_scores[structured_rows] = pair_similarities(main_matrix, sub_matrix, np.flatnonzero(structured_rows), top_indices[structured_rows])
+
+    # 残りの行は類似度が最大の結合先を取得（batch_size行以下に分割して並列に計算し、上位のみを保持する）
+    fuzzy_rows = np.flatnonzero(~structured_rows)
+    recall_rows, recall_scores = [], []
+    if approximate:
+        # MinHash-LSHで同じバケットの結合先のみ類似度を計算し、再現率の推定用に一部の行は全件と比較する
+        fuzzy_indices, fuzzy_scores = lsh_top_k_cosine(main_matrix[fuzzy_rows], sub_matrix, k=1, seed=lsh_seed, max_rows=batch_size)
+        sample, recall_scores = exact_sample_scores(main_matrix[fuzzy_rows], sub_matrix, seed=lsh_seed, max_rows=batch_size)
+        recall_rows = fuzzy_rows[sample]
+    else:
+        fuzzy_indices, fuzzy_scores = top_k_cosine(main_matrix[fuzzy_rows], sub_matrix, k=1, max_rows=batch_size,
+                                                   block_threshold=threshold if blocking else None)
+    top_indices[fuzzy_rows], top_scores[fuzzy_rows] = fuzzy_indices[:, 0], fuzzy_scores[:, 0]
+
+    # ブロッキングの結果も全件を計算した場合と同じため、候補の表は閾値によらず再利用できる（block_thresholdはNaN）
+    return CandidateTable(key, top_indices[:, None], top_scores[:, None], structured_rows, None, recall_rows, recall_scores)
+
+def embedding_address(main_csv: io.BytesIO | str | pd.DataFrame, sub_csv: io.BytesIO | str | pd.DataFrame, main_column: str, sub_column: str, merge_base: str, output_path:str, ngram: int = 0, threshold: float = 0.5, batch_size: int = 1000, job_id: str = None, db_path: str = None, input_source: list = [], progress_percent_job = 50, progress_percent = 0, main_name: str = None, sub_name: str = None, save_output: bool = True, blocking: bool = True, structured: bool = False, ngram_index_dir: str = None, approximate: bool = False, lsh_seed: int = 0, candidate_dir: str = None, structured_max_gap: int = STRUCTURED_MAX_GAP, ngram_index: NgramIndex = None) -> Tuple[str | pd.DataFrame, str]:   
     """
     住所名寄せ処理を行う
     
     Parameters
     ----------
-    main_csv : io.BytesIO
-        メインのCSVファイル
-    sub_csv : io.BytesIO
-        サブのCSVファイル
+    main_csv : io.BytesIO | str | pd.DataFrame
+        メインのCSVファイル、またはデータフレーム
+    sub_csv : io.BytesIO | str | pd.DataFrame
+        サブのCSVファイル、またはデータフレーム
     main_column : str
         メインファイルの結合キーとなる列名
     sub_column : str
@@ -173,11 +310,43 @@ def embedding_address(main_csv: io.BytesIO | str, sub_csv: io.BytesIO | str, mai
         N-gramのサイズ（デフォルト: 2）
     threshold : float, optional
         類似度の閾値（デフォルト: 0.5）
+    batch_size : int, optional
+        1回に類似度を計算する行数の上限（デフォルト: 1000）
+    main_name : str, optional
+        メインデータの名前。カラム名・flag名に使用し、未指定の場合はファイル名から取得する（データフレームの場合は必須）
+    sub_name : str, optional
+        サブデータの名前。カラム名・flag名に使用し、未指定の場合はファイル名から取得する（データフレームの場合は必須）
+    save_output : bool, optional
+        Falseの場合は結果をファイルに保存せず、データフレームとして返す
+    blocking : bool, optional
+        Trueの場合は希少なN-gramの転置インデックスで候補を絞り込み、候補との類似度のみを計算する。
+        候補に閾値以上の結合先がない行は全件と計算するため、結果は全件を計算した場合と同じとなる。
+    structured : bool, optional
+        Trueの場合は完全一致の後、町名と最後の数字以外（丁目・番地）が一致し、最後の数字が最も近い住所を
+        類似度によらず結合し、残りの行のみN-gramの類似度で結合する。
+    ngram_index_dir : str, optional
+        結合先のN-gramインデックスの保存先のディレクトリ。指定した場合は結合先の住所・N-gramのサイズが同じ
+        保存済みのインデックスを読み込み、結合先の住所のN-gramの分割を省略する（ない場合は作成して保存する）。
+        保存の対象は実行ごとに作り直さない結合先（NGRAM_INDEX_SOURCES）のみとする。
+    approximate : bool, optional
+        Trueの場合はMinHash-LSHで同じバケットの結合先のみ類似度を計算する（大規模なデータ向けの近似）。
+        一部の行を全件と比較して推定した再現率と処理時間を結果（joining_rateと同じ結果）に出力する。
+    lsh_seed : int, optional
+        MinHashのハッシュ関数・再現率の推定に使用する行の抽出の乱数のシード（同じシードでは同じ結果となる）
+    candidate_dir : str, optional
+        結合先の候補の表の保存先のディレクトリ。指定した場合は結合元・結合先の住所と設定が同じ保存済みの表を読み込み、
+        類似度の閾値のみを変更した再実行ではN-gramのベクトルの作成・類似度の計算を省略する（ない場合は作成して保存する）。
+        結合元・結合先が閾値によらない場合のみ指定する（前の結合先の結合結果を結合元とする場合は、閾値ごとに結合元が変わるため再利用できない）。
+    structured_max_gap : int, optional
+        structuredの場合に区画で結合する最後の数字の差の上限（デフォルト: 3）。差が上限を超える行はN-gramの類似度で結合する。
+    ngram_index : NgramIndex, optional
+        複数の結合先で共有するN-gramインデックス。指定した場合は未結合の結合元・結合先の住所のうち、
+        インデックスに含まれない住所のみN-gramを分割して追加し、ベクトルはインデックスから作成する（結果は同じ）。
     
     Returns
     -------
-    Tuple[str, str]
-        結果ファイルのパスと結果の概要
+    Tuple[str | pd.DataFrame, str]
+        結果ファイルのパス（save_outputがFalseの場合は結果のデータフレーム）と結果の概要
     """
     try:
         if db_path:
@@ -194,16 +363,16 @@ def embedding_address(main_csv: io.BytesIO | str, sub_csv: io.BytesIO | str, mai
         
         output_dir = os.path.dirname(output_path)
 
-        if not os.path.exists(output_dir):
+        if save_output and not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
-        # CSVファイルを読み込む
-        if hasattr(main_csv, 'name'):
+        # CSVファイルを読み込む（データフレームの場合はそのまま使用する）
+        if hasattr(main_csv, 'name') and not isinstance(main_csv, pd.DataFrame):
             main_df = read_data(main_csv.name)
         else:
             main_df = read_data(main_csv)
 
-        if hasattr(sub_csv, 'name'):
+        if hasattr(sub_csv, 'name') and not isinstance(sub_csv, pd.DataFrame):
             sub_df = read_data(sub_csv.name)
         else:
             sub_df = read_data(sub_csv)
@@ -211,10 +380,10 @@ def embedding_address(main_csv: io.BytesIO | str, sub_csv: io.BytesIO | str, mai
         if '住基' in input_source and '水道' in input_source:
             # 日付のNormalize化をし、年月を取得
             main_start_date_col = [col for col in ['使用開始日', '住定異動年月日', '登記日付' ] if col in main_df.columns][0]
-            main_df = normalize_dates(main_df,main_start_date_col)
+            main_df = normalize_dates(main_df,main_start_date_col, source=main_name or (main_csv if isinstance(main_csv, str) else None))
             main_df['開始月'] = pd.to_datetime(main_df[main_start_date_col]).dt.strftime("%Y-%m")
             sub_start_date_col = [col for col in ['使用開始日', '住定異動年月日', '登記日付' ] if col in sub_df.columns][0]
-            sub_df = normalize_dates(sub_df,sub_start_date_col)
+            sub_df = normalize_dates(sub_df,sub_start_date_col, source=sub_name or (sub_csv if isinstance(sub_csv, str) else None))
             sub_df['開始月'] = pd.to_datetime(sub_df[sub_start_date_col]).dt.strftime('%Y-%m')
 
             # 住基の住所に閾値以上の世帯コードが結びつく住所のデータを住基、水道双方から除外
@@ -228,8 +397,9 @@ def embedding_address(main_csv: io.BytesIO | str, sub_csv: io.BytesIO | str, mai
             sub_df = sub_df.loc[~sub_df[sub_column].isin(mlt_family_address_list)].reset_index(drop=False)
     
         # 結合元のファイルがmain, 結合対象のファイルがsub、初めに読み込んだファイルを一旦mainにしているので、結合基準をsubにしてたら入れ替える
-        if hasattr(sub_csv, 'name') and merge_base == os.path.basename(sub_csv.name):
+        if hasattr(sub_csv, 'name') and not isinstance(sub_csv, pd.DataFrame) and merge_base == os.path.basename(sub_csv.name):
             main_csv, sub_csv = sub_csv, main_csv
+            main_name, sub_name = sub_name, main_name
             main_column, sub_column = sub_column, main_column
             main_df, sub_df = sub_df, main_df
 
@@ -238,13 +408,17 @@ def embedding_address(main_csv: io.BytesIO | str, sub_csv: io.BytesIO | str, mai
         sub_data_rows = len(sub_df)
         
         # アップロードされた元のファイル名を使用して拡張子を除去
-        if hasattr(main_csv, 'name'):
+        if main_name:
+            main_csv_name = main_name
+        elif hasattr(main_csv, 'name'):
             main_csv_name = os.path.splitext(os.path.basename(main_csv.name))[0]
         else:
             main_csv_name = os.path.splitext(os.path.basename(main_csv))[0]
 
         # アップロードされた元のファイル名を使用して拡張子を除去
-        if hasattr(sub_csv, 'name'):
+        if sub_name:
+            sub_csv_name = sub_name
+        elif hasattr(sub_csv, 'name'):
             sub_csv_name = os.path.splitext(os.path.basename(sub_csv.name))[0]
         else:
             sub_csv_name = os.path.splitext(os.path.basename(sub_csv))[0]
@@ -293,21 +467,9 @@ def embedding_address(main_csv: io.BytesIO | str, sub_csv: io.BytesIO | str, mai
                 
             # 複数住所のレコードを水道使用開始月と住定年月が同じのレコードのみで結びつける（family_thresh以上は排除）
             main_multi_sub_merge = pd.DataFrame(columns = main_single_sub_merge.columns)
-            no_juki = []
-            over_thresh_building = []
-            for address in multi_address_in_main:
-                tar_main = main_df_multi.loc[main_df_multi[main_column]==address].sort_values([main_column,merged_df_col_dict['開始月']]).reset_index(drop=True)
-                tar_sub = sub_df.loc[sub_df[main_column]==address].sort_values([main_column,f"開始月_{sub_csv_name}"]).reset_index(drop=True)
-                if len(tar_sub) == 0:
-                    no_juki.append(address)
-                elif len(tar_sub) == 1:
-                    tar_merged = tar_main.iloc[[-1]].merge(tar_sub, on=main_column, how='inner')
-                    main_multi_sub_merge = pd.concat([main_multi_sub_merge,tar_merged ])
-                elif len(tar_sub) >= family_thresh:
-                    over_thresh_building.append(address)
-                else:
-                    tar_merged = tar_main.merge(tar_sub.drop(main_column, axis=1), left_on=merged_df_col_dict['開始月'], right_on=f"開始月_{sub_csv_name}",  how='inner')
-                    main_multi_sub_merge = pd.concat([main_multi_sub_merge,tar_merged ])
+            main_multi_sub_merge = pd.concat([main_multi_sub_merge, merge_multi_address_records(
+                main_df_multi, sub_df, multi_address_in_main, main_column, merged_df_col_dict['開始月'], f"開始月_{sub_csv_name}", family_thresh
+            )])
     
             # 上記二つのマージ済みデータを合算
             try:
@@ -323,7 +485,7 @@ def embedding_address(main_csv: io.BytesIO | str, sub_csv: io.BytesIO | str, mai
             juki_suido_merged_multi = juki_suido_merged.loc[juki_suido_merged[merged_df_col_dict["世帯コード"]].isin(setai_multi_ids)]
         
             suido_groupby_calcs = {
-                merged_df_col_dict['水道番号']:'first', '正規化住所':pd.Series.mode, merged_df_col_dict['使用開始日']:'max',
+                merged_df_col_dict['水道番号']:'first', '正規化住所':'mode', merged_df_col_dict['使用開始日']:'max',
                 merged_df_col_dict['使用中止日']:'max', merged_df_col_dict['閉栓フラグ']:'max', 
                 merged_df_col_dict['最大使用水量']:'max', merged_df_col_dict['平均使用水量']:'mean', 
                 merged_df_col_dict['最小使用水量']:'min', merged_df_col_dict['合計使用水量']:'sum', merged_df_col_dict['水道使用量変化率']:'mean', 
@@ -334,7 +496,14 @@ def embedding_address(main_csv: io.BytesIO | str, sub_csv: io.BytesIO | str, mai
             juki_suido_merged_multi[merged_df_col_dict["開始月"]] = pd.to_datetime(juki_suido_merged_multi[merged_df_col_dict["開始月"]])
             juki_suido_merged_multi[merged_df_col_dict["閉栓フラグ"]] = juki_suido_merged_multi[merged_df_col_dict["閉栓フラグ"]].astype('bool')
 
-            juki_suido_merged_multi_grpd = juki_suido_merged_multi.groupby(merged_df_col_dict["世帯コード"])[list(suido_groupby_calcs.keys())].agg(suido_groupby_calcs).reset_index(drop=False)
+            # 正規化住所の最頻値は一括で集計し、他の列の集計結果の同じ位置に挿入する
+            mode_columns = [col for col, func in suido_groupby_calcs.items() if func == 'mode']
+            other_calcs = {col: func for col, func in suido_groupby_calcs.items() if func != 'mode'}
+            juki_suido_merged_multi_grpd = juki_suido_merged_multi.groupby(merged_df_col_dict["世帯コード"])[list(other_calcs.keys())].agg(other_calcs)
+            for col in mode_columns:
+                modes = group_modes(juki_suido_merged_multi[merged_df_col_dict["世帯コード"]], juki_suido_merged_multi[col])
+                juki_suido_merged_multi_grpd.insert(list(suido_groupby_calcs).index(col), col, modes.reindex(juki_suido_merged_multi_grpd.index).to_numpy())
+            juki_suido_merged_multi_grpd = juki_suido_merged_multi_grpd.reset_index(drop=False)
             juki_suido_merged_multi_organized = juki_suido_merged_multi.drop(list(suido_groupby_calcs.keys()),axis=1).drop_duplicates(merged_df_col_dict["世帯コード"]).merge(juki_suido_merged_multi_grpd, on=merged_df_col_dict["世帯コード"])
 
             df_merge = pd.concat([juki_suido_merged_single,juki_suido_merged_multi_organized], ignore_index=True)
@@ -351,9 +520,13 @@ def embedding_address(main_csv: io.BytesIO | str, sub_csv: io.BytesIO | str, mai
         merged_rows = len(df_merge)    # 完全一致できた行数
         # N-gramで名寄せできた行数をカウント
         ngram_rows = 0
-        similarity_scores = []  # 類似度スコアを保存するリスト
+        # LSHの推定再現率と候補の取得時間（approximateの場合のみ出力）
+        lsh_recall = None
+        matching_seconds = None
     
         if ngram != 0:
+            # 結合先のN-gramインデックスは未結合のデータの抽出前の全ての住所から作成する
+            sub_addresses = sub_df[main_column]
             # 未結合のデータを抽出
             main_df = main_df[~main_df[main_column].isin(df_merge[main_column])]
             sub_df = sub_df[~sub_df[main_column].isin(df_merge[main_column])]
@@ -363,40 +536,51 @@ def embedding_address(main_csv: io.BytesIO | str, sub_csv: io.BytesIO | str, mai
                 if job_id:
                     create_or_update_job(job_id, progress_percent_job)
                     create_or_update_job_task(job_id, progress_percent="40", preprocess_type="e014", error_code=None, error_msg=None, result=None, id= task_id)
-                # N-gramで類似度を計算する準備
-                vectorizer = CountVectorizer(analyzer='char', ngram_range=(ngram, ngram))
-                main_df_ngram_matrix = vectorizer.fit_transform(main_df[main_column].astype(str))
-                sub_df_ngram_matrix = vectorizer.transform(sub_df[main_column].astype(str))
-        
-                # 疎行列に変換してメモリ効率を改善
-                main_df_ngram_matrix = csr_matrix(main_df_ngram_matrix)
-                sub_df_ngram_matrix = csr_matrix(sub_df_ngram_matrix)
-        
-                # バッチ処理による類似度計算
-                for start in range(0, main_df_ngram_matrix.shape[0], batch_size):
-                    end = min(start + batch_size, main_df_ngram_matrix.shape[0])
-        
-                    # バッチ単位で類似度を計算
-                    batch_similarities = cosine_similarity(main_df_ngram_matrix[start:end], sub_df_ngram_matrix)
-                    
-                    # バッチ内の各行ごとに処理
-                    for i, similarities in enumerate(batch_similarities):
-                        top_indices = similarities.argsort()[-3:][::-1]  # 上位3件を取得
-        
-                        if similarities[top_indices[0]] >= threshold:
-                            row_index = start + i  # バッチの中での行番号をグローバルに変換
-                            for col in sub_df.columns:
-                                main_df.at[row_index, col] = sub_df.iloc[top_indices[0]][col]
-                            similarity_scores.append(similarities[top_indices[0]])  # 類似度スコアを追加
-                            ngram_rows += 1  # この行が正しく名寄せされた場合にカウント
-                        else:
-                            row_index = start + i
-                            main_df.at[row_index, f'名寄せ元情報_{sub_csv_name}'] = ""
-                            main_df.at[row_index, f'{sub_flag_name}'] = 0
-                            similarity_scores.append(similarities[top_indices[0]])  # 閾値未満の場合スコアは0
+                # 保存した候補の表が同じ住所・設定で作成され、閾値で判定できる場合は類似度の計算を省略する
+                start_time = time.perf_counter()
+                candidate_key = CandidateTable.key_of(main_df[main_column], sub_df[main_column], ngram, structured=structured,
+                                                      approximate=approximate, lsh_seed=lsh_seed if approximate else None,
+                                                      max_gap=structured_max_gap if structured else None)
+                candidate_path = os.path.join(candidate_dir, f"{sub_csv_name}{CANDIDATE_TABLE_SUFFIX}") if candidate_dir else None
+                candidates = CandidateTable.load(candidate_path) if candidate_path else None
+                if candidates is None or not candidates.reusable(candidate_key, threshold):
+                    # N-gramインデックスは実行ごとに作り直さない結合先のみ保存する
+                    sub_index = None
+                    if ngram_index_dir and sub_csv_name in NGRAM_INDEX_SOURCES:
+                        sub_index = NgramIndex.load_or_build(ngram_index_dir, sub_csv_name, sub_addresses, ngram)
+                    if ngram_index is not None:
+                        # 共有のインデックスには、前の結合先で分割していない住所のみ追加する（保存したインデックスがある結合先の住所は追加しない）
+                        if sub_index is None:
+                            ngram_index.add(sub_df[main_column], ngram)
+                            sub_index = ngram_index
+                        ngram_index.add(main_df[main_column], ngram)
+                    candidates = find_candidates(main_df[main_column], sub_df[main_column], ngram, threshold, candidate_key, batch_size,
+                                                 blocking, structured, approximate, lsh_seed, structured_max_gap, sub_index, ngram_index)
+                    if candidate_path:
+                        candidates.save(candidate_path)
+                if approximate:
+                    matching_seconds = time.perf_counter() - start_time
+                    lsh_recall = estimate_lsh_recall(candidates.scores[candidates.recall_rows, 0], candidates.recall_scores, threshold)
+                top_indices, top_scores = candidates.indices[:, 0], candidates.scores[:, 0]
+                
+                # 閾値以上の行（区画で結合した行を含む）に結合先の各列をまとめて割り当てる（閾値未満の行の結合先の列は欠損値）
+                matched = (top_indices >= 0) & (top_scores >= threshold)
+                matched[candidates.structured] = True
+                matched_sub_df = sub_df.take(top_indices[matched]).set_axis(main_df.index[matched])
+                for col in sub_df.columns:
+                    values = matched_sub_df[col].reindex(main_df.index)
+                    if col in main_df.columns:
+                        main_df[col] = main_df[col].where(~matched, values)
+                    else:
+                        # 全行が閾値以上の場合も、欠損値を含む場合と同じく整数の列は浮動小数点型とする
+                        main_df[col] = values.astype(float) if pd.api.types.is_integer_dtype(values) else values
+                if not matched.all():
+                    main_df.loc[~matched, f'名寄せ元情報_{sub_csv_name}'] = ""
+                    main_df.loc[~matched, f'{sub_flag_name}'] = 0
+                ngram_rows = int(matched.sum())  # 正しく名寄せされた行数
                         
-                # 類似度スコアを結果データフレームに追加
-                main_df[f'similarity_score_{sub_csv_name}'] = similarity_scores
+                # 類似度スコアを結果データフレームに追加（閾値未満の場合は最大の類似度。共通のN-gramがない場合は0）
+                main_df[f'similarity_score_{sub_csv_name}'] = top_scores
             
                 # 結果のデータフレームを作成
                 result_df = pd.concat([df_merge, main_df], axis=0, ignore_index=True)
@@ -419,8 +603,8 @@ def embedding_address(main_csv: io.BytesIO | str, sub_csv: io.BytesIO | str, mai
         if job_id:
             create_or_update_job(job_id, progress_percent_job)
             create_or_update_job_task(job_id, progress_percent="90", preprocess_type="e014", error_code=None, error_msg=None, result=None, id= task_id)
-        # 結果をCSVファイルとして保存
-        saved_file_path = save_csv(result_df, output_path)
+        # 結果をCSVファイルとして保存（保存しない場合は結果のデータフレームを返す）
+        saved_file_path = save_csv(result_df, output_path) if save_output else result_df
         
         # 結果の表示
         complete_match_ratio = f'結合元データとの完全一致割合: {merged_rows / data_rows * 100:.2f}%'
@@ -437,6 +621,9 @@ def embedding_address(main_csv: io.BytesIO | str, sub_csv: io.BytesIO | str, mai
             'joining_rate': (merged_rows + ngram_rows) / data_rows * 100,
             'input_source': input_source
         }
+        if approximate and ngram != 0:
+            res['lsh_recall'] = lsh_recall
+            res['matching_seconds'] = matching_seconds
         if job_id:
             create_or_update_job_task(job_id, progress_percent="100", preprocess_type="e014", error_code=None, error_msg=None, result=json.dumps(res, ensure_ascii=False), id= task_id, is_finish=True)
 
@@ -448,6 +635,76 @@ def embedding_address(main_csv: io.BytesIO | str, sub_csv: io.BytesIO | str, mai
             create_or_update_job_task(job_id, progress_percent="", preprocess_type="e014", error_code=ERROR_CODE, error_msg=ERROR_MSG, result=json.dumps({}), id= task_id, is_finish=True)
         raise Exception("テキストマッチング処理中にエラーが発生しました。")
 
+def embedding_address_multi(main_csv: str | pd.DataFrame, sub_csvs: list, main_column: str, sub_column: str, merge_base: str, output_path: str, ngram: int = 0, threshold: float = 0.5, batch_size: int = 1000, job_id: str = None, db_path: str = None, input_sources: list = [], progress_percent_job = 50, progress_percent = 0, main_name: str = None, sub_names: list = None, save_output: bool = True, blocking: bool = True, structured: bool = False, ngram_index_dir: str = None, approximate: bool = False, lsh_seed: int = 0, candidate_dir: str = None, structured_max_gap: int = STRUCTURED_MAX_GAP) -> Tuple[str | pd.DataFrame, List[str]]:
+    """
+    1つの結合元のデータに複数の結合先のデータを1回の処理で住所名寄せする
+
+    結合先ごとにembedding_addressで結合し、結合した結果を次の結合先の結合元とする（結合先ごとに結合した場合と同じ結果）。
+    結合の途中の結果はファイルに保存せずにデータフレームで受け渡し、最後の結果のみを保存する。
+    結合先の候補の表（candidate_dir）は、結合元が閾値によらない1件目の結合先のみ保存・再利用する。
+    N-gramは結合先の間で共有するインデックス（NgramIndex）で住所ごとに1回のみ分割し、結合先ごとのベクトルは
+    インデックスから作成する。N-gramの語彙は結合先ごとの未結合の住所で決まるため、ベクトルの作成と結合は結合先ごとに行う。
+    結合率（joining_rate）などは結合先ごとのタスクに出力する。
+
+    Parameters
+    ----------
+    main_csv : str | pd.DataFrame
+        メインのCSVファイル、またはデータフレーム
+    sub_csvs : list
+        結合先のCSVファイル、またはデータフレームのリスト（結合する順）
+    main_column, sub_column, merge_base, output_path, ngram, threshold, batch_size, job_id, db_path
+        embedding_addressの同名の引数
+    input_sources : list
+        結合先ごとの結合元・結合先のデータの種類の名称（例: ["住基", "建物情報"]）のリスト
+    progress_percent_job : int, optional
+        処理開始時のジョブの進捗率
+    progress_percent : int, optional
+        結合先1件あたりのジョブの進捗率
+    main_name : str, optional
+        メインデータの名前（データフレームの場合は必須）
+    sub_names : list, optional
+        結合先ごとのデータの名前（データフレームの場合は必須）
+    save_output, blocking, structured, ngram_index_dir, approximate, lsh_seed, candidate_dir, structured_max_gap
+        embedding_addressの同名の引数
+
+    Returns
+    -------
+    Tuple[str | pd.DataFrame, List[str]]
+        結果ファイルのパス（save_outputがFalseの場合は結果のデータフレーム）と結合先ごとの結果の概要
+    """
+    sub_names = sub_names or [None] * len(sub_csvs)
+    summaries = []
+    if output_path is None:
+        output_path = OUTPUT_PATH
+    # 2件目以降の結合先では、結合した結果（出力ファイル名。末尾の基準日などの数字は含めない）を結合元の名前とする
+    matched_name = re.sub(r'_\d+$', '', os.path.splitext(os.path.basename(output_path))[0])
+    result_df = main_csv
+    ngram_index = NgramIndex.empty() if ngram != 0 else None
+    for i, sub_csv in enumerate(sub_csvs):
+        # 2件目以降の結合元は前の結合先の結合結果（閾値により住所・行が変わる）のため、候補の表は1件目のみ使用する
+        result_df, summary = embedding_address(result_df, sub_csv, main_column, sub_column, merge_base, output_path, ngram, threshold, batch_size,
+                                               job_id, db_path, input_sources[i], progress_percent_job, progress_percent,
+                                               main_name if i == 0 else matched_name, sub_names[i], False, blocking=blocking, structured=structured,
+                                               ngram_index_dir=ngram_index_dir, approximate=approximate, lsh_seed=lsh_seed,
+                                               candidate_dir=candidate_dir if i == 0 else None, structured_max_gap=structured_max_gap,
+                                               ngram_index=ngram_index)
+        progress_percent_job = progress_percent_job + progress_percent
+        summaries.append(summary)
+
+    try:
+        if len(sub_csvs) == 0:
+            result_df = read_data(main_csv)
+        if not save_output:
+            return result_df, summaries
+        if os.path.dirname(output_path) and not os.path.exists(os.path.dirname(output_path)):
+            os.makedirs(os.path.dirname(output_path))
+        # 結果をCSVファイルとして保存
+        return save_csv(result_df, output_path), summaries
+    except Exception as e:
+        if ERROR_CODE is None:
+            set_error(ERROR_00013)
+        raise Exception("テキストマッチング処理中にエラーが発生しました。")
+
 def save_csv(df, path):
     """
     データフレームをCSVファイルとして保存する
@@ -24,10 +24,6 @@ import geopandas as gpd
 import pandas as pd
 import zipfile
 import shutil
-from shapely import wkt, wkb
-from shapely.geometry import Point
-from pyproj import CRS, Transformer
-from shapely.ops import transform
 from pandas.errors import ParserError
 import fiona
 import warnings
@@ -43,11 +39,13 @@ if async_tasks_path not in sys.path:
 try:
     from utils import *
     from constants import *
+    from geometry_utils import *
 except ImportError:
     sys.path.remove(async_tasks_path)
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
     from async_tasks.utils import *
     from async_tasks.constants import *
+    from async_tasks.geometry_utils import *
 
 pd.set_option("display.max_columns", None)
 
@@ -134,8 +132,8 @@ def read_file(path: str, **kwargs) -> pd.DataFrame:
     
     Parameters
     ----------
-    path : str
-        読み込むファイルのパス
+    path : str | pd.DataFrame
+        読み込むファイルのパス、または前段の処理結果のデータフレーム
     **kwargs : dict
         pandas.read_csv に渡す追加のキーワード引数
     
@@ -145,6 +143,10 @@ def read_file(path: str, **kwargs) -> pd.DataFrame:
         読み込まれたデータフレーム、エラー時はNone
     """
     try:
+        if isinstance(path, pd.DataFrame):
+            # CSVを経由した場合と同じ型にそろえる
+            return frame_like_csv(path)
+
         # ファイルの拡張子を取得し、小文字に変換
         file_extension = os.path.splitext(path)[1].lower()
         
@@ -195,8 +197,8 @@ def load_and_process_data(file_path, crs, geometry, file_type, data_type):
 
     Parameters
     ----------
-    file_path : str
-        読み込むファイルのパス。
+    file_path : str | pd.DataFrame
+        読み込むファイルのパス。データフレームの場合はCSVとして扱う。
 
     Returns
     -------
@@ -205,7 +207,7 @@ def load_and_process_data(file_path, crs, geometry, file_type, data_type):
     """
 
     file_extension = file_type
-    detect_ext = file_path.split('.')[-1].lower()
+    detect_ext = 'csv' if isinstance(file_path, pd.DataFrame) else file_path.split('.')[-1].lower()
     if not file_extension:
         file_extension = detect_ext
     if detect_ext is not None and file_extension == "csv" and detect_ext != file_extension:
@@ -219,24 +221,22 @@ def load_and_process_data(file_path, crs, geometry, file_type, data_type):
             raise ValueError(f"ファイルの読み込みに失敗しました: {file_path}")
 
         if geometry in df.columns:
-             # geometry列が文字列のデータのみを保持
-            df = df[df[geometry].apply(lambda x: isinstance(x, str))]
-            # geometry列をWKT形式からShapely geometryオブジェクトに変換
-            df[geometry] = df[geometry].apply(parse_wkt)
+            # geometry列をWKT形式からShapely geometryオブジェクトに変換し、文字列のデータのみを保持
+            geometries = parse_wkt(df[geometry])
+            df = df[is_text(df[geometry])].copy()
+            df[geometry] = geometries
         # geometry列が存在するか確認
         elif 'geometry' in df.columns:
-            # geometry列が文字列のデータのみを保持
-            df = df[df['geometry'].apply(lambda x: isinstance(x, str))]
-            # geometry列をWKT形式からShapely geometryオブジェクトに変換
-            df['geometry'] = df['geometry'].apply(parse_wkt)
+            # geometry列をWKT形式からShapely geometryオブジェクトに変換し、文字列のデータのみを保持
+            geometries = parse_wkt(df['geometry'])
+            df = df[is_text(df['geometry'])].copy()
+            df['geometry'] = geometries
         else:
             # lat/lon列からgeometry列を作成
             if 'lat_geocoding_cleaned' in df.columns and 'lon_geocoding_cleaned' in df.columns:
-                df['geometry'] = df.apply(
-                    lambda row: Point(row['lon_geocoding_cleaned'], row['lat_geocoding_cleaned'])
-                    if pd.notna(row['lat_geocoding_cleaned']) and pd.notna(row['lon_geocoding_cleaned'])
-                    else None, axis=1
-                )
+                lon, lat = df['lon_geocoding_cleaned'], df['lat_geocoding_cleaned']
+                points = gpd.GeoSeries(gpd.points_from_xy(lon, lat), index=df.index)
+                df['geometry'] = points.where(lon.notna() & lat.notna(), None)
             else:
                 set_error(ERROR_00024)
                 raise KeyError("'geometry' 列または 'lat_geocoding_cleaned' と 'lon_geocoding_cleaned' 列が必要です")
@@ -403,23 +403,24 @@ def get_coordinate_system_number(pref: str, city: str) -> int:
 
 def parse_wkt(wkt_str):
     """
-    WKT (Well-Known Text) 文字列を解析してジオメトリオブジェクトを生成する
+    WKT (Well-Known Text) 文字列の列を一括で解析してジオメトリオブジェクトを生成する
     
     Parameters
     ----------
-    wkt_str : str
-        解析するWKT文字列
+    wkt_str : pd.Series
+        解析するWKT文字列の列（文字列以外の値は欠損値とする）
         
     Returns
     -------
-    Geometry
-        WKT文字列から生成されたジオメトリオブジェクト
+    GeoSeries
+        WKT文字列から生成されたジオメトリオブジェクトの列
     """
-    try:
-        return wkt.loads(wkt_str)
-    except Exception as e:
+    geometries = from_wkt(wkt_str, on_invalid="ignore")
+    invalid_rows = invalid_wkt_rows(wkt_str, geometries)
+    if len(invalid_rows) > 0:
         set_error(ERROR_00015)
-        raise
+        raise ValueError(f"WKT文字列を解析できない行があります（{len(invalid_rows)}行）: {invalid_rows[:10].tolist()}")
+    return geometries
 
 def extract_zip(zip_file, extract_to):
     """
@@ -489,18 +490,11 @@ def transform_to_wgs84(geometries, source_crs):
     Returns
     -------
     GeoSeries
-        WGS84に変換されたジオメトリの列
+        WGS84に変換されたジオメトリの列（空のジオメトリは欠損値）
     """
-    # Transformerを事前に作成
-    transformer = Transformer.from_crs(source_crs, CRS.from_epsg(4326), always_xy=True)
-
-    # shapelyのtransformを使って座標変換
-    return geometries.apply(lambda geom: transform(transformer.transform, geom) if geom and not geom.is_empty else None)
-
-def _drop_z(geom):
-    if geom is not None and hasattr(geom, "is_empty") and not geom.is_empty:
-        return wkb.loads(wkb.dumps(geom, output_dimension=2))
-    return geom  # 無効なジオメトリまたは空のジオメトリはそのまま返す
+    # 全てのジオメトリの座標をまとめて変換
+    geometries = gpd.GeoSeries(geometries)
+    return transform_geometries(geometries.where(~geometries.is_empty), source_crs, 4326)
 
 def assign_points_to_buildings(buildings_gdf, points_gdf, mul, crs, point_selected_column, option):
     """
@@ -573,9 +567,9 @@ def assign_points_to_buildings(buildings_gdf, points_gdf, mul, crs, point_select
         combined_gdf = joined
 
         # geometry_plateau を GeoSeries として扱う
-        combined_gdf['geometry_plateau'] = gpd.GeoSeries(
-            combined_gdf['geometry_plateau'], crs=combined_gdf.crs
-        ).transform(_drop_z)
+        combined_gdf['geometry_plateau'] = force_2d(
+            gpd.GeoSeries(combined_gdf['geometry_plateau'], crs=combined_gdf.crs)
+        )
         combined_gdf['geometry_plateau'] = transform_to_wgs84(
             gpd.GeoSeries(combined_gdf['geometry_plateau'], crs=combined_gdf.crs), crs
         )
@@ -616,9 +610,9 @@ def assign_points_to_buildings(buildings_gdf, points_gdf, mul, crs, point_select
             buildings_gdf = buildings_gdf.rename(columns={'geometry': 'geometry_plateau'})
             combined_gdf = combined_gdf.merge(buildings_gdf[['right_geometry']], left_on='index_right', right_index=True, how='left')
 
-        combined_gdf['geometry_plateau'] = gpd.GeoSeries(
-            combined_gdf['geometry_plateau'], crs=combined_gdf.crs
-        ).transform(_drop_z)
+        combined_gdf['geometry_plateau'] = force_2d(
+            gpd.GeoSeries(combined_gdf['geometry_plateau'], crs=combined_gdf.crs)
+        )
         combined_gdf['geometry_plateau'] = transform_to_wgs84(
             gpd.GeoSeries(combined_gdf['geometry_plateau'], crs=combined_gdf.crs), crs
         )
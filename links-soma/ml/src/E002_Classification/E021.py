@@ -34,11 +34,13 @@ if async_tasks_path not in sys.path:
 try:
     from utils import *
     from constants import *
+    from structure_utils import *
 except ImportError:
     sys.path.remove(async_tasks_path)
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
     from async_tasks.utils import *
     from async_tasks.constants import *
+    from async_tasks.structure_utils import *
 
 # Set pandas display options
 pd.set_option('display.max_columns', None)
@@ -155,13 +157,9 @@ def prepare_learning_data(df, explanatory_variables, explanatory_variables_dict)
         df[explanatory_variables_dict["登記日付"]] = pd.to_datetime(df[explanatory_variables_dict["登記日付"]], errors='coerce')
         df[explanatory_variables_dict["登記日付"]] = df[explanatory_variables_dict["登記日付"]].dt.year
 
-    # 構造名称_touki_residenceをカテゴリ型に変換
+    # 構造名称_touki_residenceをカテゴリ型に変換（推論時と同じカテゴリ、欠損値は不明のコード）
     if explanatory_variables_dict.get("構造名称") in df.columns: 
-        fill_value = [ i for i in np.arange(100) if i not in df[explanatory_variables_dict["構造名称"]].unique()]
-        if len(fill_value) == 0:
-            fill_value = [ i for i in [999,9999,99999,9999999,9999999] if i not in df[explanatory_variables_dict["構造名称"]].unique()]
-        df[explanatory_variables_dict["構造名称"]] = df[explanatory_variables_dict["構造名称"]].fillna(fill_value[0])
-        df[explanatory_variables_dict["構造名称"]] = df[explanatory_variables_dict["構造名称"]].astype("category")
+        df[explanatory_variables_dict["構造名称"]] = to_structure_category(df[explanatory_variables_dict["構造名称"]])
 
     # 将来のマージのために識別子列をデータフレームに追加
     if "gml_id" not in df.columns:
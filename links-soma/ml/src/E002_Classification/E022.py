@@ -25,11 +25,15 @@ if async_tasks_path not in sys.path:
 try:
     from utils import *
     from constants import *
+    from date_utils import *
+    from structure_utils import *
 except ImportError:
     sys.path.remove(async_tasks_path)
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
     from async_tasks.utils import *
     from async_tasks.constants import *
+    from async_tasks.date_utils import *
+    from async_tasks.structure_utils import *
 
 
 # pandasの表示オプションを設定
@@ -376,7 +380,7 @@ def insert_sqlite(input_data, data_set_result_id):
         input_data['reference_date'] = input_data['reference_date'].replace([None, '', pd.NA], reference_date_value)
 
         if input_data.get("structure_name", None) is not None:
-            structure_map = { 0: "RC造", 1: "SRC造", 2:"S造", 3:"その他", 4:"木造" }
+            structure_map = dict(enumerate(STRUCTURE_CATEGORIES))
             input_data["structure_name"] = input_data["structure_name"].map(structure_map).fillna(input_data["structure_name"])
 
         is_success = create_data_set_detail_buildings_or_area(input_data)
@@ -485,13 +489,9 @@ def process_and_predict(input_folder, input_file, model_directory, threshold, ou
             prediction_data["登記日付"] = pd.to_datetime(prediction_data["登記日付"], errors='coerce')
             prediction_data["登記日付"] = prediction_data["登記日付"].dt.year
 
-        # 構造名称_touki_residenceをカテゴリ型に変換
+        # 構造名称_touki_residenceをカテゴリ型に変換（学習時と同じカテゴリ、欠損値は不明のコード）
         if "構造名称" in prediction_data.columns: 
-            fill_value = [ i for i in np.arange(100) if i not in prediction_data["構造名称"].unique()]
-            if len(fill_value) == 0:
-                fill_value = [ i for i in [999,9999,99999,9999999,9999999] if i not in prediction_data["構造名称"].unique()]
-            prediction_data["構造名称"] = prediction_data["構造名称"].fillna(fill_value[0])
-            prediction_data["構造名称"] = prediction_data["構造名称"].astype("category")
+            prediction_data["構造名称"] = to_structure_category(prediction_data["構造名称"])
 
         if sqlite_enabled and job_id:
             create_or_update_job_task(job_id, progress_percent="50", preprocess_type=None, error_code=None, error_msg=None, result=json.dumps({}), id= task_id)
@@ -559,22 +559,4 @@ def set_error(value, param_st1=None, param_st2=None):
     elif param_st1 is not None:
         ERROR_MSG = value['message'].format(param_st1=param_st1)
     else:
-        ERROR_MSG = value['message']
-
-def normalize_dates(df, column, formats=['%Y/%m/%d', '%d/%m/%Y', '%Y-%m-%d', '%m/%d/%Y', '%Y%m%d']):
-    # Initialize the temporary column with NaN values
-    temp_column = f'{column}_normalized'
-    df[temp_column] = np.nan
-
-    # Try the provided formats on the invalid values
-    for fmt in formats:
-        mask = df[temp_column].isna()
-        df.loc[mask, temp_column] = pd.to_datetime(
-            df.loc[mask, column], format=fmt, errors='coerce'
-        )
-
-    # Remove the time portion and keep only the date
-    df[temp_column] = pd.to_datetime(df[temp_column], errors='coerce')
-    df[column] = df[temp_column]
-    
-    return df.drop(f'{column}_normalized',axis=1)
\ No newline at end of file
+        ERROR_MSG = value['message']
\ No newline at end of file
@@ -11,9 +11,6 @@ import geopandas as gpd
 import os
 import shutil
 import zipfile 
-from shapely.geometry import MultiPolygon, Polygon
-from shapely.wkt import loads as load_wkt
-from shapely import wkt
 import chardet
 from pandas.errors import ParserError
 import fiona
@@ -26,11 +23,13 @@ if async_tasks_path not in sys.path:
 try:
     from utils import *
     from constants import *
+    from geometry_utils import *
 except ImportError:
     sys.path.remove(async_tasks_path)
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
     from async_tasks.utils import *
     from async_tasks.constants import *
+    from async_tasks.geometry_utils import *
     
 ERROR_CODE=None
 ERROR_MSG=None
@@ -128,27 +127,19 @@ class Summarization:
     
     def remove_z_coordinate(self, geometry):
         """
-        ジオメトリからZ座標（高さ情報）を除去する関数。
+        ジオメトリからZ座標（高さ情報）を除去する関数。ポリゴンの穴は維持する。
     
         Parameters:
         -----------
-        geometry : shapely.geometry
-            Z座標を含む可能性のあるPolygonまたはMultiPolygonジオメトリ。
+        geometry : shapely.geometry or GeoSeries
+            Z座標を含む可能性のあるジオメトリ、またはジオメトリの列。
     
         Returns:
         --------
-        shapely.geometry
+        shapely.geometry or GeoSeries
             Z座標を除去したジオメトリ。
         """
-        if geometry.geom_type == 'Polygon':
-            return Polygon([(x, y) for x, y, z in geometry.exterior.coords])
-        elif geometry.geom_type == 'MultiPolygon':
-            new_polygons = []
-            for poly in geometry.geoms:
-                new_polygons.append(Polygon([(x, y) for x, y, z in poly.exterior.coords]))
-            return MultiPolygon(new_polygons)
-        else:
-            return geometry
+        return force_2d(geometry)
     
     
 
@@ -215,7 +206,7 @@ class Summarization:
                 mapping_header['KEY_CODE'] = 'key_code'
                 mapping_header['S_NAME'] = 'area_group'
             
-            summerized_df['geometry'] = summerized_df['geometry'].apply(lambda x: x.wkt if x else None)
+            summerized_df['geometry'] = to_wkt(summerized_df['geometry'])
             summerized_df = summerized_df.rename(columns=mapping_header)
             
             existing_columns = summerized_df.columns.tolist()
@@ -311,7 +302,7 @@ class Summarization:
     def process(self):
         residence_gdf = pd.read_csv(self.INPUT_PATHS["akiya_pred"], encoding='utf-8-sig')
         # 'geometry'列をWKT形式からジオメトリに変換
-        residence_gdf['geometry'] = residence_gdf['geometry'].apply(wkt.loads)
+        residence_gdf['geometry'] = from_wkt(residence_gdf['geometry'])
         # GeoDataFrameに変換
         residence_gdf = gpd.GeoDataFrame(residence_gdf, geometry='geometry')
         # 投影法の指定 (必要に応じてEPSGコードを指定)
@@ -335,7 +326,7 @@ class Summarization:
             city_block_df = self.read_file(self.INPUT_PATHS["city_block"])
 
             if "geometry" in city_block_df.columns:
-                city_block_df["geometry"] = city_block_df["geometry"].apply(load_wkt)  # WKT形式からジオメトリを生成
+                city_block_df["geometry"] = from_wkt(city_block_df["geometry"])  # WKT形式からジオメトリを生成
                 city_block_gdf = gpd.GeoDataFrame(city_block_df, geometry="geometry", crs="EPSG:4326")
             else:
                 set_error(ERROR_20009)
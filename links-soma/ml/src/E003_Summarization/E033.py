@@ -1,8 +1,6 @@
 import os
 import sys
 import geopandas as gpd
-from shapely import wkt
-from shapely.geometry import MultiPolygon, Polygon
 import json
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -13,26 +11,22 @@ if async_tasks_path not in sys.path:
 try:
     from utils import *
     from constants import *
+    from geometry_utils import *
 except ImportError:
     sys.path.remove(async_tasks_path)
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
     from async_tasks.utils import *
     from async_tasks.constants import *
+    from async_tasks.geometry_utils import *
 
 ERROR_CODE=None
 ERROR_MSG=None
 
 def remove_z_coordinate(geometry):
     """
-    ジオメトリからZ座標（高さ）を削除する関数
+    ジオメトリ（またはジオメトリの列）からZ座標（高さ）を削除する関数（ポリゴンの穴は維持する）
     """
-    if geometry.geom_type == 'Polygon':
-        return Polygon([(x, y) for x, y, *_ in geometry.exterior.coords])
-    elif geometry.geom_type == 'MultiPolygon':
-        new_polygons = [Polygon([(x, y) for x, y, *_ in poly.exterior.coords]) for poly in geometry.geoms]
-        return MultiPolygon(new_polygons)
-    else:
-        return geometry
+    return force_2d(geometry)
 
 def read_input_data(data_set_results_id, reference_date, table_name):
     try:
@@ -43,8 +37,7 @@ def read_input_data(data_set_results_id, reference_date, table_name):
         if 'geometry' not in df.columns:
             raise ValueError("'geometry' column is missing in the input data")
 
-        df['geometry'] = df['geometry'].apply(wkt.loads)
-        df['geometry'] = df['geometry'].apply(remove_z_coordinate)
+        df['geometry'] = remove_z_coordinate(from_wkt(df['geometry']))
 
         gdf = gpd.GeoDataFrame(df, geometry='geometry')
 
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# テスト対象のモジュール（src、async_tasksの各モジュール）を読み込めるように、mlのディレクトリをパスに追加する
+ML_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+for path in [ML_DIR, os.path.join(ML_DIR, "async_tasks")]:
+    if path not in sys.path:
+        sys.path.insert(0, path)
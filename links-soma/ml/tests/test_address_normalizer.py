@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+from src.E001_DataMatching import E012
+from src.E001_DataMatching.E012 import AddressNormalizer
+
+
+# 代表的な住所（各変換ルールを1回以上通る表記）と正規化結果
+GOLDEN_ADDRESSES = [
+    ("愛知県豊田市小坂本町１丁目２５番地", "小坂本町1-25"),
+    ("東京都千代田区 丸の内　二丁目3番地の4号", "千代田区丸の内2丁目3-4号"),
+    ("ｱｲﾁｹﾝ ﾄﾖﾀｼ ｶﾞｸｾﾝ ﾉ 1", "アイチケントヨタシガクセンの1"),
+    ("豊田市 若宮町７－１－２", "若宮町7-1-2"),
+    ("大阪府大阪市北区梅田３丁目１番地", "北区梅田3-1"),
+    ("愛知県 豊田市 西町1-200.", "西町1-200"),
+    ("豊田市トヨタ町ケ丘 ﾊﾞｸﾞ 5番地", "トヨタ町が丘バグ5"),
+    ("北海道札幌市中央区北1条西2丁目", "中央区北1条西2"),
+    ("岡崎市十二丁目5番", "12丁目5"),
+    ("ﾊﾟﾋﾟﾌﾟﾍﾟﾎﾟ市ﾂ", "つ"),
+    ("平成 ３－――2番 ９号", "平成3-2-9号"),
+    ("三丁目", "3丁目"),
+    ("", ""),
+]
+
+
+def test_normalize_golden_outputs():
+    addresses = pd.Series([address for address, _ in GOLDEN_ADDRESSES], dtype=object)
+    expected = [normalized for _, normalized in GOLDEN_ADDRESSES]
+    assert AddressNormalizer.normalize(addresses).tolist() == expected
+
+
+def test_normalize_matches_row_wise_implementation():
+    addresses = pd.Series([address for address, _ in GOLDEN_ADDRESSES] + [None, 1], dtype=object)
+    assert AddressNormalizer.verify(addresses).empty
+
+
+def test_normalize_keeps_non_string_values():
+    result = AddressNormalizer.normalize(pd.Series([None, 12, "豊田市西町1"], dtype=object))
+    assert result[0] is None
+    assert result[1] == 12
+    assert result[2] == "西町1"
+
+
+@pytest.mark.parametrize("name", ["kanji_to_chome", "kanji_to_arabic"])
+def test_rules_version_changes_with_replacement_functions(monkeypatch, name):
+    version = AddressNormalizer.rules_version()
+    monkeypatch.setattr(E012, name, lambda match: "")
+    assert AddressNormalizer.rules_version() != version
+
+
+def test_rules_version_changes_with_dakuten_functions(monkeypatch):
+    version = AddressNormalizer.rules_version()
+    monkeypatch.setattr(AddressNormalizer, "_combine_dakuten", staticmethod(lambda match: match.group(1)))
+    assert AddressNormalizer.rules_version() != version
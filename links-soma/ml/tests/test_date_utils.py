@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from date_utils import DATE_FORMATS, EXTENDED_DATE_FORMATS, INFERRED_DATE_FORMATS, convert_dates_to_seireki, normalize_dates
+from src.E001_DataMatching.E012 import CleanData
+
+
+def legacy_normalize_dates(df, column, formats=['%Y/%m/%d', '%d/%m/%Y', '%Y-%m-%d', '%m/%d/%Y', '%Y%m%d']):
+    # 共通化前のE022（E014）のnormalize_dates
+    temp_column = f'{column}_normalized'
+    df[temp_column] = np.nan
+
+    for fmt in formats:
+        mask = df[temp_column].isna()
+        df.loc[mask, temp_column] = pd.to_datetime(
+            df.loc[mask, column], format=fmt, errors='coerce'
+        )
+
+    df[temp_column] = pd.to_datetime(df[temp_column], errors='coerce')
+    df[column] = df[temp_column]
+
+    return df.drop(f'{column}_normalized',axis=1)
+
+
+def legacy_normalize_dates_strip_time(df, column, formats=['%Y/%m/%d', '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y', '%m-%d-%Y', '%Y%m%d']):
+    # 共通化前のE013のnormalize_dates
+    temp_column = f'{column}_normalized'
+    df[temp_column] = np.nan
+
+    df[column] = df[column].astype(str).str.split().str[0].str.rstrip('.0')
+    for fmt in formats:
+        mask = df[temp_column].isna() & df[column].notna()
+        df.loc[mask, temp_column] = pd.to_datetime(
+            df.loc[mask, column], format=fmt, errors='coerce'
+        )
+
+    df[column] = pd.to_datetime(df[temp_column], errors='coerce')
+
+    return df.drop(f'{column}_normalized',axis=1)
+
+
+DATE_COLUMNS = {
+    "mixed": ["2013/03/20", "2013-03-21", "20130322", "22/03/2013", "03/23/2013", None, "2013/3/5", "2013-03-20 00:00:00"],
+    "ambiguous": ["01/02/2020", "02/01/2020", "13/01/2020", "01/13/2020", "2020/01/02", "01-02-2020"],
+    "compact": ["20130320", "20131231", "20200101", "20130320.0", "20130301", None],
+    "junk": ["", "不明", "2013/13/40", "abc", None, "令和5年3月20日"],
+    "numeric": [20130320, 20131231, 20200101, 20130301, 20130320, 20131231],
+    "numeric_na": [20130320.0, np.nan, 20200101.0, 20130301.0, np.nan, 20131231.0],
+}
+FORMAT_LISTS = [DATE_FORMATS, EXTENDED_DATE_FORMATS, ['%Y%m%d', '%Y/%m/%d', '%d/%m/%Y', '%Y-%m-%d', '%m/%d/%Y']]
+
+
+@pytest.fixture(autouse=True)
+def clear_inferred_formats():
+    INFERRED_DATE_FORMATS.clear()
+    yield
+    INFERRED_DATE_FORMATS.clear()
+
+
+# 共通化前の実装はfloatの一時列にdatetimeを代入するため、pandasのFutureWarningを無視する
+LEGACY_WARNING = "ignore:Setting an item of incompatible dtype:FutureWarning"
+
+
+@pytest.mark.filterwarnings(LEGACY_WARNING)
+@pytest.mark.parametrize("formats", FORMAT_LISTS)
+@pytest.mark.parametrize("name", DATE_COLUMNS)
+def test_normalize_dates_matches_legacy_e022(name, formats):
+    df = pd.DataFrame({"date": DATE_COLUMNS[name], "id": range(len(DATE_COLUMNS[name]))})
+    expected = legacy_normalize_dates(df.copy(), "date", formats)
+    actual = normalize_dates(df.copy(), "date", formats)
+    pd.testing.assert_series_equal(actual["date"], expected["date"], check_dtype=False)
+    assert actual["date"].dtype == "datetime64[ns]"
+
+
+@pytest.mark.filterwarnings(LEGACY_WARNING)
+@pytest.mark.parametrize("formats", FORMAT_LISTS)
+@pytest.mark.parametrize("name", DATE_COLUMNS)
+def test_normalize_dates_strip_time_matches_legacy_e013(name, formats):
+    df = pd.DataFrame({"date": DATE_COLUMNS[name]})
+    expected = legacy_normalize_dates_strip_time(df.copy(), "date", formats)
+    actual = normalize_dates(df.copy(), "date", formats, strip_time=True)
+    pd.testing.assert_series_equal(actual["date"], expected["date"], check_dtype=False)
+
+
+@pytest.mark.filterwarnings(LEGACY_WARNING)
+def test_inferred_format_is_reused_per_source():
+    first = pd.DataFrame({"date": ["2013/03/20", "2013/03/21"]})
+    second = pd.DataFrame({"date": ["2013-03-22", "2013/03/23"]})
+    normalize_dates(first, "date", source="juki")
+    assert INFERRED_DATE_FORMATS[("juki", "date", tuple(DATE_FORMATS))] == "%Y/%m/%d"
+    expected = legacy_normalize_dates(second.copy(), "date")
+    pd.testing.assert_series_equal(normalize_dates(second, "date", source="juki")["date"], expected["date"], check_dtype=False)
+
+
+def test_datetime_column_is_not_reparsed():
+    df = pd.DataFrame({"date": pd.to_datetime(["2013-03-20", None])})
+    pd.testing.assert_frame_equal(normalize_dates(df.copy(), "date"), df)
+
+
+def test_convert_dates_to_seireki_matches_clean_data():
+    values = pd.Series([
+        "平成25年03月20日", "令和1年5月1日", "昭和64年1月7日", "大正15年12月25日", "明治45年7月29日", "平成２５年３月２０日",
+        "130320", "491231", "500101", "990101", "20130320", "2013/03/20", "", None, np.nan, 20130320, "平成25年", "1303201",
+    ], dtype=object)
+    expected = values.map(CleanData.convert_date_to_seireki)
+    pd.testing.assert_series_equal(convert_dates_to_seireki(values), expected)
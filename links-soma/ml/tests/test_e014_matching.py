@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.E001_DataMatching import E014
+
+
+TOWNS = ["西町", "若宮町", "小坂本町", "元城町", "栄町", "喜多町", "神明町", "桜町", "平和町", "梅坪町"]
+
+
+def address(rng):
+    return f"{TOWNS[rng.randint(len(TOWNS))]}{rng.randint(1, 6)}-{rng.randint(1, 60)}"
+
+
+def perturb(text, rng):
+    # 1文字の削除・末尾への追記・番地の変更のいずれかで表記を揺らす
+    kind = rng.randint(3)
+    if kind == 0:
+        position = rng.randint(len(text))
+        return text[:position] + text[position + 1:]
+    if kind == 1:
+        return text + "号"
+    return text.rsplit("-", 1)[0] + f"-{rng.randint(1, 60)}"
+
+
+@pytest.fixture(scope="module")
+def sources():
+    """
+    結合元（水道）と、結合元の住所の一部を完全一致・表記揺れ・無関係の住所で含む結合先（登記・空き家）
+    """
+    rng = np.random.RandomState(0)
+    main_addresses = pd.Series([address(rng) for _ in range(240)]).drop_duplicates().reset_index(drop=True)
+    main = pd.DataFrame({"水道番号": np.arange(len(main_addresses)) + 1000, "正規化住所": main_addresses})
+
+    def sub_source(size, value_column, seed):
+        rng = np.random.RandomState(seed)
+        picked = main_addresses.sample(size, random_state=seed).tolist()
+        addresses = [
+            text if rng.rand() < 0.4 else perturb(text, rng) if rng.rand() < 0.8 else address(rng)
+            for text in picked
+        ]
+        return pd.DataFrame({"住所": addresses, value_column: [f"{value_column}{i}" for i in range(size)], "正規化住所": addresses})
+
+    return main, [sub_source(150, "構造", 1), sub_source(120, "判定", 2)]
+
+
+def match(main, sub, **kwargs):
+    options = dict(ngram=2, threshold=0.8, main_name="suido_status", sub_name="touki", save_output=False)
+    options.update(kwargs)
+    result, _ = E014.embedding_address(main, sub, "正規化住所", "正規化住所", "suido_status", None, **options)
+    return result
+
+
+@pytest.mark.parametrize("ngram", [2, 3])
+@pytest.mark.parametrize("threshold", [0.3, 0.5, 0.8, 0.95])
+def test_blocked_matching_matches_unblocked(sources, ngram, threshold):
+    main, (sub, _) = sources
+    blocked = match(main, sub, ngram=ngram, threshold=threshold, blocking=True)
+    unblocked = match(main, sub, ngram=ngram, threshold=threshold, blocking=False)
+    pd.testing.assert_frame_equal(blocked, unblocked)
+    if threshold >= 0.8:
+        # 閾値未満で結合先と共通のN-gramを持つ行があり、その類似度も全件の中の最大値となっている
+        scores = blocked["similarity_score_touki"].dropna()
+        assert ((scores > 0) & (scores < threshold)).any()
+
+
+@pytest.fixture
+def count_find_candidates(monkeypatch):
+    calls = []
+    find_candidates = E014.find_candidates
+
+    def counted(*args, **kwargs):
+        calls.append(args[3])
+        return find_candidates(*args, **kwargs)
+
+    monkeypatch.setattr(E014, "find_candidates", counted)
+    return calls
+
+
+@pytest.mark.parametrize("blocking", [True, False])
+def test_candidate_table_reused_at_lower_threshold(sources, tmp_path, count_find_candidates, blocking):
+    main, (sub, _) = sources
+    candidate_dir = str(tmp_path / "candidates")
+    first = match(main, sub, threshold=0.9, blocking=blocking, candidate_dir=candidate_dir)
+    assert count_find_candidates == [0.9]
+    pd.testing.assert_frame_equal(first, match(main, sub, threshold=0.9, blocking=blocking))
+
+    # 閾値を下げた再実行では候補の表を再利用し、新たに計算した場合と同じ結果となる
+    for threshold in [0.8, 0.6, 0.95]:
+        del count_find_candidates[:]
+        reused = match(main, sub, threshold=threshold, blocking=blocking, candidate_dir=candidate_dir)
+        assert count_find_candidates == []
+        pd.testing.assert_frame_equal(reused, match(main, sub, threshold=threshold, blocking=blocking))
+
+
+def test_candidate_table_rebuilt_for_other_addresses(sources, tmp_path, count_find_candidates):
+    main, (sub, _) = sources
+    candidate_dir = str(tmp_path / "candidates")
+    match(main, sub, candidate_dir=candidate_dir)
+    match(main.iloc[:-5], sub, candidate_dir=candidate_dir)
+    assert count_find_candidates == [0.8, 0.8]
+    pd.testing.assert_frame_equal(match(main, sub, ngram=3, candidate_dir=candidate_dir), match(main, sub, ngram=3))
+    assert len(count_find_candidates) == 4
+
+
+def chained(main, subs, **kwargs):
+    # 結合先ごとにembedding_addressを呼び、結合した結果を次の結合先の結合元とする
+    result = main
+    for i, (sub, sub_name) in enumerate(zip(subs, ["touki", "akiya"])):
+        result = match(result, sub, main_name="suido_status" if i == 0 else "matched_data", sub_name=sub_name, **kwargs)
+    return result
+
+
+@pytest.mark.parametrize("options", [
+    dict(ngram=2, threshold=0.8),
+    dict(ngram=3, threshold=0.5),
+    dict(ngram=2, threshold=0.3, blocking=False),
+    dict(ngram=2, threshold=0.8, structured=True),
+    dict(ngram=2, threshold=0.8, approximate=True),
+])
+def test_multi_source_matching_matches_chained(sources, options):
+    main, subs = sources
+    options = dict(options, blocking=options.get("blocking", True))
+    result, summaries = E014.embedding_address_multi(main, subs, "正規化住所", "正規化住所", "suido_status", "matched_data.csv",
+                                                     input_sources=[[], []], main_name="suido_status", sub_names=["touki", "akiya"],
+                                                     save_output=False, **options)
+    assert len(summaries) == 2
+    # 2件目の結合先でもN-gramで結合した行がある
+    assert (result["similarity_score_akiya"] >= options["threshold"]).any()
+    pd.testing.assert_frame_equal(result, chained(main, subs, **options))
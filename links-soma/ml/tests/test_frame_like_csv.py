@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import frame_like_csv
+
+
+def round_trip(df, tmp_path, **kwargs):
+    path = tmp_path / "frame.csv"
+    df.to_csv(path, index=False)
+    return pd.read_csv(path, **kwargs)
+
+
+@pytest.fixture
+def mixed_frame():
+    return pd.DataFrame({
+        "int": np.arange(4, dtype="int64"),
+        "int32": np.arange(4, dtype="int32"),
+        "float": [0.1, np.nan, 1e20, -3.0],
+        "float32": np.array([0.1, 0.5, 2.0, 3.25], dtype="float32"),
+        "bool": [True, False, True, True],
+        "bool_na": [True, None, False, True],
+        "bool_text": ["true", "False", None, "TRUE"],
+        "address": ["豊田市西町1-200", None, "NA", ""],
+        "code": ["000123", "12", None, "7"],
+        "mixed": [1, "a", None, 2.5],
+        "empty": [None, None, None, None],
+        "date": pd.to_datetime(["2023-01-01", None, "2023-12-31", "2024-02-29"]),
+        "datetime": pd.to_datetime(["2023-01-01 10:00:00", None, "2023-12-31 00:00:00", "2024-02-29 23:59:59"]),
+        1: ["a", "b", "c", "d"],
+    }, index=[10, 11, 12, 13])
+
+
+def test_matches_csv_round_trip(mixed_frame, tmp_path):
+    pd.testing.assert_frame_equal(frame_like_csv(mixed_frame), round_trip(mixed_frame, tmp_path))
+
+
+def test_matches_csv_round_trip_as_text(mixed_frame, tmp_path):
+    pd.testing.assert_frame_equal(frame_like_csv(mixed_frame, dtype=str), round_trip(mixed_frame, tmp_path, dtype=str))
+
+
+def test_round_trip_columns_are_passed_through(mixed_frame):
+    result = frame_like_csv(mixed_frame)
+    for col in ["int", "float", "bool"]:
+        assert np.shares_memory(result[col].to_numpy(), mixed_frame[col].to_numpy())
+
+
+def test_input_frame_is_not_modified(mixed_frame):
+    expected = mixed_frame.copy()
+    frame_like_csv(mixed_frame)
+    frame_like_csv(mixed_frame, dtype=str)
+    pd.testing.assert_frame_equal(mixed_frame, expected)
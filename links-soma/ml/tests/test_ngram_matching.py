@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ngram_matching import NgramIndex, estimate_lsh_recall, exact_sample_scores, lsh_top_k_cosine, ngram_vectors, top_k_cosine
+
+
+def synthetic_addresses(n, seed):
+    rng = np.random.RandomState(seed)
+    towns = np.array(["西町", "若宮町", "小坂本町", "元城町", "栄町", "喜多町", "神明町", "桜町", "平和町", "梅坪町"])
+    return pd.Series([
+        f"{towns[rng.randint(len(towns))]}{rng.randint(1, 6)}-{rng.randint(1, 60)}" + ("号" if rng.rand() < 0.2 else "")
+        for _ in range(n)
+    ])
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    return ngram_vectors(synthetic_addresses(400, 0), synthetic_addresses(300, 1), 2)
+
+
+def assert_same_matrix(actual, expected):
+    assert actual.shape == expected.shape and actual.dtype == expected.dtype
+    np.testing.assert_array_equal(actual.indptr, expected.indptr)
+    np.testing.assert_array_equal(actual.indices, expected.indices)
+    np.testing.assert_array_equal(actual.data, expected.data)
+
+
+@pytest.mark.parametrize("ngram", [2, 3])
+def test_shared_index_vectors_match_vectorizer(ngram):
+    index = NgramIndex.empty()
+    # 結合先ごとに住所を追加したインデックスから、CountVectorizerと同じベクトルを作成する
+    for seed in range(3):
+        main_texts = synthetic_addresses(200, seed).iloc[seed * 40:]
+        sub_texts = pd.concat([synthetic_addresses(80, seed + 10), pd.Series(["", "町", "西町1-2"])])
+        index.add(sub_texts, ngram)
+        index.add(main_texts, ngram)
+        expected = ngram_vectors(main_texts, sub_texts, ngram)
+        actual = ngram_vectors(main_texts, sub_texts, ngram, sub_index=index, main_index=index)
+        assert_same_matrix(actual[0], expected[0])
+        assert_same_matrix(actual[1], expected[1])
+
+
+def test_shared_index_adds_each_address_once():
+    index = NgramIndex.empty()
+    index.add(pd.Series(["西町1-2", "栄町3-4", "西町1-2"]), 2)
+    index.add(pd.Series(["", "町", "栄町3-4"]), 2)
+    assert sorted(index.addresses) == ["", "栄町3-4", "町", "西町1-2"]
+    with pytest.raises(ValueError):
+        index.vocabulary(pd.Series(["", "町"]))
+
+
+@pytest.mark.parametrize("k", [1, 3])
+@pytest.mark.parametrize("block_threshold", [0.0, 0.3, 0.6, 0.8, 0.95, 1.0])
+def test_blocked_top_k_matches_unblocked(vectors, k, block_threshold):
+    main_vectors, sub_vectors = vectors
+    expected = top_k_cosine(main_vectors, sub_vectors, k=k, max_rows=64)
+    actual = top_k_cosine(main_vectors, sub_vectors, k=k, max_rows=64, block_threshold=block_threshold)
+    np.testing.assert_array_equal(actual[0], expected[0])
+    np.testing.assert_array_equal(actual[1], expected[1])
+
+
+def test_blocked_top_k_scores_rows_without_candidates(vectors):
+    main_vectors, sub_vectors = vectors
+    # 閾値以上の結合先がない行も、類似度は全件の中の最大値となる
+    indices, scores = top_k_cosine(main_vectors, sub_vectors, k=1, block_threshold=0.99)
+    expected_indices, expected_scores = top_k_cosine(main_vectors, sub_vectors, k=1)
+    below = expected_scores[:, 0] < 0.99
+    assert below.any() and (expected_scores[below, 0] > 0).any()
+    np.testing.assert_array_equal(scores[below], expected_scores[below])
+    np.testing.assert_array_equal(indices[below], expected_indices[below])
+
+
+def test_lsh_top_k_with_empty_sub_rows():
+    main_texts, sub_texts = synthetic_addresses(200, 2), synthetic_addresses(150, 3)
+    main_vectors, sub_vectors = ngram_vectors(main_texts, sub_texts, 2)
+    expected_indices, expected_scores = lsh_top_k_cosine(main_vectors, sub_vectors, k=2, seed=0)
+
+    # N-gramを含まない結合先（空文字・N-gramのサイズ未満の住所）を挿入しても、他の結合先の結果は変わらない
+    empty_positions = [0, 40, 77, 150]
+    padded_texts = sub_texts.tolist()
+    for position, text in zip(empty_positions, ["", "町", "", "1"]):
+        padded_texts.insert(position, text)
+    _, padded_vectors = ngram_vectors(main_texts, pd.Series(padded_texts), 2)
+    assert (np.diff(padded_vectors.indptr) == 0).sum() == len(empty_positions)
+    indices, scores = lsh_top_k_cosine(main_vectors, padded_vectors, k=2, seed=0)
+
+    # 挿入後の位置から挿入前の位置への対応（-1は-1のまま）
+    original_position = np.full(len(padded_texts) + 1, -1)
+    original_position[np.delete(np.arange(len(padded_texts)), empty_positions)] = np.arange(len(sub_texts))
+    assert expected_indices.max() >= 0
+    np.testing.assert_array_equal(original_position[indices], expected_indices)
+    np.testing.assert_array_equal(scores, expected_scores)
+
+
+def test_lsh_top_k_without_sub_terms():
+    main_vectors, sub_vectors = ngram_vectors(synthetic_addresses(20, 4), pd.Series(["", "町", ""]), 2)
+    indices, scores = lsh_top_k_cosine(main_vectors, sub_vectors, k=2)
+    assert (indices == -1).all() and (scores == 0).all()
+
+
+# 24バンド×8行の署名では、類似度が高い結合先ほど同じバケットに入りやすい
+@pytest.mark.parametrize("threshold, min_recall", [(0.8, 0.85), (0.9, 0.99)])
+def test_lsh_recall(vectors, threshold, min_recall):
+    main_vectors, sub_vectors = vectors
+    _, lsh_scores = lsh_top_k_cosine(main_vectors, sub_vectors, k=1, seed=0)
+    _, exact_scores = top_k_cosine(main_vectors, sub_vectors, k=1)
+    assert estimate_lsh_recall(lsh_scores[:, 0], exact_scores[:, 0], threshold) >= min_recall
+    # LSHの類似度は取得した結合先との実際の類似度で、全件と比較した最大値を超えない
+    assert (lsh_scores[:, 0] <= exact_scores[:, 0]).all()
+    # 同じseedでは同じ結果となる
+    np.testing.assert_array_equal(lsh_top_k_cosine(main_vectors, sub_vectors, k=1, seed=0)[1], lsh_scores)
+
+
+def test_lsh_recall_estimate_from_sample(vectors):
+    main_vectors, sub_vectors = vectors
+    _, lsh_scores = lsh_top_k_cosine(main_vectors, sub_vectors, k=1, seed=0)
+    rows, sample_scores = exact_sample_scores(main_vectors, sub_vectors, sample_rows=100, seed=0)
+    assert len(rows) == 100 and (np.diff(rows) > 0).all()
+    _, exact_scores = top_k_cosine(main_vectors[rows], sub_vectors, k=1)
+    np.testing.assert_array_equal(sample_scores, exact_scores[:, 0])
+    assert estimate_lsh_recall(lsh_scores[rows, 0], sample_scores, 0.8) >= 0.85
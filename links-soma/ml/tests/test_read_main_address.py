@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from src.E001_DataMatching import E012
+
+
+@pytest.fixture
+def juki_csv(tmp_path):
+    path = tmp_path / "juki.csv"
+    pd.DataFrame({
+        "世帯コード": ["001", "002", "003", "004", "005"],
+        "住所": ["豊田市西町1-200", None, "豊田市小坂本町1-25", "若宮町7-1-2", "000123"],
+        "生年月日": ["19800101", "19900202", "20000303", "20100404", "20200505"],
+    }).to_csv(path, index=False, encoding="utf-8-sig")
+    return str(path)
+
+
+@pytest.mark.parametrize("chunksize", [1, 2, 100])
+def test_chunked_main_address_matches_full_read(juki_csv, chunksize):
+    expected = E012.read_file(juki_csv, "juki")[["住所"]]
+    actual = E012.read_main_address(juki_csv, "juki", "住所", chunksize)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_main_address_without_chunks_reads_whole_file(juki_csv):
+    pd.testing.assert_frame_equal(E012.read_main_address(juki_csv, "juki", "住所"), E012.read_file(juki_csv, "juki"))
+
+
+def test_chunked_main_address_header_only(tmp_path):
+    path = tmp_path / "juki.csv"
+    pd.DataFrame(columns=["世帯コード", "住所"]).to_csv(path, index=False, encoding="utf-8-sig")
+    actual = E012.read_main_address(str(path), "juki", "住所", 10)
+    assert list(actual.columns) == ["住所"]
+    assert len(actual) == 0